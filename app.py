@@ -1,4 +1,5 @@
 import os
+import io
 import datetime
 import sqlite3
 from math import ceil
@@ -6,19 +7,42 @@ from functools import wraps
 
 from flask import (
     Flask, render_template, request, redirect,
-    session, url_for, send_from_directory, flash
+    session, url_for, flash,
+    Response, stream_with_context, jsonify
 )
-
-import openpyxl              # Excel
-import qrcode                # QR code
-from barcode import Code128  # Barcode
-from barcode.writer import ImageWriter
-
-from utils_codes import generate_barcode, generate_qr
+from jinja2 import pass_context
+
+
+from utils_codes import generate_codes
+import jobs
+from db_pool import ConnectionPool
+from metrics import Metrics, TimedConnection
+from slow_queries import SLOW_QUERY_MS, SlowQueryLog, summary as slow_query_summary
+from db_indexes import check_query_plans, verify_query_plans, explain, HOT_QUERIES
+from pagination import Keyset, cached_count, page_window
+from gallery import load_gallery_map, load_gallery
+from search import clothing_search
+from variants import load_variants, load_variant_map, find_variant
+from cart_store import CART_TTL, ensure_cart_store, merge_login_cart, sweep, CartSweeper
+from migrations import MIGRATE_ON_STARTUP, MIGRATIONS, applied_versions, migrate, pending
+from static_files import OFFLOAD_MODES, serve_upload
+from storage import storage_from_env
+from blobs import is_blob, ensure_blobs, store_blob, collect_garbage, dedupe_uploads
+from images import (
+    make_variants, remove_variants, source_of, ensure_image_variants,
+    record_variants, forget_variants, load_thumb_map, best_variant, variant_srcset
+)
+from stats import ensure_stats, rebuild_stats, load_totals, top_categories
 import zipfile
+import click
 from flask import send_file
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from labels import render_label_sheet, parse_ids
+from inventory_io import (
+    EXPORT_FORMATS, iter_inventory_rows, stream_csv, stream_ndjson, xlsx_tempfile,
+    IMPORT_MODES, InvalidWorkbook, import_workbook
+)
+import dataclasses
+from datagen import VOLUMES, generate as generate_data
 
 
 # ---------------- APP CONFIG ----------------
@@ -29,175 +53,326 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# uploads live in UPLOAD_FOLDER or, with STORAGE_BACKEND=s3, in a bucket
+# shared by every app node (storage.py)
+storage = storage_from_env(UPLOAD_FOLDER)
+
+# hand /uploads bodies to the front server: "", "x-sendfile" or "x-accel-redirect" (static_files.py)
+UPLOADS_OFFLOAD = os.environ.get("UPLOADS_OFFLOAD", "")
+UPLOADS_ACCEL_PREFIX = os.environ.get("UPLOADS_ACCEL_PREFIX", "/_uploads/")
+if UPLOADS_OFFLOAD not in OFFLOAD_MODES:
+    raise RuntimeError(f"UPLOADS_OFFLOAD must be one of {OFFLOAD_MODES}, got {UPLOADS_OFFLOAD!r}")
+
+# INVENTORY_DB points the app at another database file (benchmarks, test copies)
+DB_PATH = os.environ.get("INVENTORY_DB") or os.path.join(BASE_DIR, "inventory.db")
+DB_POOL_SIZE = 8
+# QUERY_PLAN_CHECK=1 fails startup if a hot query would scan a large table
+# (see db_indexes.py); `flask --app app check-query-plans` runs the same check on demand
+QUERY_PLAN_CHECK = os.environ.get("QUERY_PLAN_CHECK", "0") == "1"
+
 # ---------------- DB HELPERS ----------------
-def get_db():
-    conn = sqlite3.connect(os.path.join(BASE_DIR, "inventory.db"))
-    conn.row_factory = sqlite3.Row
-    return conn
+# every statement on pooled connections is timed (metrics.py, /metrics)
+metrics = Metrics()
+metrics.install(app)
+db_pool = ConnectionPool(DB_PATH, size=DB_POOL_SIZE, factory=TimedConnection)
+db_pool.init_app(app)
 
+# statements slower than SLOW_QUERY_MS (env, default 100) go to slow_queries
+slow_log = SlowQueryLog(db_pool.connect, threshold_ms=SLOW_QUERY_MS)
+slow_log.install(app, metrics)
 
-def init_db():
-    conn = get_db()
+# expired carts are deleted in the background (cart_store.py)
+cart_sweeper = CartSweeper(db_pool.connect)
 
-    # Admins (with role)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS admin (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT,
-            role TEXT DEFAULT 'staff'
-        )
-    """)
-
-    # default super admin
-    conn.execute("""
-        INSERT OR IGNORE INTO admin (id, username, password, role)
-        VALUES (1, 'admin', 'admin123', 'superadmin')
-    """)
-
-    # Categories
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            description TEXT
-        )
-    """)
-
-    # Clothing (main table)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS clothing (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            category TEXT,
-            size TEXT,
-            quantity INTEGER,
-            price REAL,
-            created_at TEXT,
-            image TEXT,
-            barcode TEXT,
-            qrcode TEXT
-        )
-    """)
-
-    # Extra gallery images
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS clothing_images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clothing_id INTEGER,
-            image TEXT,
-            created_at TEXT
-        )
-    """)
-
-    # Stock movement logs
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS stock_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clothing_id INTEGER,
-            change_type TEXT,      -- in / out / adjust / create / import
-            qty_change INTEGER,
-            note TEXT,
-            admin TEXT,
-            created_at TEXT
-        )
-    """)
-
-    # Activity logs
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            action TEXT,
-            details TEXT,
-            created_at TEXT
-        )
-    """)
-
-    # Customers
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            phone TEXT,
-            address TEXT,
-            city TEXT,
-            state TEXT,
-            zip_code TEXT,
-            created_at TEXT
-        )
-    """)
-
-    # Orders
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_number TEXT UNIQUE NOT NULL,
-            customer_id INTEGER,
-            total_amount REAL,
-            status TEXT DEFAULT 'pending',
-            payment_status TEXT DEFAULT 'unpaid',
-            shipping_address TEXT,
-            notes TEXT,
-            created_at TEXT,
-            updated_at TEXT,
-            FOREIGN KEY(customer_id) REFERENCES customers(id)
-        )
-    """)
-
-    # Order Items
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER,
-            clothing_id INTEGER,
-            size TEXT,
-            quantity INTEGER,
-            price REAL,
-            FOREIGN KEY(order_id) REFERENCES orders(id),
-            FOREIGN KEY(clothing_id) REFERENCES clothing(id)
-        )
-    """)
-
-    # Notifications
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT,                 -- order_placed, order_shipped, order_delivered, payment_received
-            recipient TEXT,            -- 'admin' or customer_id
-            title TEXT,
-            message TEXT,
-            read INTEGER DEFAULT 0,
-            order_id INTEGER,
-            created_at TEXT
-        )
-    """)
-
-    # Cart (temporary storage for users)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS cart (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            clothing_id INTEGER,
-            size TEXT,
-            quantity INTEGER,
-            added_at TEXT,
-            FOREIGN KEY(clothing_id) REFERENCES clothing(id)
-        )
-    """)
 
-    conn.commit()
+def get_db():
+    """One pooled connection per request (returned to the pool on teardown)."""
+    return db_pool.get()
+
+
+def init_db():
+    conn = db_pool.connect()
+
+    # schema changes are numbered migrations (see migrations.py)
+    if MIGRATE_ON_STARTUP:
+        migrate(conn)
+    else:
+        waiting = pending(conn)
+        if waiting:
+            conn.close()
+            raise RuntimeError(
+                f"{len(waiting)} pending migration(s), first {waiting[0].version:04d} {waiting[0].name}: "
+                "run `flask --app app migrate`"
+            )
+    if QUERY_PLAN_CHECK:
+        verify_query_plans(conn)
     conn.close()
 
+    # WAL lets shop readers run alongside a writer; then pre-open the pool
+    db_pool.enable_wal()
+    db_pool.warm()
+    cart_sweeper.start()
+
 
 def log_action(action, details):
+    # reuses the request's connection instead of opening a second one
     conn = get_db()
     conn.execute(
         "INSERT INTO logs (action, details, created_at) VALUES (?, ?, ?)",
         (action, details, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     )
     conn.commit()
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    """Print the plan of every hot query; exit 1 on an unexpected scan of a large table."""
+    conn = db_pool.connect()
+    waiting = pending(conn)
+    if waiting:
+        click.echo(f"note: {len(waiting)} pending migration(s); plans reflect the current schema")
+    for name, sql, params in HOT_QUERIES:
+        click.echo(f"{name}:")
+        for detail in explain(conn, sql, params):
+            click.echo(f"    {detail}")
+    problems = check_query_plans(conn)
     conn.close()
+    for name, detail in problems:
+        click.echo(f"SCAN  {name}: {detail}", err=True)
+    if problems:
+        raise SystemExit(1)
+
+
+@app.cli.command("migrate")
+@click.option("--dry-run", is_flag=True, help="List the pending migrations without applying them.")
+@click.option("--to", "target", default=None, type=int, help="Stop after this version.")
+def migrate_command(dry_run, target):
+    """Apply pending schema migrations (see migrations.py)."""
+    conn = db_pool.connect()
+    done = applied_versions(conn)
+    for m in MIGRATIONS:
+        if m.version in done:
+            click.echo(f"applied     {m.version:04d} {m.name}")
+    todo = migrate(conn, target=target, dry_run=dry_run, echo=click.echo)
+    conn.close()
+    click.echo(f"{len(todo)} migration(s) {'pending' if dry_run else 'applied'}")
+
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recompute the dashboard's category_stats table from clothing."""
+    conn = db_pool.connect()
+    ensure_stats(conn)
+    rebuild_stats(conn)
+    rows = conn.execute("SELECT COUNT(*) FROM category_stats").fetchone()[0]
+    conn.close()
+    click.echo(f"category_stats rebuilt ({rows} categories)")
+
+
+@app.cli.command("sweep-carts")
+@click.option("--days", default=None, type=int, help="Idle days before a cart expires.")
+def sweep_carts_command(days):
+    """Delete carts that have been idle for longer than the cart TTL."""
+    conn = db_pool.connect()
+    ensure_cart_store(conn)
+    ttl = datetime.timedelta(days=days) if days is not None else CART_TTL
+    removed = sweep(conn, ttl)
+    conn.close()
+    click.echo(f"{removed} expired cart(s) removed")
+
+
+@app.cli.command("generate-data")
+@click.option("--volume", "volume_name", type=click.Choice(list(VOLUMES)), default="1k",
+              help="Preset row counts.")
+@click.option("--products", type=int, help="Override the preset's product count.")
+@click.option("--customers", type=int, help="Override the preset's customer count.")
+@click.option("--orders", type=int, help="Override the preset's order count.")
+@click.option("--carts", type=int, help="Override the preset's open cart count.")
+@click.option("--seed", default=0, type=int, help="Random seed (same seed + --end, same rows).")
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Last day of the generated history (default: now).")
+def generate_data_command(volume_name, products, customers, orders, carts, seed, end):
+    """Append synthetic products, customers, orders, logs and carts (see datagen.py)."""
+    overrides = {"products": products, "customers": customers, "orders": orders, "carts": carts}
+    volume = dataclasses.replace(
+        VOLUMES[volume_name], **{k: v for k, v in overrides.items() if v is not None}
+    )
+    init_db()
+    cart_sweeper.stop()
+    conn = sqlite3.connect(DB_PATH)
+    started = datetime.datetime.now()
+
+    def progress(step, rows, seconds):
+        elapsed = (datetime.datetime.now() - started).total_seconds()
+        rate = f"{rows / seconds:>10.0f} rows/s" if seconds else ""
+        click.echo(f"{elapsed:8.1f}s  {step:<16} {rows:>10} rows {rate}")
+
+    try:
+        generate_data(conn, volume, seed=seed, end=end, progress=progress)
+    finally:
+        conn.close()
+
+
+# ---------------- BARCODE / QR JOBS ----------------
+def queue_codes(item_id, barcode_text, qr_text):
+    """Mark the item's codes pending and render them in the job pool.
+
+    The caller commits. When the job finishes its own connection records
+    the files and flips codes_status to ready (or failed, keeping any
+    previous codes). Code files are content-hashed, so a changed code gets a
+    new name and the replaced file is removed.
+    """
+    get_db().execute("UPDATE clothing SET codes_status='pending' WHERE id=?", (item_id,))
+
+    def on_done(result, error):
+        barcode_file, qr_file = result or (None, None)
+        conn = db_pool.connect()
+        old = conn.execute("SELECT barcode, qrcode FROM clothing WHERE id=?", (item_id,)).fetchone()
+        conn.execute(
+            """
+            UPDATE clothing
+            SET barcode=COALESCE(?, barcode), qrcode=COALESCE(?, qrcode), codes_status=?
+            WHERE id=?
+            """,
+            (barcode_file, qr_file, "failed" if error or not barcode_file else "ready", item_id)
+        )
+        conn.commit()
+        conn.close()
+        for previous, current in zip(old or (), (barcode_file, qr_file)):
+            if previous and current and previous != current:
+                storage.delete(previous)
+
+    try:
+        jobs.submit(generate_codes, item_id, barcode_text, qr_text, storage, on_done=on_done)
+    except Exception as e:
+        # no worker pool available (e.g. process limits) -> render inline
+        app.logger.warning("code job pool unavailable (%s); rendering inline", e)
+        try:
+            result = generate_codes(item_id, barcode_text, qr_text, storage)
+            error = None
+        except Exception as exc:
+            result, error = None, exc
+        get_db().commit()
+        on_done(result, error)
+
+
+# ---------------- IMAGE VARIANTS ----------------
+# resized WebP/JPEG copies of uploads, rendered in the job pool (images.py);
+# views pass `thumbs=load_thumb_map(db, images_on_the_page)` to the template
+@app.template_global()
+@pass_context
+def thumb_url(context, filename, width, fmt="jpg"):
+    """URL of the smallest stored copy at least `width` px wide (the original until rendered)."""
+    return url_for("uploaded_file", filename=best_variant(context.get("thumbs") or {}, filename, width, fmt))
+
+
+@app.template_global()
+@pass_context
+def thumb_srcset(context, filename, fmt="webp"):
+    return ", ".join(
+        f"{url_for('uploaded_file', filename=name)} {width}w"
+        for name, width in variant_srcset(context.get("thumbs") or {}, filename, fmt)
+    )
+
+
+def queue_thumbnails(filename):
+    """Render the resized copies of an upload in the job pool."""
+    if load_thumb_map(get_db(), [filename]):
+        return   # same photo stored before (blobs.py): its copies exist
+
+    def on_done(result, error):
+        if error:
+            app.logger.warning("thumbnails for %s failed: %s", filename, error)
+            return
+        digest, widths = result
+        conn = db_pool.connect()
+        record_variants(conn, filename, digest, widths,
+                        datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        conn.commit()
+        conn.close()
+
+    try:
+        jobs.submit(make_variants, storage, filename, on_done=on_done)
+    except Exception as e:
+        app.logger.warning("thumbnail job pool unavailable (%s); rendering inline", e)
+        try:
+            result, error = make_variants(storage, filename), None
+        except Exception as exc:
+            result, error = None, exc
+        on_done(result, error)
+
+
+def drop_variants(filename):
+    remove_variants(storage, filename)
+    forget_variants(get_db(), filename)
+
+
+def release_upload(filename):
+    """Let go of an image the caller is about to unreference. The caller commits.
+
+    Stored blobs may be shared and are removed by collect_uploads() once
+    their last row is gone; files from before the blob store are deleted here.
+    """
+    if is_blob(filename):
+        return
+    storage.delete(filename)
+    drop_variants(filename)
+
+
+def collect_uploads():
+    """Delete blobs (and their resized copies) that no row references any more."""
+    return collect_garbage(get_db(), storage, on_remove=drop_variants)
+
+
+@app.cli.command("dedupe-uploads")
+def dedupe_uploads_command():
+    """Move product/gallery images into the content-addressed blob store."""
+    conn = db_pool.connect()
+    ensure_blobs(conn)
+    ensure_image_variants(conn)
+
+    def on_rename(old):
+        remove_variants(storage, old)
+        forget_variants(conn, old)
+
+    moved, freed = dedupe_uploads(conn, storage, on_rename=on_rename)
+    conn.commit()
+    conn.close()
+    click.echo(f"{moved} image(s) moved into the blob store, {freed} duplicate byte(s) freed")
+    click.echo("run 'flask build-thumbnails' to render their resized copies")
+
+
+@app.cli.command("build-thumbnails")
+@click.option("--force", is_flag=True, help="Re-render images that already have variants.")
+def build_thumbnails_command(force):
+    """Render missing resized copies for every product and gallery image."""
+    conn = db_pool.connect()
+    ensure_image_variants(conn)
+    sources = [row[0] for row in conn.execute("""
+        SELECT image FROM clothing WHERE image IS NOT NULL AND image != ''
+        UNION
+        SELECT image FROM clothing_images WHERE image IS NOT NULL AND image != ''
+    """)]
+    if not force:
+        done = {row[0] for row in conn.execute("SELECT source FROM image_variants")}
+        sources = [s for s in sources if s not in done]
+    sources = [s for s in sources if storage.exists(s)]
+
+    futures = {jobs.submit(make_variants, storage, s): s for s in sources}
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    built = 0
+    for future, source in futures.items():
+        try:
+            digest, widths = future.result()
+        except Exception as e:
+            click.echo(f"skipped {source}: {e}")
+            continue
+        record_variants(conn, source, digest, widths, now)
+        built += 1
+    conn.commit()
+    conn.close()
+    jobs.shutdown()
+    click.echo(f"thumbnails built for {built} of {len(sources)} image(s)")
 
 
 # ---------------- AUTH HELPERS ----------------
@@ -255,6 +430,8 @@ def login():
         if row:
             session["admin"] = row["username"]
             session["role"] = row["role"]
+            # adopt this user's saved cart (plus anything added before login)
+            merge_login_cart(db, f"admin:{row['username']}")
             log_action("login", f"{row['username']} logged in")
             return redirect(url_for("dashboard"))
         else:
@@ -352,39 +529,28 @@ def forgot_password():
 @require_login
 def dashboard():
     db = get_db()
-    total_items = db.execute("SELECT COUNT(*) AS c FROM clothing").fetchone()["c"]
-    total_qty = db.execute(
-        "SELECT COALESCE(SUM(quantity),0) AS q FROM clothing"
-    ).fetchone()["q"]
+    # maintained by triggers (stats.py), no catalog-wide aggregates here
+    totals = load_totals(db)
     category_count = db.execute(
         "SELECT COUNT(*) AS c FROM categories"
     ).fetchone()["c"]
-    low_stock = db.execute(
-        "SELECT COUNT(*) AS c FROM clothing WHERE quantity < 5"
-    ).fetchone()["c"]
 
     recent_logs = db.execute(
         "SELECT * FROM logs ORDER BY id DESC LIMIT 5"
     ).fetchall()
 
     # category-wise quantity for chart
-    cat_data = db.execute("""
-        SELECT category, COALESCE(SUM(quantity),0) AS qty
-        FROM clothing
-        GROUP BY category
-        ORDER BY qty DESC
-        LIMIT 6
-    """).fetchall()
+    cat_data = top_categories(db, 6)
 
-    labels = [row["category"] for row in cat_data]
-    values = [row["qty"] for row in cat_data]
+    labels = [category for category, _ in cat_data]
+    values = [qty for _, qty in cat_data]
 
     return render_template(
         "dashboard.html",
-        total_items=total_items,
-        total_qty=total_qty,
+        total_items=totals["total_items"],
+        total_qty=totals["total_qty"],
         category_count=category_count,
-        low_stock=low_stock,
+        low_stock=totals["low_stock"],
         logs=recent_logs,
         chart_labels=labels,
         chart_values=values,
@@ -400,7 +566,7 @@ def inventory():
 
     # --- filters & query params ---
     q = request.args.get("q", "").strip()
-    sort = request.args.get("sort", "created_desc")
+    sort = request.args.get("sort", "relevance" if q else "created_desc")
 
     try:
         per_page = int(request.args.get("per_page", 10))
@@ -414,60 +580,72 @@ def inventory():
     if page < 1:
         page = 1
 
-    # --- search filter ---
+    # --- search filter (full-text index, LIKE if FTS5 is unavailable) ---
+    from_clause = "FROM clothing"
+    columns = "clothing.*"
     where_clause = ""
     params = []
-    if q:
-        where_clause = "WHERE name LIKE ? OR category LIKE ? OR size LIKE ?"
+    fts = clothing_search(q)
+    if fts:
+        join_sql, params = fts
+        from_clause += f" {join_sql}"
+        columns += ", f.rank AS rank"
+    elif q:
+        where_clause = "WHERE (name LIKE ? OR category LIKE ? OR size LIKE ?)"
         like = f"%{q}%"
         params.extend([like, like, like])
 
-    # --- sorting options ---
+    # --- sorting options (column, descending) ---
     sort_map = {
-        "name_asc": "name ASC",
-        "name_desc": "name DESC",
-        "qty_asc": "quantity ASC",
-        "qty_desc": "quantity DESC",
-        "price_asc": "price ASC",
-        "price_desc": "price DESC",
-        "created_desc": "created_at DESC",
-        "created_asc": "created_at ASC",
+        "relevance": ("f.rank", False),
+        "name_asc": ("name", False),
+        "name_desc": ("name", True),
+        "qty_asc": ("quantity", False),
+        "qty_desc": ("quantity", True),
+        "price_asc": ("price", False),
+        "price_desc": ("price", True),
+        "created_desc": ("created_at", True),
+        "created_asc": ("created_at", False),
     }
-    order_by = sort_map.get(sort, "name ASC")
+    sort_column, descending = sort_map.get(sort, ("name", False))
+    if sort_column == "f.rank" and not fts:
+        sort_column, descending = "name", False
 
-    # --- total count ---
-    count_row = db.execute(
-        f"SELECT COUNT(*) AS c FROM clothing {where_clause}",
-        params
-    ).fetchone()
-    total_items = count_row["c"] if count_row else 0
+    # --- total count (cached for a few seconds) ---
+    total_items = cached_count(db, f"SELECT COUNT(*) AS c {from_clause} {where_clause}", params)
     total_pages = ceil(total_items / per_page) if total_items else 1
     if page > total_pages:
         page = total_pages
 
-    offset = (page - 1) * per_page
+    # --- cursor mode: continue from the previous page's boundary row ---
+    keyset = Keyset(sort_column, descending, request.args.get("cursor"), tiebreak="clothing.id")
+    if keyset.active:
+        where_clause += (" AND " if where_clause else "WHERE ") + keyset.where
+        params += keyset.params
+        offset = 0
+    else:
+        offset = (page - 1) * per_page
 
     # --- actual items ---
     items = db.execute(
         f"""
-        SELECT * FROM clothing
+        SELECT {columns} {from_clause}
         {where_clause}
-        ORDER BY {order_by}
+        ORDER BY {keyset.order_by}
         LIMIT ? OFFSET ?
         """,
-        params + [per_page, offset]
+        params + [per_page + 1, offset]
     ).fetchall()
+    items, next_cursor, prev_cursor = keyset.paginate(items, per_page, has_prev=page > 1)
 
-    pages = list(range(1, total_pages + 1))
+    pages = page_window(page, total_pages)
 
-    # 🔥🔥 HERE — add gallery images dict
-    gallery_map = {}
-    for it in items:
-        imgs = db.execute(
-            "SELECT image FROM clothing_images WHERE clothing_id=? ORDER BY id ASC",
-            (it["id"],)
-        ).fetchall()
-        gallery_map[it["id"]] = imgs
+    # 🔥🔥 HERE — add gallery images dict (one query for the whole page)
+    gallery_map = load_gallery_map(db, [it["id"] for it in items])
+    variant_map = load_variant_map(db, [it["id"] for it in items])
+    thumbs = load_thumb_map(
+        db, [it["image"] for it in items] + [g["image"] for imgs in gallery_map.values() for g in imgs]
+    )
 
     # --- categories ---
     cats = db.execute("SELECT * FROM categories ORDER BY name ASC").fetchall()
@@ -481,10 +659,15 @@ def inventory():
         per_page=per_page,
         page=page,
         pages=pages,
+        total_pages=total_pages,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
         total_items=total_items,
 
         # 🔥🔥 Pass gallery images
         gallery_map=gallery_map,
+        variant_map=variant_map,
+        thumbs=thumbs,
 
         title="Inventory"
     )
@@ -530,16 +713,16 @@ def add_item():
     # Save main image
     image_name = None
     if main_image and main_image.filename:
-        image_name = f"item_{item_id}_{main_image.filename}"
-        main_image.save(os.path.join(UPLOAD_FOLDER, image_name))
+        image_name = store_blob(db, storage, main_image)
         db.execute("UPDATE clothing SET image=? WHERE id=?", (image_name, item_id))
         db.commit()
+        queue_thumbnails(image_name)
 
     # Save gallery images
+    queued = []
     for img in gallery_files:
         if img and img.filename:
-            g_name = f"gallery_{item_id}_{img.filename}"
-            img.save(os.path.join(UPLOAD_FOLDER, g_name))
+            g_name = store_blob(db, storage, img)
             db.execute("""
                 INSERT INTO clothing_images (clothing_id, image, created_at)
                 VALUES (?, ?, ?)
@@ -548,31 +731,14 @@ def add_item():
                 g_name,
                 datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             ))
+            queued.append(g_name)
     db.commit()
+    for g_name in queued:
+        queue_thumbnails(g_name)
 
-    # Generate Barcode (Code128) & QR Code
-    # Barcode content: item id + name
-    try:
-        barcode_obj = Code128(str(item_id), writer=ImageWriter())
-        barcode_filename_no_ext = f"barcode_{item_id}"
-        barcode_full_path = os.path.join(UPLOAD_FOLDER, barcode_filename_no_ext)
-        barcode_obj.save(barcode_full_path)  # creates .png
-        barcode_filename = f"{barcode_filename_no_ext}.png"
-    except Exception as e:
-        barcode_filename = None
-
-    try:
-        qr_filename = f"qr_{item_id}.png"
-        qr_data = f"ITEM:{item_id}|NAME:{name}|CAT:{category}"
-        img_qr = qrcode.make(qr_data)
-        img_qr.save(os.path.join(UPLOAD_FOLDER, qr_filename))
-    except Exception as e:
-        qr_filename = None
-
-    db.execute(
-        "UPDATE clothing SET barcode=?, qrcode=? WHERE id=?",
-        (barcode_filename, qr_filename, item_id)
-    )
+    # Barcode (Code128) & QR Code are rendered in the background job pool
+    # Barcode content: item id; QR content: id + name + category
+    queue_codes(item_id, str(item_id), f"ITEM:{item_id}|NAME:{name}|CAT:{category}")
     db.commit()
 
     # stock log
@@ -608,6 +774,8 @@ def edit_item(item_id):
     return render_template(
         "inventory_edit.html",
         item=item,
+        thumbs=load_thumb_map(db, [item["image"]]),
+        variants=load_variants(db, item_id),
         categories=categories,
         title="Edit Item"
     )
@@ -619,52 +787,80 @@ def edit_item(item_id):
 def update_item(item_id):
     name = request.form["name"]
     category = request.form["category"]
-    size = request.form["size"]
-    quantity = int(request.form["quantity"])
     price = float(request.form["price"])
 
     image_file = request.files.get("image")
 
     db = get_db()
     item = db.execute("SELECT * FROM clothing WHERE id=?", (item_id,)).fetchone()
+    if not item:
+        return redirect(url_for("inventory"))
 
-    old_qty = item["quantity"]
     old_image = item["image"]
     new_image = old_image
 
-    # If new image uploaded -> delete old + save new
+    # per-size stock: existing variants (rename / new qty) + an optional new size
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    stock_changes = []
+    try:
+        for v in load_variants(db, item_id):
+            size = request.form.get(f"variant_size_{v['id']}", v["size"]).strip() or v["size"]
+            qty = int(request.form.get(f"variant_qty_{v['id']}", v["quantity"]))
+            if size != v["size"] or qty != v["quantity"]:
+                db.execute(
+                    "UPDATE clothing_variants SET size=?, quantity=? WHERE id=?",
+                    (size, qty, v["id"])
+                )
+                if qty != v["quantity"]:
+                    stock_changes.append((size, qty - v["quantity"]))
+
+        new_size = request.form.get("new_size", "").strip()
+        if new_size:
+            new_qty = int(request.form.get("new_qty") or 0)
+            db.execute("""
+                INSERT INTO clothing_variants (clothing_id, size, quantity)
+                VALUES (?, ?, ?)
+            """, (item_id, new_size, new_qty))
+            if new_qty:
+                stock_changes.append((new_size, new_qty))
+    except sqlite3.IntegrityError:
+        db.rollback()
+        flash("❌ Each size can only be listed once per item.", "danger")
+        return redirect(url_for("inventory"))
+
+    # If new image uploaded -> release old + store new
     if image_file and image_file.filename:
         if old_image:
-            old_path = os.path.join(UPLOAD_FOLDER, old_image)
-            if os.path.exists(old_path):
-                os.remove(old_path)
+            release_upload(old_image)
 
-        new_image = f"item_{item_id}_{image_file.filename}"
-        image_file.save(os.path.join(UPLOAD_FOLDER, new_image))
+        new_image = store_blob(db, storage, image_file)
 
+    # size / quantity on clothing follow the variants (variants.py triggers)
     db.execute("""
         UPDATE clothing
-        SET name=?, category=?, size=?, quantity=?, price=?, image=?
+        SET name=?, category=?, price=?, image=?
         WHERE id=?
-    """, (name, category, size, quantity, price, new_image, item_id))
-    db.commit()
+    """, (name, category, price, new_image, item_id))
 
-    # stock change log if qty changed
-    diff = quantity - old_qty
-    if diff != 0:
-        change_type = "in" if diff > 0 else "out"
-        db.execute("""
-            INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
+    # stock change log for every size whose qty changed
+    db.executemany("""
+        INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [
+        (
             item_id,
-            change_type,
+            "in" if diff > 0 else "out",
             diff,
-            "Qty updated via Edit Item",
+            f"Qty updated via Edit Item (size {size})",
             session.get("admin", "system"),
-            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        ))
-        db.commit()
+            now
+        )
+        for size, diff in stock_changes
+    ])
+    db.commit()
+    if image_file and image_file.filename:
+        queue_thumbnails(new_image)
+        collect_uploads()
 
     log_action("inventory_update", f"Updated item #{item_id} -> {name}")
     flash(f"✅ Item '{name}' updated successfully!", "success")
@@ -680,12 +876,19 @@ def stock_adjust(item_id):
     if not item:
         return redirect(url_for("inventory"))
 
+    variants = load_variants(db, item_id)
+
     if request.method == "POST":
         change_type = request.form["change_type"]  # in / out / adjust
         qty = int(request.form["qty"])
         note = request.form.get("note", "").strip() or "-"
 
-        current = item["quantity"]
+        variant = find_variant(db, item_id, request.form.get("size", ""))
+        if not variant:
+            flash("❌ Please pick one of the item's sizes.", "danger")
+            return redirect(url_for("stock_adjust", item_id=item_id))
+
+        current = variant["quantity"]
         diff = qty
 
         if change_type == "in":
@@ -699,8 +902,8 @@ def stock_adjust(item_id):
             diff = new_qty - current
 
         db.execute(
-            "UPDATE clothing SET quantity=? WHERE id=?",
-            (new_qty, item_id)
+            "UPDATE clothing_variants SET quantity=? WHERE id=?",
+            (new_qty, variant["id"])
         )
         db.execute("""
             INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
@@ -709,19 +912,20 @@ def stock_adjust(item_id):
             item_id,
             change_type,
             diff,
-            note,
+            f"{note} (size {variant['size']})",
             session.get("admin", "system"),
             datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ))
         db.commit()
 
-        log_action("stock_adjust", f"Item #{item_id} stock {change_type} ({diff})")
+        log_action("stock_adjust", f"Item #{item_id} size {variant['size']} stock {change_type} ({diff})")
         flash(f"✅ Stock adjusted successfully! {change_type.title()} {abs(diff)} unit(s).", "success")
         return redirect(url_for("inventory"))
 
     return render_template(
         "stock_adjust.html",
         item=item,
+        variants=variants,
         title="Adjust Stock"
     )
 
@@ -737,32 +941,26 @@ def delete_item(item_id):
     if item:
         # delete main image
         if item["image"]:
-            img_path = os.path.join(UPLOAD_FOLDER, item["image"])
-            if os.path.exists(img_path):
-                os.remove(img_path)
+            release_upload(item["image"])
 
         # delete codes
         if item["barcode"]:
-            b_path = os.path.join(UPLOAD_FOLDER, item["barcode"])
-            if os.path.exists(b_path):
-                os.remove(b_path)
+            storage.delete(item["barcode"])
         if item["qrcode"]:
-            q_path = os.path.join(UPLOAD_FOLDER, item["qrcode"])
-            if os.path.exists(q_path):
-                os.remove(q_path)
+            storage.delete(item["qrcode"])
 
         # delete gallery images
         images = db.execute(
             "SELECT * FROM clothing_images WHERE clothing_id=?", (item_id,)
         ).fetchall()
         for img in images:
-            p = os.path.join(UPLOAD_FOLDER, img["image"])
-            if os.path.exists(p):
-                os.remove(p)
+            release_upload(img["image"])
         db.execute("DELETE FROM clothing_images WHERE clothing_id=?", (item_id,))
+        db.execute("DELETE FROM clothing_variants WHERE clothing_id=?", (item_id,))
 
         db.execute("DELETE FROM clothing WHERE id=?", (item_id,))
         db.commit()
+        collect_uploads()
 
         log_action("inventory_delete", f"Deleted item '{item['name']}' (id={item_id})")
         flash(f"✅ Item '{item['name']}' deleted successfully!", "success")
@@ -779,15 +977,13 @@ def item_gallery(item_id):
     if not item:
         return redirect(url_for("inventory"))
 
-    imgs = db.execute(
-        "SELECT * FROM clothing_images WHERE clothing_id=? ORDER BY id ASC",
-        (item_id,)
-    ).fetchall()
+    imgs = load_gallery(db, item_id)
 
     return render_template(
         "gallery.html",
         item=item,
         images=imgs,
+        thumbs=load_thumb_map(db, [img["image"] for img in imgs]),
         title="Product Gallery"
     )
 
@@ -797,10 +993,10 @@ def item_gallery(item_id):
 def item_gallery_add(item_id):
     db = get_db()
     files = request.files.getlist("gallery")
+    queued = []
     for f in files:
         if f and f.filename:
-            fname = f"gallery_{item_id}_{f.filename}"
-            f.save(os.path.join(UPLOAD_FOLDER, fname))
+            fname = store_blob(db, storage, f)
             db.execute("""
                 INSERT INTO clothing_images (clothing_id, image, created_at)
                 VALUES (?, ?, ?)
@@ -809,7 +1005,10 @@ def item_gallery_add(item_id):
                 fname,
                 datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             ))
+            queued.append(fname)
     db.commit()
+    for fname in queued:
+        queue_thumbnails(fname)
     flash(f"✅ {len(files)} image(s) added to gallery successfully!", "success")
     return redirect(url_for("item_gallery", item_id=item_id))
 
@@ -823,12 +1022,11 @@ def item_gallery_delete(img_id):
         return redirect(url_for("inventory"))
     item_id = row["clothing_id"]
 
-    path = os.path.join(UPLOAD_FOLDER, row["image"])
-    if os.path.exists(path):
-        os.remove(path)
+    release_upload(row["image"])
 
     db.execute("DELETE FROM clothing_images WHERE id=?", (img_id,))
     db.commit()
+    collect_uploads()
     flash(f"✅ Image deleted successfully!", "success")
 
     return redirect(url_for("item_gallery", item_id=item_id))
@@ -858,34 +1056,30 @@ def stock_logs():
 @app.route("/inventory/export")
 @require_login
 def export_inventory():
-    db = get_db()
-    rows = db.execute("""
-        SELECT name, category, size, quantity, price, created_at
-        FROM clothing
-        ORDER BY name ASC
-    """).fetchall()
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inventory"
-
-    headers = ["Name", "Category", "Size", "Quantity", "Price", "Created At"]
-    ws.append(headers)
-
-    for r in rows:
-        ws.append([
-            r["name"], r["category"], r["size"],
-            r["quantity"], r["price"], r["created_at"]
-        ])
+    """Stream the catalog as ?format=xlsx (default), csv or ndjson."""
+    fmt = request.args.get("format", "xlsx").lower()
+    if fmt not in EXPORT_FORMATS:
+        fmt = "xlsx"
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    download_name = f"inventory_export.{ext}"
 
-    export_name = "inventory_export.xlsx"
-    export_path = os.path.join(UPLOAD_FOLDER, export_name)
-    wb.save(export_path)
+    db = get_db()
+    rows = iter_inventory_rows(db)
+
+    if fmt == "xlsx":
+        # per-request spooled file: no shared uploads/inventory_export.xlsx
+        return send_file(
+            xlsx_tempfile(rows),
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name
+        )
 
-    return send_from_directory(
-        UPLOAD_FOLDER,
-        export_name,
-        as_attachment=True
+    chunks = stream_csv(rows) if fmt == "csv" else stream_ndjson(rows)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={download_name}"}
     )
 
 
@@ -899,49 +1093,53 @@ def import_inventory():
         flash("Please select an Excel file.", "danger")
         return redirect(url_for("inventory"))
 
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-
-    wb = openpyxl.load_workbook(path)
-    ws = wb.active
-
-    db = get_db()
-    first = True
-    for row in ws.iter_rows(values_only=True):
-        if first:
-            first = False
-            continue  # skip header
-
-        name, category, size, qty, price, created_at = row
-        if not name:
-            continue
+    want_json = request.args.get("format") == "json"
+    mode = request.values.get("mode", "append")
+    if mode not in IMPORT_MODES:
+        mode = "append"
 
-        qty = int(qty or 0)
-        price = float(price or 0)
+    # read straight from the request's temp stream; nothing lands in uploads/
+    try:
+        report = import_workbook(
+            get_db(), file.stream, admin=session.get("admin", "system"), mode=mode
+        )
+    except sqlite3.IntegrityError:
+        e = "Some SKUs in the sheet already exist. Use merge mode to update them."
+        if want_json:
+            return jsonify({"error": e}), 409
+        flash(f"❌ {e}", "danger")
+        return redirect(url_for("inventory"))
+    except InvalidWorkbook as e:
+        if want_json:
+            return jsonify({"error": str(e)}), 400
+        flash(f"❌ {e}", "danger")
+        return redirect(url_for("inventory"))
 
-        if not created_at:
-            created_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_action(
+        "inventory_import",
+        f"Imported {report.imported}, updated {report.updated} items from {file.filename} "
+        f"({mode}, {report.error_count} rejected)"
+    )
 
-        db.execute("""
-            INSERT INTO clothing (name, category, size, quantity, price, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (name, category, size, qty, price, str(created_at)))
+    if want_json:
+        return jsonify(report.as_dict())
 
-        # stock log
-        item_id = db.execute("SELECT last_insert_rowid() AS id").fetchone()["id"]
-        db.execute("""
-            INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
-            VALUES (?, 'import', ?, 'Imported from Excel', ?, ?)
-        """, (
-            item_id,
-            qty,
-            session.get("admin", "system"),
-            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        ))
-
-    db.commit()
-    log_action("inventory_import", f"Imported inventory from {file.filename}")
-    flash(f"✅ Successfully imported {len(list(ws.iter_rows()))-1} items from Excel!", "success")
+    if mode == "merge":
+        rows = report.imported + report.updated + report.unchanged
+        flash(
+            f"✅ Merged {rows} rows from Excel: {report.imported} new, {report.updated} updated, "
+            f"{report.unchanged} unchanged.",
+            "success"
+        )
+    else:
+        flash(f"✅ Successfully imported {report.imported} items from Excel!", "success")
+    if report.error_count:
+        shown = "; ".join(f"row {r}: {m}" for r, m in report.errors[:5])
+        more = report.error_count - min(5, len(report.errors))
+        flash(
+            f"⚠️ {report.error_count} rows skipped — {shown}" + (f" (+{more} more)" if more else ""),
+            "warning"
+        )
 
     return redirect(url_for("inventory"))
 
@@ -957,60 +1155,129 @@ def regenerate_codes(item_id):
 
     text = f"{item_id}-{item['name']}-{item['category']}"
 
-    barcode_file = generate_barcode(item_id, text)
-    qr_file = generate_qr(item_id, text)
-
-    db.execute("UPDATE clothing SET barcode=?, qrcode=? WHERE id=?",
-               (barcode_file, qr_file, item_id))
+    queue_codes(item_id, text, text)
     db.commit()
 
     log_action("codes_regenerate", f"Regenerated codes for item #{item_id}")
-    flash(f"✅ Barcode and QR code regenerated successfully!", "success")
+    flash(f"✅ Barcode and QR code regeneration started — they will appear in a moment.", "success")
 
     return redirect(url_for("inventory"))
 
+@app.route("/codes/status/<int:item_id>")
+@require_login
+def codes_status(item_id):
+    db = get_db()
+    item = db.execute(
+        "SELECT barcode, qrcode, codes_status FROM clothing WHERE id=?", (item_id,)
+    ).fetchone()
+    if not item:
+        return {"status": "missing"}, 404
+
+    return {
+        "status": item["codes_status"] or "ready",
+        "barcode": url_for("uploaded_file", filename=item["barcode"]) if item["barcode"] else None,
+        "qrcode": url_for("uploaded_file", filename=item["qrcode"]) if item["qrcode"] else None,
+    }
+
 # ---------------- Download ZIP of Codes ----------------
 @app.route("/codes/zip/<int:item_id>")
 def codes_zip(item_id):
-    zipname = f"codes_{item_id}.zip"
-    zippath = os.path.join(UPLOAD_FOLDER, zipname)
+    # stored names carry a content hash; the archive keeps the plain ones
+    item = get_db().execute(
+        "SELECT barcode, qrcode FROM clothing WHERE id=?", (item_id,)
+    ).fetchone()
+    if not item or not item["barcode"] or not item["qrcode"]:
+        return {"status": "missing"}, 404
 
-    zipf = zipfile.ZipFile(zippath, 'w', zipfile.ZIP_DEFLATED)
-    zipf.write(os.path.join(UPLOAD_FOLDER, f"barcode_{item_id}.png"),
-               f"barcode_{item_id}.png")
-    zipf.write(os.path.join(UPLOAD_FOLDER, f"qr_{item_id}.png"),
-               f"qr_{item_id}.png")
-    zipf.close()
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr(f"barcode_{item_id}.png", storage.get(item["barcode"]))
+        zipf.writestr(f"qr_{item_id}.png", storage.get(item["qrcode"]))
+    buf.seek(0)
 
-    return send_file(zippath, as_attachment=True)
+    return send_file(buf, mimetype="application/zip", as_attachment=True,
+                     download_name=f"codes_{item_id}.zip")
 
 # ---------------- Print Label Sheet (PDF) ----------------
+LABEL_SHEET_COPIES = 30   # one full A4 sheet for a single item
+LABEL_MAX_COPIES = 300
+
+
+def load_label_items(db, ids=None, category=None):
+    """Rows (id, name, barcode, qrcode) for the given ids (in that order) or category."""
+    if category:
+        return db.execute(
+            "SELECT id, name, barcode, qrcode FROM clothing WHERE category=? ORDER BY name, id",
+            (category,)
+        ).fetchall()
+
+    ids = list(ids or [])
+    found = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        for row in db.execute(
+            f"SELECT id, name, barcode, qrcode FROM clothing WHERE id IN ({marks})", chunk
+        ):
+            found[row["id"]] = row
+    return [found[i] for i in ids if i in found]
+
+
+def label_image(filename):
+    return io.BytesIO(storage.get(filename))
+
+
+def send_label_pdf(items, copies, download_name):
+    # built in memory and sent straight back; nothing is written to uploads/
+    buf = io.BytesIO()
+    render_label_sheet(items, buf, label_image, copies=copies)
+    buf.seek(0)
+    return send_file(buf, mimetype="application/pdf", as_attachment=True,
+                     download_name=download_name)
+
+
 @app.route("/codes/print/<int:item_id>")
 def print_labels(item_id):
-    pdfname = f"labels_{item_id}.pdf"
-    pdfpath = os.path.join(UPLOAD_FOLDER, pdfname)
+    items = load_label_items(get_db(), ids=[item_id])
+    return send_label_pdf(items, LABEL_SHEET_COPIES, f"labels_{item_id}.pdf")
 
-    c = canvas.Canvas(pdfpath, pagesize=A4)
-    w, h = A4
 
-    barcode_path = os.path.join(UPLOAD_FOLDER, f"barcode_{item_id}.png")
-    qr_path = os.path.join(UPLOAD_FOLDER, f"qr_{item_id}.png")
+@app.route("/codes/labels", methods=["GET", "POST"])
+@require_login
+def bulk_labels():
+    """Label sheet for many items: ?ids=1,2,3 (or repeated ids=) or ?category=..."""
+    values = request.values
+    category = values.get("category", "").strip()
+    ids = parse_ids(values.getlist("ids"))
 
-    rows, cols = 10, 3
-    x_gap, y_gap = 190, 80
+    try:
+        copies = int(values.get("copies", 1))
+    except ValueError:
+        copies = 1
+    copies = max(1, min(copies, LABEL_MAX_COPIES))
 
-    y = h - 80
-    for r in range(rows):
-        x = 40
-        for col in range(cols):
-            c.drawImage(barcode_path, x, y, width=150, height=40)
-            c.drawImage(qr_path, x + 150, y, width=50, height=50)
-            c.drawString(x, y - 10, f"Product #{item_id}")
-            x += x_gap
-        y -= y_gap
+    if not category and not ids:
+        flash("Select items or a category to print labels for.", "danger")
+        return redirect(url_for("inventory"))
+
+    items = load_label_items(get_db(), ids=ids, category=category)
+    name = f"labels_{category or 'items'}.pdf".replace(" ", "_")
+    return send_label_pdf(items, copies, name)
 
-    c.save()
-    return send_file(pdfpath, as_attachment=True)
+
+@app.cli.command("print-labels")
+@click.option("--ids", default="", help="Comma-separated item ids.")
+@click.option("--category", default="", help="Print every item in this category.")
+@click.option("--copies", default=1, show_default=True, help="Labels per item.")
+@click.option("-o", "--output", default="labels.pdf", show_default=True, help="PDF file to write.")
+def print_labels_command(ids, category, copies, output):
+    """Write a label sheet PDF for many items at once."""
+    conn = db_pool.connect()
+    items = load_label_items(conn, ids=parse_ids(ids), category=category)
+    conn.close()
+    with open(output, "wb") as fh:
+        count = render_label_sheet(items, fh, label_image, copies=copies)
+    click.echo(f"{count} label(s) for {len(items)} item(s) written to {output}")
 
 
 # ---------------- CATEGORIES ----------------
@@ -1145,10 +1412,48 @@ def logs():
     return render_template("logs.html", logs=rows, title="Activity Logs")
 
 
+# ---------------- METRICS ----------------
+@app.route("/metrics")
+@require_login
+@require_role("admin", "superadmin")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+SLOW_QUERY_WINDOWS = {"24h": 1, "7d": 7, "30d": 30}
+
+
+@app.route("/admin/slow-queries")
+@require_login
+@require_role("admin", "superadmin")
+def slow_queries():
+    window = request.args.get("window", "7d")
+    if window not in SLOW_QUERY_WINDOWS:
+        window = "7d"
+    since = (
+        datetime.datetime.now() - datetime.timedelta(days=SLOW_QUERY_WINDOWS[window])
+    ).strftime("%Y-%m-%d %H:%M:%S")
+    return render_template(
+        "slow_queries.html",
+        groups=slow_query_summary(get_db(), since),
+        window=window,
+        windows=SLOW_QUERY_WINDOWS,
+        threshold=slow_log.threshold * 1000,
+        title="Slow Queries"
+    )
+
+
 # ---------------- SERVE UPLOADED IMAGES ----------------
 @app.route("/uploads/<path:filename>")
 def uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    # hashed names are cached for a year, the rest revalidated (static_files.py)
+    immutable = None
+    source = source_of(filename)
+    if source and not storage.exists(filename):
+        # a resized copy that is gone (image replaced, not rendered) -> the
+        # original, which must not be cached under the variant's name
+        filename, immutable = source, False
+    return serve_upload(storage, filename, UPLOADS_OFFLOAD, UPLOADS_ACCEL_PREFIX, immutable)
 
 
 # ---------------- START APP ----------------
@@ -0,0 +1,64 @@
+"""
+Batched writes over large tables.
+
+A migration that fills a new column, index table or aggregate on a live
+database works through the source table in rowid ranges of BACKFILL_BATCH
+rows, committing after each range and pausing briefly, so the shop keeps
+writing while it runs:
+
+    backfill(conn, "orders",
+             "item_count = (SELECT COUNT(*) FROM order_items WHERE order_id = orders.id)",
+             "item_count IS NULL")
+
+    in_batches(conn, "clothing", lambda low, high: conn.execute(
+        "INSERT INTO ... SELECT ... FROM clothing WHERE id > ? AND id <= ?", (low, high)).rowcount)
+
+Each range should skip rows that are already done, so an interrupted
+backfill resumes where it left off. Rows added while it runs are left to
+the triggers that keep the target current.
+"""
+
+from __future__ import annotations
+
+import time
+
+BACKFILL_BATCH = 2_000      # rows per backfill transaction
+BACKFILL_PAUSE = 0.02       # seconds between batches, lets other writers in
+
+
+def in_batches(conn, table, step, batch=BACKFILL_BATCH, pause=BACKFILL_PAUSE):
+    """Call `step(low, high)` for each rowid range (low, high] of `table`, one transaction each.
+
+    Returns the sum of what `step` returns (rows written; None counts as 0).
+    """
+    top = conn.execute(f"SELECT IFNULL(MAX(rowid), 0) FROM {table}").fetchone()[0]
+    written, low = 0, 0
+    while low < top:
+        written += step(low, low + batch) or 0
+        conn.commit()
+        low += batch
+        if pause and low < top:
+            time.sleep(pause)
+    return written
+
+
+def backfill(conn, table, assignments, where, params=(), conflict=None,
+             batch=BACKFILL_BATCH, pause=BACKFILL_PAUSE):
+    """UPDATE [OR `conflict`] `table` SET `assignments` WHERE `where`, one rowid range per transaction.
+
+    `where` should stop matching a row once it is done. Returns the number
+    of rows updated.
+    """
+    verb = f"UPDATE OR {conflict}" if conflict else "UPDATE"
+    sql = f"{verb} {table} SET {assignments} WHERE rowid > ? AND rowid <= ? AND ({where})"
+    return in_batches(
+        conn, table, lambda low, high: conn.execute(sql, (low, high, *params)).rowcount, batch, pause
+    )
+
+
+__all__ = [
+    "BACKFILL_BATCH",
+    "BACKFILL_PAUSE",
+    "in_batches",
+    "backfill",
+]
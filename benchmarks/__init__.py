@@ -0,0 +1,10 @@
+"""
+Load tests for the shop and admin flows.
+
+    python -m benchmarks.run --scale 100k --requests 500          # seed + run in-process
+    python -m benchmarks.run --scale 1k --url http://127.0.0.1:5000 # against a running server
+    python -m benchmarks.compare results/a.json results/b.json
+
+The database is a separate file (default benchmarks/data/bench-<scale>.db)
+passed to the app through INVENTORY_DB; inventory.db is never touched.
+"""
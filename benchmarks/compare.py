@@ -0,0 +1,83 @@
+"""
+Compare two benchmark result files route by route.
+
+    python -m benchmarks.compare results/before.json results/after.json
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Prints p50/p95/p99 and throughput for both runs with the relative change
+(and the datagen time of both databases, when recorded).
+With --threshold, exits with status 1 when any route's p95 got slower by
+more than that many percent (usable as a CI gate).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+COLUMNS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def change(before, after):
+    """Relative change in percent (None when either side is missing or zero)."""
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before, after):
+    """Rows of (route, column, before, after, change %) for routes in either run."""
+    rows = []
+    routes = list(before["routes"]) + [r for r in after["routes"] if r not in before["routes"]]
+    for route in routes:
+        a = before["routes"].get(route, {})
+        b = after["routes"].get(route, {})
+        for column in COLUMNS:
+            rows.append((route, column, a.get(column), b.get(column), change(a.get(column), b.get(column))))
+    return rows
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, help="fail if a p95 regresses by more than this percent")
+    args = parser.parse_args(argv)
+
+    before, after = load(args.before), load(args.after)
+    for label, run in (("before", before), ("after", after)):
+        meta = run["meta"]
+        print(f"{label:<7} {meta['commit']}  scale={meta['scale']}  target={meta['target']}  "
+              f"concurrency={meta['concurrency']}  {meta['started_at']}")
+    if before["meta"]["scale"] != after["meta"]["scale"]:
+        print("warning: the runs used different scales")
+    seeded = [run.get("datagen") and run["datagen"]["seconds"] for run in (before, after)]
+    if all(seeded):
+        print(f"datagen {_fmt(seeded[0])}s -> {_fmt(seeded[1])}s")
+    print()
+
+    print(f"{'route':<14} {'metric':<15} {'before':>10} {'after':>10} {'change':>9}")
+    regressions = []
+    for route, column, a, b, pct in compare(before, after):
+        print(f"{route:<14} {column:<15} {_fmt(a):>10} {_fmt(b):>10} "
+              f"{'-' if pct is None else f'{pct:+.1f}%':>9}")
+        if args.threshold is not None and column == "p95_ms" and pct is not None and pct > args.threshold:
+            regressions.append(f"{route} p95 {pct:+.1f}%")
+
+    if regressions:
+        print("\nregressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Drive the shop and admin flows and report latency percentiles per route.
+
+    python -m benchmarks.run --scale 100k --requests 500 --concurrency 4
+    python -m benchmarks.run --url http://127.0.0.1:5000 --db /srv/bench.db
+
+Without --url the app runs in-process behind Flask's test client (no
+network, measures the app and SQLite). With --url requests go over HTTP to
+a server started against the same database (INVENTORY_DB=... flask run).
+
+Each flow runs --requests times on --concurrency workers:
+
+    shop_browse    GET /shop, /shop?category=..., /shop?page=...
+    shop_search    GET /shop?search=...
+    add_to_cart    POST /cart/add/<id>
+    checkout       POST /checkout (after filling a cart)
+    inventory      GET /inventory (admin), /inventory?q=...
+    admin_orders   GET /admin/orders, ?status=...
+
+Results (requests, errors, req/s, p50/p90/p95/p99/max in ms) are printed
+and written to benchmarks/results/<time>-<commit>-<scale>.json, along with
+the datagen timings (seconds and rows/s per step) of the database, when it
+was seeded by benchmarks.seed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.seed import SCALES, create_schema, default_db_path, load_timings, print_timings, seed
+from datagen import CATEGORIES, GARMENTS
+from slow_queries import percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ADMIN_LOGIN = {"username": "admin", "password": "admin123"}
+PERCENTILES = (50, 90, 95, 99)
+
+
+# ---------------- CLIENTS ----------------
+# Drivers return (status, Location header or "") and never follow redirects.
+class TestClientDriver:
+    """In-process requests through app.test_client()."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def _result(self, response):
+        return response.status_code, response.headers.get("Location", "")
+
+    def get(self, path):
+        return self._result(self.client.get(path))
+
+    def post(self, path, data):
+        return self._result(self.client.post(path, data=data))
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """Requests to a running server; keeps cookies, does not follow redirects."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def _send(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=60) as resp:
+                resp.read()
+                return resp.status, resp.headers.get("Location", "")
+        except urllib.error.HTTPError as e:   # 3xx land here too (redirects are not followed)
+            e.read()
+            return e.code, e.headers.get("Location", "")
+
+    def get(self, path):
+        return self._send(path)
+
+    def post(self, path, data):
+        return self._send(path, data)
+
+
+# ---------------- FLOWS ----------------
+class Catalog:
+    """Ids and terms the flows pick from (read once from the benchmark DB)."""
+
+    def __init__(self, db_path, sample=5_000):
+        conn = sqlite3.connect(db_path)
+        self.variants = conn.execute(
+            "SELECT clothing_id, size FROM clothing_variants WHERE quantity > 100 ORDER BY random() LIMIT ?",
+            (sample,),
+        ).fetchall()
+        self.categories = [r[0] for r in conn.execute("SELECT DISTINCT category FROM clothing")] or CATEGORIES
+        conn.close()
+        self.terms = [g.lower() for g in GARMENTS]
+
+
+def page_ok(status, location):
+    return status in (200, 304)
+
+
+def redirect_ok(*error_paths):
+    """POST handlers redirect both ways; a redirect to an `error_paths` page is a failure."""
+    def check(status, location):
+        path = urllib.parse.urlsplit(location).path
+        return status == 302 and path not in error_paths
+    return check
+
+
+def shop_browse(driver, rng, catalog):
+    path = rng.choice([
+        "/shop",
+        f"/shop?category={urllib.parse.quote(rng.choice(catalog.categories))}",
+        f"/shop?page={rng.randint(2, 5)}",
+        "/shop?sort=price_low",
+    ])
+    return [("shop_browse", lambda: driver.get(path), page_ok)]
+
+
+def shop_search(driver, rng, catalog):
+    path = f"/shop?search={rng.choice(catalog.terms)}"
+    return [("shop_search", lambda: driver.get(path), page_ok)]
+
+
+def add_to_cart(driver, rng, catalog):
+    item_id, size = rng.choice(catalog.variants)
+    # success and "out of stock" both redirect to /shop; a rejected add shows up in checkout
+    return [("add_to_cart", lambda: driver.post(f"/cart/add/{item_id}", {"size": size, "quantity": 1}),
+             redirect_ok())]
+
+
+def checkout(driver, rng, catalog):
+    steps = add_to_cart(driver, rng, catalog)
+    n = rng.randint(0, 10**9)
+    form = {
+        "name": f"Bench {n}", "email": f"bench{n}@example.com", "phone": "9000000000",
+        "address": "1 Bench Road", "city": "Pune", "state": "MH", "zip_code": "411001",
+    }
+    steps.append(("checkout", lambda: driver.post("/checkout", form), redirect_ok("/cart", "/checkout")))
+    return steps
+
+
+def inventory(driver, rng, catalog):
+    path = rng.choice(["/inventory", f"/inventory?page={rng.randint(2, 5)}",
+                       f"/inventory?q={rng.choice(catalog.terms)}"])
+    return [("inventory", lambda: driver.get(path), page_ok)]
+
+
+def admin_orders(driver, rng, catalog):
+    path = rng.choice(["/admin/orders", "/admin/orders?status=pending", "/admin/orders?page=2"])
+    return [("admin_orders", lambda: driver.get(path), page_ok)]
+
+
+FLOWS = {
+    "shop_browse": (shop_browse, False),    # name -> (steps, needs admin login)
+    "shop_search": (shop_search, False),
+    "add_to_cart": (add_to_cart, False),
+    "checkout": (checkout, False),
+    "inventory": (inventory, True),
+    "admin_orders": (admin_orders, True),
+}
+
+
+# ---------------- RUNNER ----------------
+def summarize(latencies, errors, wall):
+    values = sorted(latencies)
+    result = {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / wall, 2) if wall else None,
+        "max_ms": round(values[-1] * 1000, 3) if values else None,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+    }
+    for pct in PERCENTILES:
+        value = percentile(values, pct)
+        result[f"p{pct}_ms"] = round(value * 1000, 3) if value is not None else None
+    return result
+
+
+def run_flow(name, make_driver, catalog, requests, concurrency, seed_value):
+    steps_for, needs_admin = FLOWS[name]
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    per_worker = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random(f"{seed_value}-{name}-{index}")
+        driver = make_driver()
+        if needs_admin:
+            driver.post("/login", ADMIN_LOGIN)
+        local, local_errors = [], 0
+        for _ in range(per_worker[index]):
+            for route, call, ok in steps_for(driver, rng, catalog):
+                start = time.perf_counter()
+                status, location = call()
+                elapsed = time.perf_counter() - start
+                if route != name:
+                    continue   # setup step (e.g. filling the cart before checkout)
+                local.append(elapsed)
+                if not ok(status, location):
+                    local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the shop and admin flows.")
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--db", help="benchmark database (default benchmarks/data/bench-<scale>.db)")
+    parser.add_argument("--url", help="base URL of a running server (default: in-process test client)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per flow")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma-separated subset of flows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=RESULTS_DIR, help="directory for the JSON result")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.abspath(args.db or default_db_path(args.scale))
+    if not os.path.exists(db_path):
+        print(f"seeding {db_path} ({args.scale}) ...")
+        seed(db_path, args.scale, args.seed)
+    datagen = load_timings(db_path)
+    if datagen:
+        print_timings(datagen)
+
+    if args.url:
+        def make_driver():
+            return HttpDriver(args.url)
+    else:
+        app = create_schema(db_path).app
+        app.config["TESTING"] = True
+
+        def make_driver():
+            return TestClientDriver(app)
+
+    catalog = Catalog(db_path)
+    results = {}
+    for name in [f.strip() for f in args.flows.split(",") if f.strip()]:
+        if name not in FLOWS:
+            parser.error(f"unknown flow {name!r} (choose from {', '.join(FLOWS)})")
+        results[name] = run_flow(name, make_driver, catalog, args.requests, args.concurrency, args.seed)
+        r = results[name]
+        print(f"{name:<14} {r['requests']:>6} req  {r['errors']:>4} err  {r['throughput_rps']:>8} req/s  "
+              f"p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  p99 {r['p99_ms']:>8} ms")
+
+    commit = git_commit()
+    now = datetime.datetime.now()
+    report = {
+        "meta": {
+            "commit": commit,
+            "scale": args.scale,
+            "target": args.url or "test-client",
+            "requests_per_flow": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "started_at": now.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "datagen": datagen,
+        "routes": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{now:%Y%m%d-%H%M%S}-{commit}-{args.scale}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
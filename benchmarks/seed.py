@@ -0,0 +1,108 @@
+"""
+Benchmark databases: the app's schema filled by datagen.
+
+    python -m benchmarks.seed --scale 100k --db /tmp/bench.db
+
+The schema comes from app.init_db() (with INVENTORY_DB pointing at the
+benchmark file), so triggers, FTS and indexes are the production ones. The
+history ends on a fixed date, so a scale and seed always give the same rows.
+How long each datagen step took is kept next to the database in
+<db>.datagen.json; benchmarks.run copies it into its results.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+
+from datagen import VOLUMES, generate
+
+SCALES = VOLUMES
+STOCK = 1_000_000   # per product: checkout runs never sell out
+END = datetime.datetime(2025, 1, 1)
+
+
+def default_db_path(scale):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", f"bench-{scale}.db")
+
+
+def create_schema(db_path):
+    """Run the app's init_db() against `db_path`."""
+    os.environ["INVENTORY_DB"] = db_path
+    import app   # reads INVENTORY_DB at import time
+
+    if os.path.abspath(app.DB_PATH) != os.path.abspath(db_path):
+        raise RuntimeError("app was imported before INVENTORY_DB was set")
+    app.init_db()
+    app.cart_sweeper.stop()
+    return app
+
+
+def timings_path(db_path):
+    return db_path + ".datagen.json"
+
+
+def load_timings(db_path):
+    """The datagen timings recorded when `db_path` was seeded (None if unknown)."""
+    try:
+        with open(timings_path(db_path)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def seed(db_path, scale, seed=0):
+    """Create and fill a benchmark database; returns row counts."""
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    create_schema(db_path)
+    steps = {}
+
+    def progress(step, rows, seconds):
+        entry = steps.setdefault(step, {"rows": 0, "seconds": 0.0})
+        entry["rows"] += rows
+        entry["seconds"] += seconds
+
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = generate(conn, SCALES[scale], seed=seed, end=END, stock=STOCK, progress=progress)
+    finally:
+        conn.close()
+    for entry in steps.values():
+        entry["rows_per_s"] = round(entry["rows"] / entry["seconds"]) if entry["seconds"] else None
+        entry["seconds"] = round(entry["seconds"], 3)
+    timings = {
+        "scale": scale,
+        "seed": seed,
+        "seconds": round(sum(e["seconds"] for e in steps.values()), 3),
+        "steps": steps,
+    }
+    with open(timings_path(db_path), "w") as fh:
+        json.dump(timings, fh, indent=2)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--db", help="database file (default benchmarks/data/bench-<scale>.db)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    db_path = args.db or default_db_path(args.scale)
+    counts = seed(db_path, args.scale, args.seed)
+    print(f"{db_path}: " + ", ".join(f"{n} {t}" for t, n in counts.items()))
+    print_timings(load_timings(db_path))
+
+
+def print_timings(timings):
+    print(f"datagen {timings['seconds']:.1f}s")
+    for step, entry in timings["steps"].items():
+        print(f"  {step:<16} {entry['rows']:>9} rows {entry['seconds']:>8.2f}s {entry['rows_per_s'] or '-':>9} rows/s")
+
+
+if __name__ == "__main__":
+    main()
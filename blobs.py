@@ -0,0 +1,200 @@
+"""
+Content-addressed, deduplicated storage for uploaded photos.
+
+An upload is stored once per distinct content, named after its SHA-256:
+
+    img_3f2a9c01d4e7b85a6c0e19d2a4f7b311.jpg        (in the upload storage, storage.py)
+
+`blobs` keeps a reference count per file. Triggers on clothing.image and
+clothing_images.image keep it current, so every insert, update and delete
+of those rows (routes, imports, SQL by hand) is counted. Once no row uses a
+blob any more, collect_garbage() removes it.
+
+    name = store_blob(db, storage, request.files["image"])
+    db.execute("UPDATE clothing SET image=? WHERE id=?", (name, item_id))
+    db.commit()
+    ...
+    collect_garbage(db, storage)            # after deleting rows
+
+Files from before this module keep their names and are not counted;
+`flask dedupe-uploads` moves them into the store.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+BLOB_PREFIX = "img_"
+BLOB_HASH_LEN = 32          # 128 bits of SHA-256: collisions are not a concern
+READ_CHUNK = 1024 * 1024
+SPOOL_MAX = 8 * 1024 * 1024     # larger uploads are hashed via a temp file on disk
+
+_BLOB_NAME = re.compile(r"^%s[0-9a-f]{%d}(\.[a-z0-9]+)?$" % (BLOB_PREFIX, BLOB_HASH_LEN))
+_EXT = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+# (table, column) pairs that reference blobs
+BLOB_REFERENCES = (("clothing", "image"), ("clothing_images", "image"))
+
+
+def is_blob(name):
+    return bool(name) and bool(_BLOB_NAME.match(name))
+
+
+def blob_name(digest, filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    return BLOB_PREFIX + digest[:BLOB_HASH_LEN] + (ext if _EXT.match(ext) else "")
+
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------------- SCHEMA ----------------
+def ensure_blobs(conn):
+    """Create the blobs table and the reference-counting triggers."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            name TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refs INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs(name) WHERE refs <= 0")
+    for table, column in BLOB_REFERENCES:
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_blob_ai AFTER INSERT ON {table}
+            WHEN new.{column} IS NOT NULL BEGIN
+                UPDATE blobs SET refs = refs + 1 WHERE name = new.{column};
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_blob_ad AFTER DELETE ON {table}
+            WHEN old.{column} IS NOT NULL BEGIN
+                UPDATE blobs SET refs = refs - 1 WHERE name = old.{column};
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_blob_au AFTER UPDATE OF {column} ON {table}
+            WHEN old.{column} IS NOT new.{column} BEGIN
+                UPDATE blobs SET refs = refs - 1 WHERE name = old.{column};
+                UPDATE blobs SET refs = refs + 1 WHERE name = new.{column};
+            END;
+        """)
+    conn.commit()
+
+
+# ---------------- STORE ----------------
+def _spool(fileobj):
+    """Copy an upload into a temp file, hashing it on the way. -> (file, digest, size)"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    sha = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = fileobj.read(READ_CHUNK)
+        if not chunk:
+            break
+        sha.update(chunk)
+        spool.write(chunk)
+        size += len(chunk)
+    spool.seek(0)
+    return spool, sha.hexdigest(), size
+
+
+def store_blob(db, storage, upload):
+    """Store a werkzeug FileStorage (or any .stream/.filename object); returns the blob name.
+
+    Opens the write transaction before the file is put in place, so a
+    concurrent collect_garbage() cannot delete it in between. The caller
+    references the name and commits.
+    """
+    stream = getattr(upload, "stream", upload)
+    spool, digest, size = _spool(stream)
+    name = blob_name(digest, getattr(upload, "filename", ""))
+    with spool:
+        db.execute(
+            "INSERT OR IGNORE INTO blobs (name, size, refs, created_at) VALUES (?, ?, 0, ?)",
+            (name, size, _now()),
+        )
+        if not storage.exists(name):     # else: same content already stored
+            storage.put(name, spool, getattr(upload, "mimetype", None))
+    return name
+
+
+# ---------------- GARBAGE COLLECTION ----------------
+def collect_garbage(db, storage, on_remove=None):
+    """Delete blobs no row references any more; returns their names.
+
+    Runs as one IMMEDIATE transaction and removes the files before it
+    commits, so an upload of the same content waits and then stores it
+    again. `on_remove(name)` runs for every removed blob (thumbnails, ...).
+    """
+    db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        names = [row[0] for row in db.execute("SELECT name FROM blobs WHERE refs <= 0")]
+        for name in names:
+            db.execute("DELETE FROM blobs WHERE name = ?", (name,))
+            storage.delete(name)
+            if on_remove is not None:
+                on_remove(name)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return names
+
+
+def dedupe_uploads(db, storage, on_rename=None):
+    """Move pre-blob images into the store, merging identical files.
+
+    Returns (files moved, bytes freed). `on_rename(old_name)` runs for every
+    legacy name that was replaced.
+    """
+    legacy = set()
+    for table, column in BLOB_REFERENCES:
+        legacy.update(
+            row[0] for row in db.execute(
+                f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != ''"
+            )
+        )
+    legacy = sorted(n for n in legacy if not is_blob(n))
+
+    moved = freed = 0
+    for old in legacy:
+        try:
+            data = storage.get(old)
+        except FileNotFoundError:
+            continue
+        before = db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        name = store_blob(db, storage, _Named(io.BytesIO(data), old))
+        if db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == before:
+            freed += len(data)      # identical content was already stored
+        for table, column in BLOB_REFERENCES:
+            db.execute(f"UPDATE {table} SET {column} = ? WHERE {column} = ?", (name, old))
+        db.commit()
+        storage.delete(old)
+        if on_rename is not None:
+            on_rename(old)
+        moved += 1
+    return moved, freed
+
+
+class _Named:
+    """A plain file object with the .stream / .filename of a FileStorage."""
+
+    def __init__(self, stream, filename):
+        self.stream = stream
+        self.filename = filename
+
+
+__all__ = [
+    "BLOB_PREFIX",
+    "is_blob",
+    "blob_name",
+    "ensure_blobs",
+    "store_blob",
+    "collect_garbage",
+    "dedupe_uploads",
+]
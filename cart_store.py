@@ -0,0 +1,221 @@
+"""
+Server-side cart sessions with TTL expiry.
+
+Every cart has a row in `cart_sessions` (random, collision-free id, optional
+owner, last activity). Cart lines in `cart` are keyed by that id. A sweeper
+thread deletes carts idle for longer than CART_TTL in small batches, so
+abandoned carts no longer pile up.
+
+    sid = current_cart_id(db, create=True)  # the visitor's cart id (registered + touched)
+    merge_login_cart(db, "admin:ann")       # at login: adopt the owner's saved cart, rotate the id
+
+    sweeper = CartSweeper(db_pool.connect)
+    sweeper.start()                         # or: flask --app app sweep-carts
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+import secrets
+import threading
+
+from flask import session
+
+log = logging.getLogger(__name__)
+
+CART_TTL = datetime.timedelta(days=int(os.environ.get("CART_TTL_DAYS", 14)))
+TOUCH_EVERY = datetime.timedelta(minutes=5)   # last_seen is only rewritten this often
+SWEEP_INTERVAL = 15 * 60                      # seconds between sweeps
+SWEEP_BATCH = 1000                            # carts deleted per transaction
+
+_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now():
+    return datetime.datetime.now()
+
+
+def new_session_id():
+    """128 bits from the OS CSPRNG: unique across workers, not guessable."""
+    return secrets.token_urlsafe(16)
+
+
+# ---------------- SCHEMA ----------------
+def ensure_cart_store(conn):
+    """Create cart_sessions and register carts that predate it."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cart_sessions (
+            session_id TEXT PRIMARY KEY,
+            owner TEXT,
+            created_at TEXT,
+            last_seen TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_sessions_owner
+        ON cart_sessions(owner) WHERE owner IS NOT NULL
+    """)
+    # legacy carts: their last line's time counts as last activity
+    conn.execute("""
+        INSERT OR IGNORE INTO cart_sessions (session_id, owner, created_at, last_seen)
+        SELECT session_id, NULL, MIN(added_at), IFNULL(MAX(added_at), '')
+        FROM cart
+        WHERE session_id IS NOT NULL
+        GROUP BY session_id
+    """)
+    conn.commit()
+
+
+# ---------------- SESSIONS ----------------
+def touch(db, session_id, owner=None):
+    """Register the cart or refresh its last_seen (at most every TOUCH_EVERY)."""
+    now = _now()
+    db.execute(
+        """
+        INSERT INTO cart_sessions (session_id, owner, created_at, last_seen)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(session_id) DO UPDATE SET last_seen = excluded.last_seen
+        WHERE last_seen IS NULL OR last_seen < ?
+        """,
+        (session_id, owner, now.strftime(_FMT), now.strftime(_FMT),
+         (now - TOUCH_EVERY).strftime(_FMT)),
+    )
+
+
+def current_cart_id(db, create=False):
+    """The visitor's cart id from the Flask session ("" if none and not `create`).
+
+    The caller commits.
+    """
+    sid = session.get("session_id", "")
+    if not sid and create:
+        sid = session["session_id"] = new_session_id()
+    if sid:
+        touch(db, sid)
+    return sid
+
+
+def merge_carts(db, source, target):
+    """Move every line of cart `source` into cart `target` (same item/size: quantities add)."""
+    if not source or source == target:
+        return
+    db.execute(
+        """
+        UPDATE cart SET quantity = quantity + (
+            SELECT SUM(s.quantity) FROM cart s
+            WHERE s.session_id = ? AND s.clothing_id = cart.clothing_id AND s.size = cart.size
+        )
+        WHERE session_id = ? AND EXISTS (
+            SELECT 1 FROM cart s
+            WHERE s.session_id = ? AND s.clothing_id = cart.clothing_id AND s.size = cart.size
+        )
+        """,
+        (source, target, source),
+    )
+    db.execute(
+        """
+        UPDATE cart SET session_id = ?
+        WHERE session_id = ? AND NOT EXISTS (
+            SELECT 1 FROM cart t
+            WHERE t.session_id = ? AND t.clothing_id = cart.clothing_id AND t.size = cart.size
+        )
+        """,
+        (target, source, target),
+    )
+    db.execute("DELETE FROM cart WHERE session_id = ?", (source,))
+    db.execute("DELETE FROM cart_sessions WHERE session_id = ?", (source,))
+
+
+def merge_login_cart(db, owner):
+    """At login: fold the anonymous cart into the owner's saved cart under a fresh id.
+
+    The id is rotated so a cart id seen before login cannot be reused
+    afterwards. Commits.
+    """
+    new_id = new_session_id()
+    touch(db, new_id)
+
+    saved = db.execute(
+        "SELECT session_id FROM cart_sessions WHERE owner = ?", (owner,)
+    ).fetchone()
+    if saved:
+        merge_carts(db, saved["session_id"], new_id)
+    merge_carts(db, session.get("session_id", ""), new_id)
+
+    db.execute("UPDATE cart_sessions SET owner = ? WHERE session_id = ?", (owner, new_id))
+    db.commit()
+    session["session_id"] = new_id
+    return new_id
+
+
+# ---------------- EXPIRY ----------------
+def sweep(db, ttl=CART_TTL, batch=SWEEP_BATCH):
+    """Delete carts idle for longer than `ttl`, `batch` carts per transaction. Returns the count."""
+    cutoff = (_now() - ttl).strftime(_FMT)
+    removed = 0
+    while True:
+        ids = [
+            row[0] for row in db.execute(
+                "SELECT session_id FROM cart_sessions WHERE last_seen < ? LIMIT ?",
+                (cutoff, batch),
+            )
+        ]
+        if not ids:
+            return removed
+        marks = ",".join("?" * len(ids))
+        db.execute(f"DELETE FROM cart WHERE session_id IN ({marks})", ids)
+        db.execute(f"DELETE FROM cart_sessions WHERE session_id IN ({marks})", ids)
+        db.commit()
+        removed += len(ids)
+
+
+class CartSweeper:
+    """Daemon thread running sweep() every `interval` seconds on its own connection."""
+
+    def __init__(self, connect, interval=SWEEP_INTERVAL, ttl=CART_TTL):
+        self.connect = connect
+        self.interval = interval
+        self.ttl = ttl
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="cart-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                conn = self.connect()
+                try:
+                    removed = sweep(conn, self.ttl)
+                finally:
+                    conn.close()
+                if removed:
+                    log.info("cart sweeper removed %d expired carts", removed)
+            except Exception:
+                log.exception("cart sweep failed")
+            self._stop.wait(self.interval)
+
+
+__all__ = [
+    "CART_TTL",
+    "new_session_id",
+    "ensure_cart_store",
+    "touch",
+    "current_cart_id",
+    "merge_carts",
+    "merge_login_cart",
+    "sweep",
+    "CartSweeper",
+]
@@ -12,48 +12,103 @@ from __future__ import annotations
 import datetime
 from math import ceil
 
-from flask import flash, redirect, render_template, request, session, url_for
+from flask import flash, make_response, redirect, render_template, request, session, url_for
+
+from cart_store import current_cart_id
+from gallery import load_gallery_map
+from images import load_thumb_map
+from order_numbers import next_order_number
+from page_cache import PageCache, catalog_version, page_etag
+from pagination import Keyset, cached_count, page_window
+from search import clothing_search, customer_search, order_search
+from variants import find_variant, load_variant_map
+
+# extra gallery thumbnails shown under each product card on /shop
+SHOP_GALLERY_THUMBS = 3
+
+# the only query args /shop output depends on (the page-cache key)
+SHOP_CACHE_ARGS = ("category", "search", "sort", "page", "cursor")
 
 
 def register_customer_routes(app, get_db, log_action, require_login, require_role):
+    shop_cache = PageCache()
+    app.extensions["shop_cache"] = shop_cache
+
     # ---------------- SHOP HOME PAGE ----------------
     @app.route("/shop")
     def shop():
         db = get_db()
 
+        # admins see their own navbar and flashes are one-off: render those live
+        if session.get("admin") or session.get("_flashes"):
+            return render_shop(db)
+
+        version, changed_at = catalog_version(db)
+        key = tuple(request.args.get(arg, "") for arg in SHOP_CACHE_ARGS)
+        etag = page_etag(key, version)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and changed_at <= since
+        if not_modified:
+            response = make_response("", 304)
+        else:
+            body = shop_cache.get(key, version)
+            if body is None:
+                body = render_shop(db)
+                shop_cache.put(key, version, body)
+            response = make_response(body)
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = changed_at
+        response.cache_control.public = True
+        response.cache_control.no_cache = True   # revalidate every time; 304 is cheap
+        response.vary.add("Cookie")
+        return response
+
+    def render_shop(db):
         category_filter = request.args.get("category", "").strip()
         search = request.args.get("search", "").strip()
-        sort = request.args.get("sort", "created_desc")
+        sort = request.args.get("sort", "relevance" if search else "created_desc")
         page = int(request.args.get("page", 1))
         per_page = 12
 
+        from_clause = "FROM clothing"
+        columns = "clothing.*"
         where_clause = "WHERE quantity > 0"
         params = []
 
-        if category_filter:
-            where_clause += " AND category = ?"
-            params.append(category_filter)
-
-        if search:
+        fts = clothing_search(search)
+        if fts:
+            # ranked full-text matches; the join placeholder precedes the WHERE ones
+            join_sql, params = fts
+            from_clause += f" {join_sql}"
+            columns += ", f.rank AS rank"
+        elif search:
             where_clause += " AND (name LIKE ? OR category LIKE ?)"
             like = f"%{search}%"
             params.extend([like, like])
 
+        if category_filter:
+            where_clause += " AND category = ?"
+            params.append(category_filter)
+
         sort_map = {
-            "created_desc": "created_at DESC",
-            "created_asc": "created_at ASC",
-            "price_low": "price ASC",
-            "price_high": "price DESC",
-            "name_asc": "name ASC",
-            "name_desc": "name DESC",
+            "relevance": ("f.rank", False),
+            "created_desc": ("created_at", True),
+            "created_asc": ("created_at", False),
+            "price_low": ("price", False),
+            "price_high": ("price", True),
+            "name_asc": ("name", False),
+            "name_desc": ("name", True),
         }
-        order_by = sort_map.get(sort, "created_at DESC")
+        sort_column, descending = sort_map.get(sort, ("created_at", True))
+        if sort_column == "f.rank" and not fts:
+            sort_column, descending = "created_at", True
 
-        count_row = db.execute(
-            f"SELECT COUNT(*) AS c FROM clothing {where_clause}",
-            params,
-        ).fetchone()
-        total_items = count_row["c"] if count_row else 0
+        total_items = cached_count(db, f"SELECT COUNT(*) AS c {from_clause} {where_clause}", params)
         total_pages = max(1, ceil(total_items / per_page)) if total_items else 1
 
         if page > total_pages:
@@ -61,33 +116,53 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
         if page < 1:
             page = 1
 
-        offset = (page - 1) * per_page
+        keyset = Keyset(sort_column, descending, request.args.get("cursor"), tiebreak="clothing.id")
+        if keyset.active:
+            # cursor mode: range scan from the previous page's boundary row
+            where_clause += f" AND {keyset.where}"
+            params += keyset.params
+            offset = 0
+        else:
+            offset = (page - 1) * per_page
 
         products = db.execute(
             f"""
-            SELECT * FROM clothing
+            SELECT {columns} {from_clause}
             {where_clause}
-            ORDER BY {order_by}
+            ORDER BY {keyset.order_by}
             LIMIT ? OFFSET ?
             """,
-            params + [per_page, offset],
+            params + [per_page + 1, offset],
         ).fetchall()
+        products, next_cursor, prev_cursor = keyset.paginate(products, per_page, has_prev=page > 1)
+        gallery_map = load_gallery_map(db, [p["id"] for p in products], limit=SHOP_GALLERY_THUMBS)
+        variant_map = load_variant_map(db, [p["id"] for p in products], in_stock=True)
+        thumbs = load_thumb_map(
+            db, [p["image"] for p in products] + [g["image"] for imgs in gallery_map.values() for g in imgs]
+        )
 
+        # in-stock categories from the per-category totals (stats.py), not a pass over clothing
         categories = db.execute(
-            "SELECT DISTINCT category FROM clothing WHERE quantity > 0 ORDER BY category",
+            "SELECT NULLIF(category, '') AS category FROM category_stats WHERE qty > 0 ORDER BY category",
         ).fetchall()
 
-        pages = list(range(1, total_pages + 1))
+        pages = page_window(page, total_pages)
 
         return render_template(
             "shop.html",
             products=products,
+            gallery_map=gallery_map,
+            variant_map=variant_map,
+            thumbs=thumbs,
             categories=categories,
             category_filter=category_filter,
             search=search,
             sort=sort,
             page=page,
             pages=pages,
+            total_pages=total_pages,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
             total_items=total_items,
             title="Shop - Clothing Store",
         )
@@ -95,22 +170,21 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
     # ---------------- ADD TO CART ----------------
     @app.route("/cart/add/<int:item_id>", methods=["POST"])
     def add_to_cart(item_id):
-        if "session_id" not in session:
-            session["session_id"] = str(datetime.datetime.now().timestamp())
-
         size = request.form.get("size", "M")
         quantity = int(request.form.get("quantity", 1))
 
         db = get_db()
         item = db.execute("SELECT * FROM clothing WHERE id=?", (item_id,)).fetchone()
+        variant = find_variant(db, item_id, size) if item else None
 
-        if not item or item["quantity"] < quantity:
-            flash("Item not available or insufficient stock.", "danger")
+        if not variant or quantity < 1 or variant["quantity"] < quantity:
+            flash("Item not available in that size or insufficient stock.", "danger")
             return redirect(url_for("shop"))
 
+        session_id = current_cart_id(db, create=True)
         existing = db.execute(
             "SELECT * FROM cart WHERE session_id=? AND clothing_id=? AND size=?",
-            (session["session_id"], item_id, size),
+            (session_id, item_id, size),
         ).fetchone()
 
         if existing:
@@ -123,7 +197,7 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
                 VALUES (?, ?, ?, ?, ?)
                 """,
                 (
-                    session["session_id"],
+                    session_id,
                     item_id,
                     size,
                     quantity,
@@ -139,7 +213,7 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
     @app.route("/cart")
     def view_cart():
         db = get_db()
-        session_id = session.get("session_id", "")
+        session_id = current_cart_id(db)
 
         cart_items = []
         total = 0
@@ -159,10 +233,12 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             cart_items = rows
             for row in rows:
                 total += row["price"] * row["quantity"]
+            db.commit()  # last_seen
 
         return render_template(
             "cart.html",
             cart_items=cart_items,
+            thumbs=load_thumb_map(db, [it["image"] for it in cart_items]),
             total=total,
             title="Shopping Cart",
         )
@@ -171,7 +247,10 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
     @app.route("/cart/remove/<int:cart_id>")
     def remove_from_cart(cart_id):
         db = get_db()
-        db.execute("DELETE FROM cart WHERE id=?", (cart_id,))
+        db.execute(
+            "DELETE FROM cart WHERE id=? AND session_id=?",
+            (cart_id, session.get("session_id", "")),
+        )
         db.commit()
         flash("Item removed from cart.", "success")
         return redirect(url_for("view_cart"))
@@ -195,146 +274,137 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
                 flash("Please fill all required fields.", "danger")
                 return redirect(url_for("checkout"))
 
-            customer = db.execute("SELECT * FROM customers WHERE email=?", (email,)).fetchone()
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            if not customer:
-                db.execute(
-                    """
-                    INSERT INTO customers (name, email, phone, address, city, state, zip_code, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        name,
-                        email,
-                        phone,
-                        address,
-                        city,
-                        state,
-                        zip_code,
-                        datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    ),
-                )
-                db.commit()
-                customer = db.execute("SELECT * FROM customers WHERE email=?", (email,)).fetchone()
-            else:
-                db.execute(
+            # Everything below runs in one write transaction: BEGIN IMMEDIATE takes
+            # the write lock up front, so the stock we read cannot change under us.
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                cart_items = db.execute(
                     """
-                    UPDATE customers SET name=?, phone=?, address=?, city=?, state=?, zip_code=?
-                    WHERE id=?
+                    SELECT c.*, cl.name, cl.price, v.quantity AS stock
+                    FROM cart c
+                    JOIN clothing cl ON c.clothing_id = cl.id
+                    LEFT JOIN clothing_variants v ON v.clothing_id = c.clothing_id AND v.size = c.size
+                    WHERE c.session_id = ?
                     """,
-                    (name, phone, address, city, state, zip_code, customer["id"]),
-                )
-                db.commit()
-
-            cart_items = db.execute(
-                """
-                SELECT c.*, cl.name, cl.price
-                FROM cart c
-                JOIN clothing cl ON c.clothing_id = cl.id
-                WHERE c.session_id = ?
-                """,
-                (session_id,),
-            ).fetchall()
+                    (session_id,),
+                ).fetchall()
 
-            if not cart_items:
-                flash("Your cart is empty.", "danger")
-                return redirect(url_for("view_cart"))
-
-            total = 0
-            for item in cart_items:
-                clothing = db.execute("SELECT * FROM clothing WHERE id=?", (item["clothing_id"],)).fetchone()
-                if clothing["quantity"] < item["quantity"]:
-                    flash(f"{item['name']} is out of stock.", "danger")
+                if not cart_items:
+                    db.rollback()
+                    flash("Your cart is empty.", "danger")
                     return redirect(url_for("view_cart"))
-                total += item["price"] * item["quantity"]
 
-            order_number = f"ORD-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+                for item in cart_items:
+                    if (item["stock"] or 0) < item["quantity"]:
+                        db.rollback()
+                        flash(f"{item['name']} ({item['size']}) is out of stock.", "danger")
+                        return redirect(url_for("view_cart"))
 
-            db.execute(
-                """
-                INSERT INTO orders (
-                    order_number, customer_id, total_amount,
-                    status, payment_status, shipping_address, notes,
-                    created_at, updated_at
+                # conditional decrement of the size's stock: a row only changes if
+                # enough is left (clothing.quantity follows via the variant triggers)
+                cur = db.executemany(
+                    """
+                    UPDATE clothing_variants SET quantity = quantity - ?
+                    WHERE clothing_id=? AND size=? AND quantity >= ?
+                    """,
+                    [
+                        (item["quantity"], item["clothing_id"], item["size"], item["quantity"])
+                        for item in cart_items
+                    ],
                 )
-                VALUES (?, ?, ?, 'pending', 'unpaid', ?, '', ?, ?)
-                """,
-                (
-                    order_number,
-                    customer["id"],
-                    total,
-                    address,
-                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ),
-            )
-            db.commit()
+                if cur.rowcount != len(cart_items):
+                    db.rollback()
+                    flash("Some items in your cart are no longer available in that quantity.", "danger")
+                    return redirect(url_for("view_cart"))
 
-            order = db.execute("SELECT * FROM orders WHERE order_number=?", (order_number,)).fetchone()
+                total = sum(item["price"] * item["quantity"] for item in cart_items)
+
+                customer = db.execute("SELECT id FROM customers WHERE email=?", (email,)).fetchone()
+                if customer:
+                    customer_id = customer["id"]
+                    db.execute(
+                        """
+                        UPDATE customers SET name=?, phone=?, address=?, city=?, state=?, zip_code=?
+                        WHERE id=?
+                        """,
+                        (name, phone, address, city, state, zip_code, customer_id),
+                    )
+                else:
+                    customer_id = db.execute(
+                        """
+                        INSERT INTO customers (name, email, phone, address, city, state, zip_code, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (name, email, phone, address, city, state, zip_code, now),
+                    ).lastrowid
+
+                order_number = next_order_number()
+
+                order_id = db.execute(
+                    """
+                    INSERT INTO orders (
+                        order_number, customer_id, total_amount,
+                        status, payment_status, shipping_address, notes,
+                        created_at, updated_at
+                    )
+                    VALUES (?, ?, ?, 'pending', 'unpaid', ?, '', ?, ?)
+                    """,
+                    (order_number, customer_id, total, address, now, now),
+                ).lastrowid
 
-            for item in cart_items:
-                db.execute(
+                db.executemany(
                     """
                     INSERT INTO order_items (order_id, clothing_id, size, quantity, price)
                     VALUES (?, ?, ?, ?, ?)
                     """,
-                    (order["id"], item["clothing_id"], item["size"], item["quantity"], item["price"]),
-                )
-
-                db.execute(
-                    "UPDATE clothing SET quantity = quantity - ? WHERE id=?",
-                    (item["quantity"], item["clothing_id"]),
+                    [
+                        (order_id, item["clothing_id"], item["size"], item["quantity"], item["price"])
+                        for item in cart_items
+                    ],
                 )
 
-                db.execute(
+                db.executemany(
                     """
                     INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
                     VALUES (?, 'out', ?, 'Order placed', 'system', ?)
                     """,
-                    (
-                        item["clothing_id"],
-                        -item["quantity"],
-                        datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    ),
+                    [(item["clothing_id"], -item["quantity"], now) for item in cart_items],
                 )
 
-            db.commit()
-
-            db.execute(
-                """
-                INSERT INTO notifications (type, recipient, title, message, order_id, created_at)
-                VALUES (?, 'admin', 'New Order Placed', ?, ?, ?)
-                """,
-                (
-                    "order_placed",
-                    f"New order {order_number} from {name} (${total:.2f})",
-                    order["id"],
-                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ),
-            )
-
-            db.execute(
-                """
-                INSERT INTO notifications (type, recipient, title, message, order_id, created_at)
-                VALUES (?, ?, 'Order Confirmed', ?, ?, ?)
-                """,
-                (
-                    "order_placed",
-                    customer["id"],
-                    f"Your order {order_number} has been received. Total: ${total:.2f}",
-                    order["id"],
-                    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ),
-            )
-
-            db.commit()
+                db.executemany(
+                    """
+                    INSERT INTO notifications (type, recipient, title, message, order_id, created_at)
+                    VALUES ('order_placed', ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            "admin",
+                            "New Order Placed",
+                            f"New order {order_number} from {name} (${total:.2f})",
+                            order_id,
+                            now,
+                        ),
+                        (
+                            customer_id,
+                            "Order Confirmed",
+                            f"Your order {order_number} has been received. Total: ${total:.2f}",
+                            order_id,
+                            now,
+                        ),
+                    ],
+                )
 
-            db.execute("DELETE FROM cart WHERE session_id=?", (session_id,))
-            db.commit()
+                db.execute("DELETE FROM cart WHERE session_id=?", (session_id,))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
 
             log_action("order_placed", f"Order {order_number} placed by {name}")
             flash(f"Order placed successfully! Order ID: {order_number}", "success")
-            return redirect(url_for("order_confirmation", order_id=order["id"]))
+            return redirect(url_for("order_confirmation", order_id=order_id))
 
         cart_items = []
         total = 0
@@ -381,6 +451,7 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             "order_confirmation.html",
             order=order,
             items=items,
+            thumbs=load_thumb_map(db, [it["image"] for it in items]),
             customer=customer,
             title="Order Confirmation",
         )
@@ -434,16 +505,21 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             where_clause += " AND o.status = ?"
             params.append(status_filter)
 
-        if search:
+        fts = order_search(search)
+        if fts:
+            fts_where, fts_params = fts
+            where_clause += f" AND {fts_where}"
+            params.extend(fts_params)
+        elif search:
             where_clause += " AND (o.order_number LIKE ? OR c.name LIKE ? OR c.email LIKE ?)"
             like = f"%{search}%"
             params.extend([like, like, like])
 
-        count_row = db.execute(
+        total = cached_count(
+            db,
             f"SELECT COUNT(*) AS cnt FROM orders o JOIN customers c ON o.customer_id = c.id {where_clause}",
             params,
-        ).fetchone()
-        total = count_row["cnt"] if count_row else 0
+        )
         total_pages = max(1, ceil(total / per_page)) if total else 1
 
         if page > total_pages:
@@ -451,7 +527,13 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
         if page < 1:
             page = 1
 
-        offset = (page - 1) * per_page
+        keyset = Keyset("o.created_at", True, request.args.get("cursor"), tiebreak="o.id")
+        if keyset.active:
+            where_clause += f" AND {keyset.where}"
+            params += keyset.params
+            offset = 0
+        else:
+            offset = (page - 1) * per_page
 
         orders = db.execute(
             f"""
@@ -459,13 +541,14 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             FROM orders o
             JOIN customers c ON o.customer_id = c.id
             {where_clause}
-            ORDER BY o.created_at DESC
+            ORDER BY {keyset.order_by}
             LIMIT ? OFFSET ?
             """,
-            params + [per_page, offset],
+            params + [per_page + 1, offset],
         ).fetchall()
+        orders, next_cursor, prev_cursor = keyset.paginate(orders, per_page, has_prev=page > 1)
 
-        pages = list(range(1, total_pages + 1))
+        pages = page_window(page, total_pages)
 
         return render_template(
             "admin_orders.html",
@@ -474,6 +557,9 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             search=search,
             page=page,
             pages=pages,
+            total_pages=total_pages,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
             total=total,
             title="Order Management",
         )
@@ -556,6 +642,7 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             "admin_order_detail.html",
             order=order,
             items=items,
+            thumbs=load_thumb_map(db, [it["image"] for it in items]),
             customer=customer,
             title="Order Details",
         )
@@ -571,16 +658,20 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
         page = int(request.args.get("page", 1))
         per_page = 15
 
+        from_clause = "FROM customers c"
         where_clause = "WHERE 1=1"
         params = []
 
-        if search:
+        fts = customer_search(search)
+        if fts:
+            join_sql, params = fts
+            from_clause += f" {join_sql}"
+        elif search:
             where_clause += " AND (name LIKE ? OR email LIKE ? OR phone LIKE ?)"
             like = f"%{search}%"
             params.extend([like, like, like])
 
-        count_row = db.execute(f"SELECT COUNT(*) AS cnt FROM customers {where_clause}", params).fetchone()
-        total = count_row["cnt"] if count_row else 0
+        total = cached_count(db, f"SELECT COUNT(*) AS cnt {from_clause} {where_clause}", params)
         total_pages = max(1, ceil(total / per_page)) if total else 1
 
         if page > total_pages:
@@ -588,22 +679,28 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
         if page < 1:
             page = 1
 
-        offset = (page - 1) * per_page
+        keyset = Keyset("c.created_at", True, request.args.get("cursor"), tiebreak="c.id")
+        if keyset.active:
+            where_clause += f" AND {keyset.where}"
+            params += keyset.params
+            offset = 0
+        else:
+            offset = (page - 1) * per_page
 
         customers = db.execute(
             f"""
-            SELECT c.*, COUNT(o.id) AS order_count
-            FROM customers c
-            LEFT JOIN orders o ON c.id = o.customer_id
+            SELECT c.*,
+                   (SELECT COUNT(*) FROM orders o WHERE o.customer_id = c.id) AS order_count
+            {from_clause}
             {where_clause}
-            GROUP BY c.id
-            ORDER BY c.created_at DESC
+            ORDER BY {keyset.order_by}
             LIMIT ? OFFSET ?
             """,
-            params + [per_page, offset],
+            params + [per_page + 1, offset],
         ).fetchall()
+        customers, next_cursor, prev_cursor = keyset.paginate(customers, per_page, has_prev=page > 1)
 
-        pages = list(range(1, total_pages + 1))
+        pages = page_window(page, total_pages)
 
         return render_template(
             "admin_customers.html",
@@ -611,6 +708,9 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             search=search,
             page=page,
             pages=pages,
+            total_pages=total_pages,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
             total=total,
             title="Customer Management",
         )
@@ -629,8 +729,7 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
         page = int(request.args.get("page", 1))
         per_page = 20
 
-        count_row = db.execute("SELECT COUNT(*) AS cnt FROM notifications WHERE recipient='admin'").fetchone()
-        total = count_row["cnt"] if count_row else 0
+        total = cached_count(db, "SELECT COUNT(*) AS cnt FROM notifications WHERE recipient='admin'")
         total_pages = max(1, ceil(total / per_page)) if total else 1
 
         if page > total_pages:
@@ -638,19 +737,28 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
         if page < 1:
             page = 1
 
-        offset = (page - 1) * per_page
+        where_clause = "WHERE recipient='admin'"
+        params = []
+        keyset = Keyset("created_at", True, request.args.get("cursor"))
+        if keyset.active:
+            where_clause += f" AND {keyset.where}"
+            params += keyset.params
+            offset = 0
+        else:
+            offset = (page - 1) * per_page
 
         notifications = db.execute(
-            """
+            f"""
             SELECT * FROM notifications
-            WHERE recipient='admin'
-            ORDER BY created_at DESC
+            {where_clause}
+            ORDER BY {keyset.order_by}
             LIMIT ? OFFSET ?
             """,
-            (per_page, offset),
+            params + [per_page + 1, offset],
         ).fetchall()
+        notifications, next_cursor, prev_cursor = keyset.paginate(notifications, per_page, has_prev=page > 1)
 
-        pages = list(range(1, total_pages + 1))
+        pages = page_window(page, total_pages)
 
         return render_template(
             "admin_notifications.html",
@@ -658,6 +766,9 @@ def register_customer_routes(app, get_db, log_action, require_login, require_rol
             unread_count=unread_count,
             page=page,
             pages=pages,
+            total_pages=total_pages,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
             total=total,
             title="Notifications",
         )
@@ -0,0 +1,338 @@
+"""
+Synthetic data for large local databases.
+
+Fills clothing (+ gallery images and per-size stock), customers, orders,
+order_items, stock_logs, notifications and carts with skewed, repeatable
+data: a few categories and products take most of the sales, most orders
+have one or two lines, repeat customers place most orders, and old orders
+are mostly delivered while recent ones are still pending.
+
+    flask --app app generate-data --volume 100k --seed 7
+    flask --app app generate-data --products 50000 --orders 0 --end 2025-06-30
+
+    counts = generate(conn, VOLUMES["1m"], seed=7, end=datetime.datetime(2025, 6, 30))
+
+The schema (tables, triggers, FTS) must exist: run init_db() first. Rows are
+appended after the existing ones with explicit ids and written with
+executemany, committing every BATCH rows. The triggers on the catalog and
+customer tables are dropped for the load (their SQL is kept in
+`datagen_triggers`) and what they maintain is rebuilt once at the end:
+variants, SKUs, the FTS indexes, category stats and the catalog version. A
+run that dies half-way leaves the saved triggers behind; the next
+generate() rebuilds and restores them first. The same seed and `end` give
+the same rows.
+"""
+
+from __future__ import annotations
+
+import datetime
+import itertools
+import random
+import time
+from dataclasses import dataclass
+
+from db_indexes import refresh_stats
+from inventory_io import backfill_skus
+from page_cache import bump_catalog_version
+from search import rebuild_search_index
+from stats import rebuild_stats
+from variants import seed_variants
+
+BATCH = 10_000
+# tables whose triggers are off during a load; rebuilt by _restore_triggers()
+# (the blob refcount triggers have nothing to count: generated images are not blobs)
+SUSPENDED_TABLES = ("clothing", "clothing_images", "clothing_variants", "customers")
+
+CATEGORIES = ["Men", "Women", "Kids", "Ethnic Wear", "Formal Wear", "Sportswear", "Winter Wear", "Accessories"]
+CATEGORY_WEIGHTS = [30, 34, 12, 9, 6, 5, 3, 1]        # share of the catalog and of sales
+GARMENTS = ["Shirt", "T-Shirt", "Jeans", "Kurta", "Dress", "Jacket", "Hoodie", "Saree", "Blazer", "Shorts"]
+COLOURS = ["Red", "Blue", "Black", "White", "Green", "Beige", "Navy", "Grey", "Maroon", "Olive"]
+SIZE_LISTS = [("S/M/L", 40), ("M/L/XL", 25), ("S/M/L/XL", 20), ("Free Size", 10), ("28/30/32/34", 5)]
+CITIES = [("Pune", "MH"), ("Mumbai", "MH"), ("Delhi", "DL"), ("Bengaluru", "KA"), ("Chennai", "TN"),
+          ("Kolkata", "WB"), ("Hyderabad", "TS"), ("Jaipur", "RJ"), ("Lucknow", "UP"), ("Surat", "GJ")]
+
+LINES_PER_ORDER = [(1, 50), (2, 25), (3, 12), (4, 7), (5, 4), (6, 2)]
+# status mix by order age in days: (max age, [(status, weight), ...])
+STATUS_BY_AGE = [
+    (2, [("pending", 70), ("processing", 25), ("cancelled", 5)]),
+    (7, [("pending", 15), ("processing", 40), ("shipped", 40), ("cancelled", 5)]),
+    (None, [("shipped", 5), ("delivered", 85), ("cancelled", 10)]),
+]
+STATUS_NOTIFICATIONS = {"shipped": "order_shipped", "delivered": "order_delivered"}
+
+_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass(frozen=True)
+class Volume:
+    products: int
+    customers: int
+    orders: int
+    carts: int
+    images_per_product: float = 0.3     # average gallery images per product
+    days: int = 730                     # history span ending at `end`
+
+
+VOLUMES = {
+    "1k": Volume(products=1_000, customers=300, orders=1_000, carts=100),
+    "100k": Volume(products=100_000, customers=20_000, orders=100_000, carts=5_000),
+    "1m": Volume(products=1_000_000, customers=100_000, orders=1_000_000, carts=20_000),
+}
+
+
+# ---------------- HELPERS ----------------
+def _weighted(pairs):
+    values, weights = zip(*pairs)
+    return list(values), list(itertools.accumulate(weights))
+
+
+def _skewed_index(rng, n, power=3.0):
+    """0..n-1, heavily biased towards 0 (rank ~ popularity)."""
+    return int(n * rng.random() ** power)
+
+
+def _next_id(conn, table):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    top = conn.execute(f"SELECT IFNULL(MAX(id), 0) FROM {table}").fetchone()[0]
+    return max(row[0] if row else 0, top) + 1
+
+
+def _insert(conn, sql, rows):
+    """executemany in BATCH-sized chunks, one transaction each; returns the row count."""
+    rows = iter(rows)
+    total = 0
+    while batch := list(itertools.islice(rows, BATCH)):
+        with conn:
+            conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def _suspend_triggers(conn, tables=SUSPENDED_TABLES):
+    """Drop the triggers on `tables`, saving their SQL in datagen_triggers."""
+    conn.execute("CREATE TABLE IF NOT EXISTS datagen_triggers (name TEXT PRIMARY KEY, sql TEXT NOT NULL)")
+    marks = ",".join("?" * len(tables))
+    triggers = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({marks})", tables
+    ).fetchall()
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO datagen_triggers (name, sql) VALUES (?, ?)", triggers)
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+
+
+def _restore_triggers(conn, first_product=1):
+    """Rebuild what the suspended triggers maintain, then recreate them.
+
+    Every step is idempotent, so an interrupted restore can simply run again.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'datagen_triggers'"
+    ).fetchone()
+    triggers = conn.execute("SELECT name, sql FROM datagen_triggers").fetchall() if exists else []
+    if not triggers:
+        return False
+    seed_variants(conn, first_product)
+    backfill_skus(conn)
+    conn.commit()
+    rebuild_search_index(conn)
+    rebuild_stats(conn)
+    with conn:
+        for _, sql in triggers:
+            conn.execute(sql)
+        conn.execute("DELETE FROM datagen_triggers")
+    bump_catalog_version(conn)
+    return True
+
+
+# ---------------- GENERATOR ----------------
+def generate(conn, volume, seed=0, end=None, stock=None, progress=None):
+    """Append `volume` worth of rows; returns {table: rows written}.
+
+    `stock` fixes every product's quantity (the benchmarks use a huge value so
+    checkouts never sell out); by default most products have a little stock
+    and some none. `progress(step, rows, seconds)` is called after each table
+    and after the final "rebuild" of the derived tables.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.datetime.now().replace(microsecond=0)
+    start = end - datetime.timedelta(days=volume.days)
+    span = volume.days * 86400
+    categories, category_cum = _weighted(zip(CATEGORIES, CATEGORY_WEIGHTS))
+    size_lists, size_cum = _weighted(SIZE_LISTS)
+    line_counts, line_cum = _weighted(LINES_PER_ORDER)
+    counts = {}
+
+    def stamp(seconds_after_start):
+        return (start + datetime.timedelta(seconds=seconds_after_start)).strftime(_FMT)
+
+    clock = [time.perf_counter()]
+
+    def report(step, rows):
+        now = time.perf_counter()
+        if progress:
+            progress(step, rows, now - clock[0])
+        clock[0] = now
+
+    def done(table, rows):
+        counts[table] = counts.get(table, 0) + rows
+        report(table, rows)
+
+    conn.execute("PRAGMA synchronous=OFF")
+    _restore_triggers(conn)   # left behind by an interrupted run
+    conn.executemany(
+        "INSERT OR IGNORE INTO categories (name, description) VALUES (?, ?)",
+        [(c, f"{c} collection") for c in CATEGORIES],
+    )
+    conn.commit()
+
+    # -- products: ids in popularity order, so a skewed index is a popular product
+    first_product = _next_id(conn, "clothing")
+    _suspend_triggers(conn)
+    clock[0] = time.perf_counter()
+    prices, sizes, created, quantities = [], [], [], []
+
+    def products():
+        for i in range(volume.products):
+            size_text = rng.choices(size_lists, cum_weights=size_cum)[0]
+            price = round(rng.lognormvariate(7, 0.6), 2)
+            at = rng.randrange(span)
+            prices.append(price)
+            sizes.append(size_text.split("/"))
+            created.append(at)
+            if stock is not None:
+                qty = stock
+            else:
+                qty = 0 if rng.random() < 0.08 else int(rng.expovariate(1 / 40)) + 1
+            quantities.append(qty)
+            garment = rng.choice(GARMENTS)
+            yield (first_product + i, f"{rng.choice(COLOURS)} {garment} {first_product + i}",
+                   rng.choices(categories, cum_weights=category_cum)[0], size_text, qty, price, stamp(at))
+
+    done("clothing", _insert(conn, """
+        INSERT INTO clothing (id, name, category, size, quantity, price, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, products()))
+
+    def images():
+        for i in range(volume.products):
+            for n in range(int(volume.images_per_product + rng.random())):
+                product = first_product + i
+                yield (product, f"synthetic_{product}_{n}.jpg", stamp(created[i]))
+
+    done("clothing_images", _insert(conn, """
+        INSERT INTO clothing_images (clothing_id, image, created_at) VALUES (?, ?, ?)
+    """, images()))
+
+    def creation_logs():
+        for i in range(volume.products):
+            yield (first_product + i, "create", quantities[i], "Generated", "datagen", stamp(created[i]))
+
+    done("stock_logs", _insert(conn, """
+        INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, creation_logs()))
+
+    # -- customers
+    first_customer = _next_id(conn, "customers")
+
+    def customers():
+        for i in range(volume.customers):
+            cid = first_customer + i
+            city, state = rng.choice(CITIES)
+            yield (cid, f"Customer {cid}", f"customer{cid}@example.com", f"9{rng.randrange(10**9):09d}",
+                   f"{rng.randint(1, 999)} Main Road", city, state, f"{rng.randint(110001, 799999)}",
+                   stamp(rng.randrange(span)))
+
+    done("customers", _insert(conn, """
+        INSERT INTO customers (id, name, email, phone, address, city, state, zip_code, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, customers()))
+
+    # -- orders with their lines, stock movements and notifications
+    if volume.orders and volume.products and volume.customers:
+        first_order = _next_id(conn, "orders")
+        lines, logs, notes = [], [], []
+        # orders grow over time: later days get more of them
+        times = sorted(int(span * rng.random() ** 0.5) for _ in range(volume.orders))
+
+        def orders():
+            for i, at in enumerate(times):
+                oid = first_order + i
+                age_days = (span - at) / 86400
+                for max_age, mix in STATUS_BY_AGE:
+                    if max_age is None or age_days <= max_age:
+                        break
+                status = rng.choices(*zip(*mix))[0]
+                customer = first_customer + _skewed_index(rng, volume.customers, 2.0)
+                created_at = stamp(at)
+                total = 0.0
+                for _ in range(rng.choices(line_counts, cum_weights=line_cum)[0]):
+                    p = _skewed_index(rng, volume.products)
+                    qty = 1 if rng.random() < 0.8 else rng.randint(2, 4)
+                    total += prices[p] * qty
+                    lines.append((oid, first_product + p, rng.choice(sizes[p]), qty, prices[p]))
+                    logs.append((first_product + p, "out", -qty, "Order placed", "system", created_at))
+                number = f"ORD-{oid:09d}"
+                notes.append(("order_placed", "admin", "New Order Placed",
+                              f"New order {number} (${total:.2f})", int(age_days > 3), oid, created_at))
+                notes.append(("order_placed", str(customer), "Order Confirmed",
+                              f"Your order {number} has been received. Total: ${total:.2f}",
+                              int(rng.random() < 0.6), oid, created_at))
+                if status in STATUS_NOTIFICATIONS:
+                    notes.append((STATUS_NOTIFICATIONS[status], str(customer), f"Order {status.title()}",
+                                  f"Your order {number} has been {status}.", int(rng.random() < 0.5),
+                                  oid, stamp(min(span, at + rng.randrange(86400, 5 * 86400)))))
+                payment = "unpaid" if status in ("pending", "cancelled") else "paid"
+                city, state = rng.choice(CITIES)
+                yield (oid, number, customer, round(total, 2), status, payment,
+                       f"{rng.randint(1, 999)} Main Road, {city}, {state}", "", created_at, created_at)
+
+        done("orders", _insert(conn, """
+            INSERT INTO orders (id, order_number, customer_id, total_amount, status, payment_status,
+                                shipping_address, notes, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, orders()))
+        done("order_items", _insert(conn, """
+            INSERT INTO order_items (order_id, clothing_id, size, quantity, price) VALUES (?, ?, ?, ?, ?)
+        """, lines))
+        done("stock_logs", _insert(conn, """
+            INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, logs))
+        done("notifications", _insert(conn, """
+            INSERT INTO notifications (type, recipient, title, message, read, order_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, notes))
+        del lines, logs, notes
+
+    # -- open carts: recent activity, one to a few lines each
+    if volume.carts and volume.products:
+        sessions, cart_lines = [], []
+        for _ in range(volume.carts):
+            sid = f"gen-{rng.getrandbits(96):024x}"
+            last = span - int(rng.expovariate(1 / (3 * 86400))) % span
+            sessions.append((sid, stamp(last - rng.randrange(3600)), stamp(last)))
+            for p in {_skewed_index(rng, volume.products) for _ in range(rng.randint(1, 4))}:
+                cart_lines.append((sid, first_product + p, rng.choice(sizes[p]), rng.randint(1, 2), stamp(last)))
+        done("cart_sessions", _insert(conn, """
+            INSERT INTO cart_sessions (session_id, owner, created_at, last_seen) VALUES (?, NULL, ?, ?)
+        """, sessions))
+        done("cart", _insert(conn, """
+            INSERT INTO cart (session_id, clothing_id, size, quantity, added_at) VALUES (?, ?, ?, ?, ?)
+        """, cart_lines))
+
+    clock[0] = time.perf_counter()
+    _restore_triggers(conn, first_product)
+    refresh_stats(conn)   # bounded sample per index, as for the index migrations
+    report("rebuild", volume.products)
+    return counts
+
+
+__all__ = [
+    "CATEGORIES",
+    "GARMENTS",
+    "Volume",
+    "VOLUMES",
+    "generate",
+]
@@ -0,0 +1,305 @@
+"""
+Secondary indexes for the hot route queries, plus a query-plan check.
+
+`ensure_indexes()` creates `INDEXES`, drops retired `idx_*` indexes on the
+tables they cover and refreshes planner statistics. It runs as a schema
+migration (migrations.py): whenever `INDEXES` changes, register a new
+migration that calls it again.
+
+`check_query_plans()` runs EXPLAIN QUERY PLAN over `HOT_QUERIES` (the
+statements the routes issue) and reports every SCAN of a large table, an
+index-ordered walk (SCAN ... USING INDEX) included, unless ALLOWED_SCANS
+says why that one is fine. Keep `HOT_QUERIES` in step with the SQL in
+app.py / customer_routes.py / images.py; the searches are listed in the
+form the routes use here (full-text, or LIKE without FTS5).
+
+    flask --app app check-query-plans
+    QUERY_PLAN_CHECK=1 flask run          # also refuse to start on a scan
+"""
+
+from __future__ import annotations
+
+import re
+
+from search import FTS_ENABLED
+
+INDEXES = {
+    # /shop listing: in-stock filter, category filter, newest first
+    "idx_clothing_shop": "clothing(quantity, category, created_at)",
+    "idx_clothing_category_created": "clothing(category, created_at)",
+    "idx_clothing_created": "clothing(created_at)",
+    "idx_clothing_name": "clothing(name)",
+    "idx_clothing_price": "clothing(price)",
+    "idx_clothing_quantity": "clothing(quantity)",
+    "idx_clothing_images_clothing": "clothing_images(clothing_id)",
+    "idx_stock_logs_clothing": "stock_logs(clothing_id)",
+    "idx_cart_session": "cart(session_id, clothing_id, size)",
+    "idx_cart_sessions_last_seen": "cart_sessions(last_seen)",
+    "idx_order_items_order": "order_items(order_id)",
+    "idx_orders_status_created": "orders(status, created_at)",
+    "idx_orders_created": "orders(created_at)",
+    "idx_orders_customer": "orders(customer_id)",
+    "idx_customers_created": "customers(created_at)",
+    "idx_notifications_unread": "notifications(recipient, read, created_at)",
+    "idx_notifications_recipient_created": "notifications(recipient, created_at)",
+}
+
+# Tables with at least this many rows (approximated by MAX(rowid)) count as
+# "large" for the plan check; smaller tables may be scanned freely.
+LARGE_TABLE_ROWS = 10_000
+
+# (name, sql, params) for every hot statement issued by the routes.
+HOT_QUERIES = [
+    ("shop.count", "SELECT COUNT(*) AS c FROM clothing WHERE quantity > 0", ()),
+    ("shop.count_category",
+     "SELECT COUNT(*) AS c FROM clothing WHERE quantity > 0 AND category = ?", ("Dress",)),
+    ("shop.list",
+     "SELECT * FROM clothing WHERE quantity > 0 ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", (13, 0)),
+    ("shop.list_cursor",
+     "SELECT * FROM clothing WHERE quantity > 0 AND (created_at, id) < (?, ?) "
+     "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", ("2024-01-01", 1, 13, 0)),
+    ("shop.list_category",
+     "SELECT * FROM clothing WHERE quantity > 0 AND category = ? ORDER BY created_at DESC, id DESC "
+     "LIMIT ? OFFSET ?", ("Dress", 13, 0)),
+    ("shop.list_price",
+     "SELECT * FROM clothing WHERE quantity > 0 ORDER BY price ASC, id ASC LIMIT ? OFFSET ?", (13, 0)),
+    ("shop.version", "SELECT version, changed_at FROM catalog_version WHERE id = 1", ()),
+    ("shop.categories",
+     "SELECT NULLIF(category, '') AS category FROM category_stats WHERE qty > 0 ORDER BY category", ()),
+    ("cart.lookup",
+     "SELECT * FROM cart WHERE session_id=? AND clothing_id=? AND size=?", ("s", 1, "M")),
+    ("cart.view",
+     "SELECT c.*, cl.name, cl.price, cl.image FROM cart c JOIN clothing cl ON c.clothing_id = cl.id "
+     "WHERE c.session_id = ? ORDER BY c.added_at DESC", ("s",)),
+    ("cart.clear", "DELETE FROM cart WHERE session_id=?", ("s",)),
+    ("cart.owner", "SELECT session_id FROM cart_sessions WHERE owner = ?", ("admin:a",)),
+    ("cart.sweep",
+     "SELECT session_id FROM cart_sessions WHERE last_seen < ? LIMIT ?", ("2024-01-01", 1000)),
+    ("checkout.customer", "SELECT * FROM customers WHERE email=?", ("a@b.c",)),
+    ("import.by_sku", "SELECT id FROM clothing WHERE sku = ?", ("dress|formal wear|m",)),
+    ("blobs.unreferenced", "SELECT name FROM blobs WHERE refs <= 0", ()),
+    ("blobs.release", "UPDATE blobs SET refs = refs - 1 WHERE name = ?", ("img_x.jpg",)),
+    ("variants.batch",
+     "SELECT id, clothing_id, size, quantity FROM clothing_variants WHERE clothing_id IN (?,?,?) "
+     "AND quantity > 0 ORDER BY clothing_id, id", (1, 2, 3)),
+    ("cart.variant",
+     "SELECT id, clothing_id, size, quantity FROM clothing_variants WHERE clothing_id = ? AND size = ?",
+     (1, "M")),
+    ("checkout.cart",
+     "SELECT c.*, cl.name, cl.price, v.quantity AS stock FROM cart c "
+     "JOIN clothing cl ON c.clothing_id = cl.id "
+     "LEFT JOIN clothing_variants v ON v.clothing_id = c.clothing_id AND v.size = c.size "
+     "WHERE c.session_id = ?", ("s",)),
+    ("checkout.decrement",
+     "UPDATE clothing_variants SET quantity = quantity - ? WHERE clothing_id=? AND size=? AND quantity >= ?",
+     (1, 1, "M", 1)),
+    ("order.items",
+     "SELECT oi.*, c.name, c.image FROM order_items oi JOIN clothing c ON oi.clothing_id = c.id "
+     "WHERE oi.order_id = ?", (1,)),
+    ("admin_orders.count",
+     "SELECT COUNT(*) AS cnt FROM orders o JOIN customers c ON o.customer_id = c.id WHERE 1=1", ()),
+    ("admin_orders.count_status",
+     "SELECT COUNT(*) AS cnt FROM orders o JOIN customers c ON o.customer_id = c.id "
+     "WHERE 1=1 AND o.status = ?", ("pending",)),
+    ("admin_orders.list",
+     "SELECT o.*, c.name, c.email, c.phone FROM orders o JOIN customers c ON o.customer_id = c.id "
+     "WHERE 1=1 ORDER BY o.created_at DESC, o.id DESC LIMIT ? OFFSET ?", (11, 0)),
+    ("admin_orders.list_cursor",
+     "SELECT o.*, c.name, c.email, c.phone FROM orders o JOIN customers c ON o.customer_id = c.id "
+     "WHERE 1=1 AND (o.created_at, o.id) < (?, ?) ORDER BY o.created_at DESC, o.id DESC LIMIT ? OFFSET ?",
+     ("2024-01-01", 1, 11, 0)),
+    ("admin_orders.list_status",
+     "SELECT o.*, c.name, c.email, c.phone FROM orders o JOIN customers c ON o.customer_id = c.id "
+     "WHERE 1=1 AND o.status = ? ORDER BY o.created_at DESC, o.id DESC LIMIT ? OFFSET ?",
+     ("pending", 11, 0)),
+    ("admin_customers.list",
+     "SELECT c.*, (SELECT COUNT(*) FROM orders o WHERE o.customer_id = c.id) AS order_count "
+     "FROM customers c WHERE 1=1 ORDER BY c.created_at DESC, c.id DESC LIMIT ? OFFSET ?", (16, 0)),
+    ("notifications.unread",
+     "SELECT COUNT(*) AS cnt FROM notifications WHERE recipient='admin' AND read=0", ()),
+    ("notifications.count",
+     "SELECT COUNT(*) AS cnt FROM notifications WHERE recipient='admin'", ()),
+    ("notifications.list",
+     "SELECT * FROM notifications WHERE recipient='admin' ORDER BY created_at DESC, id DESC "
+     "LIMIT ? OFFSET ?", (21, 0)),
+    ("notifications.list_cursor",
+     "SELECT * FROM notifications WHERE recipient='admin' AND (created_at, id) < (?, ?) "
+     "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", ("2024-01-01", 1, 21, 0)),
+    ("inventory.list",
+     "SELECT * FROM clothing ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", (11, 0)),
+    ("inventory.list_name",
+     "SELECT * FROM clothing ORDER BY name ASC, id ASC LIMIT ? OFFSET ?", (11, 0)),
+    ("inventory.list_name_cursor",
+     "SELECT * FROM clothing WHERE (name, id) > (?, ?) ORDER BY name ASC, id ASC LIMIT ? OFFSET ?",
+     ("m", 1, 11, 0)),
+    ("inventory.list_qty",
+     "SELECT * FROM clothing ORDER BY quantity ASC, id ASC LIMIT ? OFFSET ?", (11, 0)),
+    ("gallery.batch",
+     "SELECT id, clothing_id, image, created_at FROM clothing_images WHERE clothing_id IN (?,?,?) "
+     "ORDER BY clothing_id, id ASC", (1, 2, 3)),
+    ("item.stock_logs", "SELECT * FROM stock_logs WHERE clothing_id=?", (1,)),
+    ("stock_logs.recent",
+     "SELECT s.*, c.name, c.category FROM stock_logs s LEFT JOIN clothing c ON c.id = s.clothing_id "
+     "ORDER BY s.id DESC LIMIT 300", ()),
+    ("logs.recent", "SELECT * FROM logs ORDER BY id DESC LIMIT 50", ()),
+    ("dashboard.totals",
+     "SELECT COALESCE(SUM(items), 0), COALESCE(SUM(qty), 0), COALESCE(SUM(low_stock), 0) "
+     "FROM category_stats", ()),
+    ("dashboard.by_category",
+     "SELECT category, qty FROM category_stats ORDER BY qty DESC LIMIT ?", (6,)),
+    ("thumbs.batch",
+     "SELECT source, digest, widths FROM image_variants WHERE source IN (?,?,?)", ("a.jpg", "b.jpg", "c.jpg")),
+]
+
+# the searches: full-text when SQLite has FTS5; the routes fall back to a
+# substring LIKE without it, or for a term with no word characters
+_ORDERS_SEARCH = "SELECT COUNT(*) AS cnt FROM orders o JOIN customers c ON o.customer_id = c.id WHERE 1=1 AND "
+LIKE_QUERIES = [
+    ("shop.search_like",
+     "SELECT * FROM clothing WHERE quantity > 0 AND (name LIKE ? OR category LIKE ?) "
+     "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", ("%dre%", "%dre%", 13, 0)),
+    ("inventory.search_like",
+     "SELECT * FROM clothing WHERE (name LIKE ? OR category LIKE ? OR size LIKE ?) "
+     "ORDER BY name ASC, id ASC LIMIT ? OFFSET ?", ("%dre%", "%dre%", "%dre%", 11, 0)),
+    ("admin_customers.search_like",
+     "SELECT COUNT(*) AS cnt FROM customers c WHERE 1=1 AND (name LIKE ? OR email LIKE ? OR phone LIKE ?)",
+     ("%ann%", "%ann%", "%ann%")),
+    ("admin_orders.search_like",
+     _ORDERS_SEARCH + "(o.order_number LIKE ? OR c.name LIKE ? OR c.email LIKE ?)",
+     ("%ann%", "%ann%", "%ann%")),
+]
+HOT_QUERIES += LIKE_QUERIES
+if FTS_ENABLED:
+    HOT_QUERIES += [
+        ("shop.list_search",
+         "SELECT clothing.*, f.rank AS rank FROM clothing "
+         "JOIN (SELECT rowid, rank FROM clothing_fts WHERE clothing_fts MATCH ?) AS f ON f.rowid = clothing.id "
+         "WHERE quantity > 0 ORDER BY f.rank ASC, clothing.id ASC LIMIT ? OFFSET ?", ('"dre"*', 13, 0)),
+        ("inventory.search",
+         "SELECT clothing.*, f.rank AS rank FROM clothing "
+         "JOIN (SELECT rowid, rank FROM clothing_fts WHERE clothing_fts MATCH ?) AS f ON f.rowid = clothing.id "
+         "ORDER BY name ASC, clothing.id ASC LIMIT ? OFFSET ?", ('"dre"*', 11, 0)),
+        ("admin_customers.search",
+         "SELECT COUNT(*) AS cnt FROM customers c "
+         "JOIN (SELECT rowid, rank FROM customers_fts WHERE customers_fts MATCH ?) AS f ON f.rowid = c.id "
+         "WHERE 1=1", ('"ann"*',)),
+        ("admin_orders.search",
+         _ORDERS_SEARCH + "(o.customer_id IN (SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?) "
+         "OR (o.order_number >= ? AND o.order_number < ?))", ('"ann"*', "ANN", "ANO")),
+    ]
+
+# Scans that are known and accepted, with the reason.
+_ORDERED_WALK = "walks the index in ORDER BY order and stops at LIMIT (deep pages use the cursor)"
+ALLOWED_SCANS = {
+    "stock_logs.recent": "walks rowid backwards and stops at LIMIT",
+    "logs.recent": "walks rowid backwards and stops at LIMIT",
+    "shop.list": _ORDERED_WALK,
+    "shop.list_price": _ORDERED_WALK,
+    "admin_orders.list": _ORDERED_WALK,
+    "admin_customers.list": _ORDERED_WALK,
+    "inventory.list": _ORDERED_WALK,
+    "inventory.list_name": _ORDERED_WALK,
+    "inventory.list_qty": _ORDERED_WALK,
+    "admin_orders.count": "counts every order; cached_count keeps it off most requests",
+}
+if FTS_ENABLED:
+    # without FTS5 the LIKE searches are the hot path, and their scans are reported
+    ALLOWED_SCANS.update(
+        (name, "substring LIKE, only for search terms without a word character")
+        for name, _sql, _params in LIKE_QUERIES
+    )
+
+_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+(\w+)"
+    r"(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|ORDER\b|GROUP\b|LIMIT\b|LEFT\b|JOIN\b)(\w+))?",
+    re.I,
+)
+_SCAN_RE = re.compile(r"^SCAN (\w+)(.*)$")
+
+
+# ---------------- INDEX SET ----------------
+def ensure_indexes(conn):
+    """Create the index set, drop retired idx_* indexes and re-analyze."""
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    # only tables this set covers: other modules keep idx_* indexes of their own
+    tables = {target.split("(")[0] for target in INDEXES.values()}
+    existing = conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type='index' AND name LIKE 'idx\\_%' ESCAPE '\\'"
+    ).fetchall()
+    for name, table in existing:
+        if name not in INDEXES and table in tables:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    refresh_stats(conn)
+
+
+def refresh_stats(conn):
+    """Re-sample planner statistics (when the index set changes; datagen after a load).
+
+    analysis_limit keeps it to a bounded sample per index.
+    """
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+# ---------------- QUERY PLAN CHECK ----------------
+def _approx_rows(conn, table, cache):
+    if table not in cache:
+        row = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()
+        cache[table] = row[0] or 0
+    return cache[table]
+
+
+def _aliases(sql):
+    aliases = {}
+    for table, alias in _ALIAS_RE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN details for one statement, as a list of strings."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def check_query_plans(conn, large_rows=LARGE_TABLE_ROWS):
+    """Return (name, detail) for every unexpected scan of a large table (by rowid or index)."""
+    sizes = {}
+    problems = []
+    for name, sql, params in HOT_QUERIES:
+        if name in ALLOWED_SCANS:
+            continue
+        aliases = _aliases(sql)
+        for detail in explain(conn, sql, params):
+            m = _SCAN_RE.match(detail)
+            if not m or "VIRTUAL TABLE" in m.group(2):
+                continue  # SEARCH or an FTS index lookup
+            table = aliases.get(m.group(1), m.group(1))
+            if _approx_rows(conn, table, sizes) >= large_rows:
+                problems.append((name, detail))
+    return problems
+
+
+def verify_query_plans(conn, large_rows=LARGE_TABLE_ROWS):
+    """Raise RuntimeError listing every unexpected scan of a large table."""
+    problems = check_query_plans(conn, large_rows)
+    if problems:
+        lines = "\n".join(f"  {name}: {detail}" for name, detail in problems)
+        raise RuntimeError(f"Full table scans in hot queries:\n{lines}")
+
+
+__all__ = [
+    "INDEXES",
+    "HOT_QUERIES",
+    "ALLOWED_SCANS",
+    "ensure_indexes",
+    "refresh_stats",
+    "explain",
+    "check_query_plans",
+    "verify_query_plans",
+]
@@ -0,0 +1,51 @@
+"""
+Batched loader for clothing gallery images.
+
+Fetches the gallery rows for a whole page of items in one query (chunked to
+stay under SQLite's bound-parameter limit) instead of one SELECT per item.
+
+    gallery_map = load_gallery_map(db, [it["id"] for it in items])
+    gallery_map[item_id]  # -> list of clothing_images rows, oldest first
+"""
+
+from __future__ import annotations
+
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds.
+CHUNK_SIZE = 500
+
+
+def load_gallery_map(db, item_ids, limit=None):
+    """Return {item_id: [rows]} for every id in `item_ids` (empty list if none).
+
+    `limit` caps the number of images kept per item (e.g. thumbnails on a grid).
+    """
+    ids = list(dict.fromkeys(item_ids))
+    gallery_map = {item_id: [] for item_id in ids}
+
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        marks = ",".join("?" * len(chunk))
+        rows = db.execute(
+            f"""
+            SELECT id, clothing_id, image, created_at
+            FROM clothing_images
+            WHERE clothing_id IN ({marks})
+            ORDER BY clothing_id, id ASC
+            """,
+            chunk,
+        ).fetchall()
+
+        for row in rows:
+            images = gallery_map[row["clothing_id"]]
+            if limit is None or len(images) < limit:
+                images.append(row)
+
+    return gallery_map
+
+
+def load_gallery(db, item_id):
+    """Gallery rows for a single item."""
+    return load_gallery_map(db, [item_id])[item_id]
+
+
+__all__ = ["load_gallery_map", "load_gallery"]
@@ -0,0 +1,162 @@
+"""
+Responsive image variants for uploaded photos (Pillow).
+
+Every uploaded image gets resized copies at THUMB_WIDTHS in WebP and JPEG,
+rendered in the jobs.py worker pool right after the upload. The copies live
+under thumbs/ in the upload storage (storage.py) and are named after the
+source plus a hash of its content:
+
+    item_5_tee.png
+    thumbs/item_5_tee.png.3f2a9c01d4e7.320.webp
+
+The content hash changes whenever the photo does, so the URLs can be cached
+forever. `image_variants` records which source has which hash/widths. A
+view loads them for all images on its page in one query and passes the map
+to the template as `thumbs`; the `thumb_url` / `thumb_srcset` globals read
+it and fall back to the original until the variants exist.
+
+    jobs.submit(make_variants, storage, "item_5_tee.png", on_done=...)
+    render_template(..., thumbs=load_thumb_map(db, [p["image"] for p in products]))
+    <img src="{{ thumb_url(p.image, 320) }}" srcset="{{ thumb_srcset(p.image) }}">
+"""
+
+from __future__ import annotations
+
+import io
+
+from static_files import content_hash
+
+THUMB_DIR = "thumbs"
+THUMB_WIDTHS = (160, 320, 640)
+THUMB_FORMATS = {"webp": ("WEBP", 80), "jpg": ("JPEG", 82)}
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds.
+CHUNK_SIZE = 500
+
+
+def variant_name(source, digest, width, fmt="webp"):
+    return f"{THUMB_DIR}/{source}.{digest}.{width}.{fmt}"
+
+
+def source_of(variant):
+    """'thumbs/a.png.<hash>.320.webp' -> 'a.png' (None if not a variant name)."""
+    if not variant.startswith(THUMB_DIR + "/"):
+        return None
+    parts = variant[len(THUMB_DIR) + 1:].rsplit(".", 3)
+    return parts[0] if len(parts) == 4 else None
+
+
+# ---------------- WORKER ----------------
+def make_variants(storage, source):
+    """Write the resized copies of `source` (storage.py); runs in a jobs.py worker.
+
+    Returns (digest, widths). Existing files are reused, so re-running is
+    cheap.
+    """
+    from PIL import Image, ImageOps
+
+    data = storage.get(source)
+    digest = content_hash(data)
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        widths = [w for w in THUMB_WIDTHS if w < img.width] or [min(THUMB_WIDTHS)]
+
+        for width in widths:
+            resized = img.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+            for fmt, (pil_format, quality) in THUMB_FORMATS.items():
+                name = variant_name(source, digest, width, fmt)
+                if storage.exists(name):
+                    continue
+                frame = resized
+                if pil_format == "JPEG" and frame.mode != "RGB":
+                    frame = frame.convert("RGB")
+                elif frame.mode not in ("RGB", "RGBA"):
+                    frame = frame.convert("RGBA")
+                buf = io.BytesIO()
+                frame.save(buf, pil_format, quality=quality, optimize=True)
+                storage.put(name, buf.getvalue(), f"image/{'jpeg' if fmt == 'jpg' else fmt}")
+    return digest, widths
+
+
+def remove_variants(storage, source):
+    """Delete every resized copy of `source` (any hash)."""
+    for name in storage.list(f"{THUMB_DIR}/{source}."):
+        storage.delete(name)
+
+
+# ---------------- SCHEMA / LOOKUP ----------------
+def ensure_image_variants(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS image_variants (
+            source TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            widths TEXT NOT NULL,          -- "160,320,640"
+            created_at TEXT
+        )
+    """)
+    conn.commit()
+
+
+def record_variants(conn, source, digest, widths, now):
+    conn.execute(
+        "INSERT OR REPLACE INTO image_variants (source, digest, widths, created_at) VALUES (?, ?, ?, ?)",
+        (source, digest, ",".join(str(w) for w in widths), now),
+    )
+
+
+def forget_variants(conn, source):
+    conn.execute("DELETE FROM image_variants WHERE source = ?", (source,))
+
+
+def load_thumb_map(db, sources):
+    """{source: (digest, widths)} for the rendered images among `sources`, in batched IN queries.
+
+    Views load the map for every image on the page and pass it to the
+    template as `thumbs`; sources without variants are simply absent.
+    """
+    names = [s for s in dict.fromkeys(sources) if s]
+    thumbs = {}
+    for start in range(0, len(names), CHUNK_SIZE):
+        chunk = names[start:start + CHUNK_SIZE]
+        marks = ",".join("?" * len(chunk))
+        for source, digest, widths in db.execute(
+            f"SELECT source, digest, widths FROM image_variants WHERE source IN ({marks})", chunk
+        ):
+            thumbs[source] = (digest, tuple(int(w) for w in widths.split(",")))
+    return thumbs
+
+
+def best_variant(thumbs, source, width, fmt="webp"):
+    """Variant filename of the smallest width >= `width` (the original if none)."""
+    hit = thumbs.get(source)
+    if hit is None:
+        return source
+    digest, widths = hit
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return variant_name(source, digest, chosen, fmt)
+
+
+def variant_srcset(thumbs, source, fmt="webp"):
+    """[(filename, width), ...] for a srcset attribute ([] until rendered)."""
+    hit = thumbs.get(source)
+    if hit is None:
+        return []
+    digest, widths = hit
+    return [(variant_name(source, digest, w, fmt), w) for w in widths]
+
+
+__all__ = [
+    "THUMB_DIR",
+    "THUMB_WIDTHS",
+    "variant_name",
+    "source_of",
+    "make_variants",
+    "remove_variants",
+    "ensure_image_variants",
+    "record_variants",
+    "forget_variants",
+    "load_thumb_map",
+    "best_variant",
+    "variant_srcset",
+]
@@ -0,0 +1,488 @@
+"""
+Inventory export / import helpers.
+
+Rows are pulled from a server-side cursor in batches (`fetchmany`) and never
+materialized as a whole:
+
+Exports have one row per (product, size) variant.
+
+* CSV / NDJSON are generated chunk by chunk and streamed straight into the
+  response.
+* XLSX uses openpyxl's write-only workbook, saved into a private spooled
+  temp file (memory first, disk once large) that is then streamed back.
+
+Imports read the sheet in openpyxl read-only mode, validate/coerce rows in
+chunks and write them with `executemany` inside one transaction:
+
+    report = import_workbook(db, request.files["excel_file"].stream, admin="...")
+    report.imported, report.errors   # [(sheet_row, message), ...]
+
+With `mode="merge"` rows are matched on `clothing.sku` instead of always
+being appended: the sheet's SKU column when filled in, otherwise a key
+derived from (name, category), so the rows for each size of a product land
+on the same product. A row sets the stock of the size it names ("S/M"
+rows: the first size; the others are added at 0 if missing) and leaves the
+product's other sizes alone. Prices and per-size stock are upserted in bulk
+(`INSERT ... ON CONFLICT DO UPDATE`), and stock_logs only records the real
+quantity deltas. The report counts each sheet row once.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import json
+import string
+import tempfile
+import zipfile
+
+import openpyxl
+from openpyxl.utils.exceptions import InvalidFileException
+
+from backfill import backfill
+from variants import split_sizes
+
+EXPORT_COLUMNS = ("name", "category", "size", "quantity", "price", "created_at", "sku")
+EXPORT_HEADERS = ("Name", "Category", "Size", "Quantity", "Price", "Created At", "SKU")
+
+FETCH_SIZE = 1000          # rows per fetchmany() round
+CHUNK_BYTES = 64 * 1024    # flush streamed text once a chunk reaches this size
+SPOOL_BYTES = 8 * 1024 * 1024
+
+IMPORT_CHUNK = 1000        # validated rows per executemany() batch
+MAX_REPORTED_ERRORS = 500  # per-row errors kept for the report (all are counted)
+
+IMPORT_MODES = ("append", "merge")
+
+# SQLite's lower()/trim() only touch ASCII letters / spaces; derive_sku matches that
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+# ---------------- SOURCE ----------------
+def iter_inventory_rows(db, fetch_size=FETCH_SIZE):
+    """Yield export rows (tuples in EXPORT_COLUMNS order, one per size) without fetchall()."""
+    cursor = db.execute("""
+        SELECT c.name, c.category, v.size, v.quantity, c.price, c.created_at, c.sku
+        FROM clothing c
+        JOIN clothing_variants v ON v.clothing_id = c.id
+        ORDER BY c.name ASC, c.id ASC, v.id ASC
+    """)
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield tuple(row)
+
+
+# ---------------- WRITERS ----------------
+def stream_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def stream_ndjson(rows):
+    parts, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts)
+
+
+def write_xlsx(rows, fileobj):
+    """Write-only workbook: rows are serialized as they are appended."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Inventory")
+    ws.append(EXPORT_HEADERS)
+    for row in rows:
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def xlsx_tempfile(rows):
+    """Private spooled temp file holding the workbook, rewound for reading."""
+    tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    write_xlsx(rows, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+# ---------------- IMPORT ----------------
+class InvalidWorkbook(ValueError):
+    """The upload is not a readable .xlsx workbook."""
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0         # new rows (merge: rows adding a product or size)
+        self.updated = 0          # merge: rows that changed a size's stock or the price
+        self.unchanged = 0        # merge: rows already up to date
+        self.skipped = 0          # blank rows
+        self.error_count = 0
+        self.errors = []          # (sheet_row, message), first MAX_REPORTED_ERRORS
+
+    def add_error(self, row_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_no, message))
+
+    def as_dict(self):
+        return {
+            "imported": self.imported,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "error_count": self.error_count,
+            "errors": [{"row": r, "error": m} for r, m in self.errors],
+        }
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value, cast, label):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return cast(0)
+    if isinstance(value, bool):
+        raise ValueError(f"{label} must be a number")
+    try:
+        number = float(str(value).strip()) if isinstance(value, str) else float(value)
+    except ValueError:
+        raise ValueError(f"{label} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{label} cannot be negative")
+    if cast is int:
+        if not number.is_integer():
+            raise ValueError(f"{label} must be a whole number, got {value!r}")
+        return int(number)
+    return number
+
+
+def derive_sku(name, category):
+    """Fallback merge key for rows without an explicit SKU (same as _derived_sku_sql)."""
+    return "|".join((part or "").strip(" ").translate(_ASCII_LOWER) for part in (name, category))
+
+
+def _derived_sku_sql(ref):
+    return " || '|' || ".join(
+        f"lower(trim(IFNULL({ref}.{col}, '')))" for col in ("name", "category")
+    )
+
+
+def _sized_sku_sql(ref):
+    """Start of the default SKUs from before the key dropped the size: "<name>|<category>|"."""
+    return f"{_derived_sku_sql(ref)} || '|'"
+
+
+# ---------------- SCHEMA ----------------
+def ensure_skus(conn):
+    """Unique SKU index + default-SKU trigger, and SKUs for rows that lack one.
+
+    A row inserted without a SKU gets its derived key; if another product
+    already owns that key (an older duplicate row) it gets "<key>#<id>"
+    instead, so every product exports with a unique, stable key.
+    """
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_clothing_sku
+        ON clothing(sku) WHERE sku IS NOT NULL
+    """)
+    _create_sku_trigger(conn)
+    # rows from before SKUs, in batches; ascending ids give the oldest row of a
+    # duplicate group the plain key, the others get "<key>#<id>" in the second pass
+    backfill(conn, "clothing", f"sku = {_derived_sku_sql('clothing')}", "sku IS NULL", conflict="IGNORE")
+    backfill(conn, "clothing", f"sku = {_derived_sku_sql('clothing')} || '#' || id", "sku IS NULL")
+
+
+def _create_sku_trigger(conn):
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_sku_default AFTER INSERT ON clothing
+        WHEN new.sku IS NULL BEGIN
+            UPDATE OR IGNORE clothing SET sku = {_derived_sku_sql("new")} WHERE id = new.id;
+            UPDATE clothing SET sku = {_derived_sku_sql("new")} || '#' || new.id
+            WHERE id = new.id AND sku IS NULL;
+        END
+    """)
+
+
+def rekey_skus(conn):
+    """Drop the size from default SKUs ("shirt|men|m" -> "shirt|men").
+
+    Only SKUs that start with the row's own "<name>|<category>|" are
+    rewritten; SKUs typed into a sheet are left alone. As in ensure_skus the
+    oldest product of a (name, category) group gets the plain key.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS clothing_sku_default")
+    _create_sku_trigger(conn)
+    sized = _sized_sku_sql("clothing")
+    old_default = f"substr(sku, 1, length({sized})) = {sized}"
+    backfill(conn, "clothing", f"sku = {_derived_sku_sql('clothing')}", old_default, conflict="IGNORE")
+    backfill(conn, "clothing", f"sku = {_derived_sku_sql('clothing')} || '#' || id", old_default)
+
+
+def backfill_skus(db):
+    """Give rows without a SKU their derived key (oldest row of a duplicate group first)."""
+    db.execute(f"""
+        UPDATE OR IGNORE clothing SET sku = {_derived_sku_sql("clothing")}
+        WHERE id IN (
+            SELECT MIN(id) FROM clothing WHERE sku IS NULL
+            GROUP BY {_derived_sku_sql("clothing")}
+        )
+    """)
+    db.execute(f"""
+        UPDATE clothing SET sku = {_derived_sku_sql("clothing")} || '#' || id
+        WHERE sku IS NULL
+    """)
+
+
+def coerce_row(values, now):
+    """Sheet row -> (name, category, size, quantity, price, created_at, sku); raises ValueError.
+
+    `sku` is None unless the sheet's SKU column is filled in.
+    """
+    values = tuple(values[:len(EXPORT_COLUMNS)]) + (None,) * (len(EXPORT_COLUMNS) - len(values))
+    name, category, size, qty, price, created_at, sku = values
+
+    name = _text(name)
+    if not name:
+        raise ValueError("Name is required")
+
+    if isinstance(created_at, (datetime.datetime, datetime.date)):
+        created_at = created_at.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        created_at = _text(created_at) or now
+
+    return (
+        name,
+        _text(category),
+        _text(size),
+        _number(qty, int, "Quantity"),
+        _number(price, float, "Price"),
+        created_at,
+        _text(sku),
+    )
+
+
+def iter_import_chunks(fileobj, report, now, chunk_size=IMPORT_CHUNK):
+    """Yield lists of coerced rows; invalid rows go to `report` instead."""
+    try:
+        wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError, ValueError) as e:
+        raise InvalidWorkbook(f"Not a valid .xlsx file ({e})") from e
+
+    try:
+        ws = wb.active
+        chunk = []
+        for row_no, values in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            if all(v is None or (isinstance(v, str) and not v.strip()) for v in values):
+                report.skipped += 1
+                continue
+            try:
+                chunk.append(coerce_row(values, now))
+            except ValueError as e:
+                report.add_error(row_no, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        wb.close()
+
+
+def _append(db, chunks, report):
+    for chunk in chunks:
+        db.executemany("""
+            INSERT INTO clothing (name, category, size, quantity, price, created_at, sku)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, chunk)
+        report.imported += len(chunk)
+
+
+def _stage_rows(chunk, first_row):
+    """Coerced rows -> import_stage rows, one per size.
+
+    Only the first size of an "S/M" row takes its quantity; the others are
+    staged with NULL (add the size if missing, keep its stock otherwise).
+    """
+    for row, (name, category, size, qty, price, created_at, sku) in enumerate(chunk, start=first_row):
+        key = sku or derive_sku(name, category)
+        for i, variant_size in enumerate(split_sizes(size)):
+            yield (row, key, variant_size, name, category, qty if i == 0 else None, price, created_at)
+
+
+# the staged size each (SKU, size) ends up with: the last row that sets a quantity
+_LATEST = "s.rowid IN (SELECT MAX(rowid) FROM import_stage WHERE quantity IS NOT NULL GROUP BY sku, size)"
+
+
+def _merge(db, chunks, report, admin, now, max_before):
+    db.execute("DROP TABLE IF EXISTS temp.import_stage")
+    db.execute("""
+        CREATE TEMP TABLE import_stage (
+            row_no INTEGER, sku TEXT, size TEXT,
+            name TEXT, category TEXT,
+            quantity INTEGER, price REAL, created_at TEXT
+        )
+    """)
+    db.execute("CREATE INDEX temp.import_stage_sku ON import_stage(sku)")
+    try:
+        rows = 0
+        for chunk in chunks:
+            db.executemany("""
+                INSERT INTO import_stage (row_no, sku, size, name, category, quantity, price, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, list(_stage_rows(chunk, rows)))
+            rows += len(chunk)
+
+        # one outcome per sheet row, against the catalog before the merge
+        outcomes = dict(db.execute("""
+            SELECT outcome, COUNT(*) FROM (
+                SELECT CASE
+                    WHEN MAX(c.id IS NULL OR v.id IS NULL) THEN 'imported'
+                    WHEN MAX(s.quantity IS NOT v.quantity AND s.quantity IS NOT NULL
+                             OR c.price IS NOT s.price) THEN 'updated'
+                    ELSE 'unchanged' END AS outcome
+                FROM import_stage s
+                LEFT JOIN clothing c ON c.sku = s.sku
+                LEFT JOIN clothing_variants v ON v.clothing_id = c.id AND v.size = s.size
+                GROUP BY s.row_no
+            ) GROUP BY outcome
+        """).fetchall())
+        report.imported = outcomes.get("imported", 0)
+        report.updated = outcomes.get("updated", 0)
+        report.unchanged = outcomes.get("unchanged", 0)
+
+        # products: new SKUs are created empty from their first staged row (the
+        # seed trigger adds that size at 0); every SKU gets the price of its last row.
+        # "WHERE ... IN" also keeps the SELECT's ON from being parsed as a join constraint
+        db.execute("""
+            INSERT INTO clothing (sku, name, category, size, quantity, price, created_at)
+            SELECT sku, name, category, size, 0,
+                   (SELECT price FROM import_stage AS l WHERE l.sku = f.sku ORDER BY rowid DESC LIMIT 1),
+                   created_at
+            FROM import_stage AS f
+            WHERE rowid IN (SELECT MIN(rowid) FROM import_stage GROUP BY sku)
+            ON CONFLICT(sku) WHERE sku IS NOT NULL DO UPDATE SET
+                price = excluded.price
+            WHERE price IS NOT excluded.price
+        """)
+
+        # deltas first, while the variants still hold the old quantities
+        db.execute(f"""
+            INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
+            SELECT c.id,
+                   CASE WHEN c.id > ? THEN 'import'
+                        WHEN s.quantity > IFNULL(v.quantity, 0) THEN 'in'
+                        ELSE 'out' END,
+                   s.quantity - IFNULL(v.quantity, 0),
+                   'Qty synced from Excel (size ' || s.size || ')', ?, ?
+            FROM import_stage s
+            JOIN clothing c ON c.sku = s.sku
+            LEFT JOIN clothing_variants v ON v.clothing_id = c.id AND v.size = s.size
+            WHERE {_LATEST} AND s.quantity IS NOT IFNULL(v.quantity, 0)
+        """, (max_before, admin, now))
+
+        # sizes the products do not have yet, in sheet order (the variant ids
+        # give clothing.size its order); clothing.quantity / size follow via the
+        # variant triggers
+        db.execute("""
+            INSERT INTO clothing_variants (clothing_id, size, quantity)
+            SELECT c.id, s.size, 0
+            FROM import_stage s
+            JOIN clothing c ON c.sku = s.sku
+            GROUP BY c.id, s.size
+            ORDER BY MIN(s.rowid)
+            ON CONFLICT(clothing_id, size) DO NOTHING
+        """)
+        # then the stock of the sizes the sheet sets (every one exists by now)
+        db.execute(f"""
+            INSERT INTO clothing_variants (clothing_id, size, quantity)
+            SELECT c.id, s.size, s.quantity
+            FROM import_stage s
+            JOIN clothing c ON c.sku = s.sku
+            WHERE {_LATEST}
+            ON CONFLICT(clothing_id, size) DO UPDATE SET
+                quantity = excluded.quantity
+            WHERE quantity IS NOT excluded.quantity
+        """)
+    finally:
+        db.execute("DROP TABLE IF EXISTS temp.import_stage")
+
+
+def import_workbook(db, fileobj, admin="system", mode="append", chunk_size=IMPORT_CHUNK):
+    """Load every valid row of the sheet in one transaction; returns an ImportReport.
+
+    In append mode stock logs for the new rows are written with a single
+    INSERT ... SELECT over the ids allocated by this import (the write lock
+    is held for the whole run); merge mode logs per-size deltas itself.
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"unknown import mode {mode!r}")
+    report = ImportReport()
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        max_before = db.execute("SELECT COALESCE(MAX(id), 0) FROM clothing").fetchone()[0]
+
+        chunks = iter_import_chunks(fileobj, report, now, chunk_size)
+        if mode == "merge":
+            _merge(db, chunks, report, admin, now, max_before)
+        else:
+            _append(db, chunks, report)
+            db.execute("""
+                INSERT INTO stock_logs (clothing_id, change_type, qty_change, note, admin, created_at)
+                SELECT id, 'import', quantity, 'Imported from Excel', ?, ?
+                FROM clothing
+                WHERE id > ?
+            """, (admin, now, max_before))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return report
+
+__all__ = [
+    "EXPORT_COLUMNS",
+    "EXPORT_HEADERS",
+    "EXPORT_FORMATS",
+    "iter_inventory_rows",
+    "stream_csv",
+    "stream_ndjson",
+    "write_xlsx",
+    "xlsx_tempfile",
+    "IMPORT_MODES",
+    "InvalidWorkbook",
+    "ImportReport",
+    "derive_sku",
+    "coerce_row",
+    "ensure_skus",
+    "rekey_skus",
+    "backfill_skus",
+    "iter_import_chunks",
+    "import_workbook",
+]
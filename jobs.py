@@ -0,0 +1,68 @@
+"""
+Background job queue backed by a process pool.
+
+CPU-bound work (barcode/QR rendering, ...) runs in worker processes so the
+request thread can respond right away. Job functions must be importable
+top-level callables (they are pickled to a "spawn" worker, which never
+imports app.py). `on_done` runs back in the web process once the job
+finishes, with either the job's result or the exception it raised.
+
+    submit(generate_codes, item_id, text, qr_text,
+           on_done=lambda result, error: ...)
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+JOB_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """The worker pool for this process (created lazily, recreated after fork)."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit(fn, *args, on_done=None):
+    """Queue fn(*args) on the pool; returns the Future."""
+    future = get_executor().submit(fn, *args)
+
+    if on_done is not None:
+        def _callback(fut):
+            error = fut.exception()
+            try:
+                on_done(None if error else fut.result(), error)
+            except Exception:
+                log.exception("job callback for %s failed", getattr(fn, "__name__", fn))
+
+        future.add_done_callback(_callback)
+    return future
+
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+__all__ = ["JOB_WORKERS", "get_executor", "submit", "shutdown"]
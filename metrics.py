@@ -0,0 +1,301 @@
+"""
+Request, SQL and template timing, exported in Prometheus text format.
+
+Connections opened by the pool are TimedConnections: every execute /
+executemany / executescript is timed, together with the fetch* calls that
+read its rows, and counted once under its normalized SQL text, literals
+replaced by `?`:
+
+    SELECT * FROM clothing WHERE id IN (?+) AND category = ?
+
+Per request the app also records the route latency and template render
+time. The totals are added to the response as a Server-Timing header
+(visible in the browser's network panel):
+
+    Server-Timing: db;dur=4.2;desc="7 queries", tpl;dur=1.3, app;dur=9.8
+
+    metrics = Metrics()
+    metrics.install(app)               # request / template hooks
+    pool = ConnectionPool(DB_PATH, factory=TimedConnection)
+    metrics.render()                   # text for /metrics
+
+Counters live in the web process. With several workers each exposes its own
+numbers, so scrape them one by one or add them up in Prometheus.
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from flask import g, has_request_context, request, template_rendered, before_render_template
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_STATEMENTS = 500          # distinct normalized statements tracked; the rest count as "other"
+STATEMENT_LABEL_MAX = 300
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?\+\))(?:\s*,\s*\(\?\+\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """SQL text with literals and placeholder lists collapsed, for grouping."""
+    text = _STRING.sub("?", sql)
+    text = _NUMBER.sub("?", text)
+    text = _SPACE.sub(" ", text).strip()
+    text = _IN_LIST.sub("(?+)", text)
+    text = _VALUES_LIST.sub(r"\1", text)
+    return text
+
+
+# ---------------- PRIMITIVES ----------------
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) keyed by a label tuple."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series = defaultdict(lambda: [[0] * len(buckets), 0.0, 0])  # counts, sum, count
+
+    def observe(self, labels, seconds):
+        counts, _, _ = entry = self.series[labels]
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+        entry[1] += seconds
+        entry[2] += 1
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_label_value(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+# ---------------- REGISTRY ----------------
+class Metrics:
+    def __init__(self, prefix="clothing"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.requests = Histogram()                 # (endpoint, method) -> latency
+        self.statuses = defaultdict(int)            # (endpoint, method, status) -> count
+        self.templates = Histogram()                # (template,) -> render time
+        self.queries = defaultdict(lambda: [0, 0.0])  # statement -> [count, seconds]
+        self.listeners = []                         # fn(sql, params, seconds) per statement
+
+    # ---------- observations ----------
+    def observe_query(self, sql, params, seconds):
+        statement = normalize_sql(sql)
+        with self._lock:
+            if statement not in self.queries and len(self.queries) >= MAX_STATEMENTS:
+                statement = "other"
+            entry = self.queries[statement]
+            entry[0] += 1
+            entry[1] += seconds
+        if has_request_context():
+            g.sql_count = g.get("sql_count", 0) + 1
+            g.sql_seconds = g.get("sql_seconds", 0.0) + seconds
+        for listener in self.listeners:
+            listener(sql, params, seconds)
+
+    def observe_template(self, name, seconds):
+        with self._lock:
+            self.templates.observe((name,), seconds)
+        if has_request_context():
+            g.template_seconds = g.get("template_seconds", 0.0) + seconds
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            self.requests.observe((endpoint, method), seconds)
+            self.statuses[(endpoint, method, status)] += 1
+
+    # ---------- Flask hooks ----------
+    def install(self, app):
+        TimedConnection.metrics = self
+
+        @app.before_request
+        def _start_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            started = g.pop("request_started", None)
+            if started is None:
+                return response
+            elapsed = time.perf_counter() - started
+            endpoint = request.endpoint or "unmatched"
+            self.observe_request(endpoint, request.method, response.status_code, elapsed)
+            response.headers["Server-Timing"] = server_timing(
+                g.get("sql_seconds", 0.0), g.get("sql_count", 0),
+                g.get("template_seconds", 0.0), elapsed,
+            )
+            return response
+
+        def _before_render(sender, template, context, **extra):
+            g.setdefault("template_starts", []).append(time.perf_counter())
+
+        def _rendered(sender, template, context, **extra):
+            starts = g.get("template_starts")
+            if starts:
+                self.observe_template(template.name or "<string>", time.perf_counter() - starts.pop())
+
+        before_render_template.connect(_before_render, app, weak=False)
+        template_rendered.connect(_rendered, app, weak=False)
+
+    # ---------- export ----------
+    def render(self):
+        """All series in the Prometheus text exposition format (0.0.4)."""
+        p = self.prefix
+        out = []
+        with self._lock:
+            self._histogram(out, f"{p}_http_request_duration_seconds",
+                            "Request latency by Flask endpoint.", ("endpoint", "method"), self.requests)
+            out.append(f"# HELP {p}_http_requests_total Responses by endpoint and status.")
+            out.append(f"# TYPE {p}_http_requests_total counter")
+            for labels, value in sorted(self.statuses.items()):
+                out.append(f"{p}_http_requests_total{_labels(('endpoint', 'method', 'status'), labels)} {value}")
+
+            self._histogram(out, f"{p}_template_render_seconds",
+                            "Jinja render time by template.", ("template",), self.templates)
+
+            out.append(f"# HELP {p}_sql_statements_total Statements executed, by normalized SQL.")
+            out.append(f"# TYPE {p}_sql_statements_total counter")
+            for statement, (count, _) in sorted(self.queries.items()):
+                label = _labels(("statement",), (statement[:STATEMENT_LABEL_MAX],))
+                out.append(f"{p}_sql_statements_total{label} {count}")
+            out.append(f"# HELP {p}_sql_seconds_total Time in execute/fetch, by normalized SQL.")
+            out.append(f"# TYPE {p}_sql_seconds_total counter")
+            for statement, (_, seconds) in sorted(self.queries.items()):
+                label = _labels(("statement",), (statement[:STATEMENT_LABEL_MAX],))
+                out.append(f"{p}_sql_seconds_total{label} {seconds:.6f}")
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _histogram(out, name, help_text, label_names, histogram):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} histogram")
+        for labels, (counts, total, count) in sorted(histogram.series.items()):
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                le = 'le="%s"' % bound
+                out.append(f"{name}_bucket{_labels(label_names, labels, le)} {bucket_count}")
+            le = 'le="+Inf"'
+            out.append(f"{name}_bucket{_labels(label_names, labels, le)} {count}")
+            out.append(f"{name}_sum{_labels(label_names, labels)} {total:.6f}")
+            out.append(f"{name}_count{_labels(label_names, labels)} {count}")
+
+
+def server_timing(sql_seconds, sql_count, template_seconds, total_seconds):
+    return (
+        f'db;dur={sql_seconds * 1000:.1f};desc="{sql_count} queries", '
+        f"tpl;dur={template_seconds * 1000:.1f}, "
+        f"app;dur={total_seconds * 1000:.1f}"
+    )
+
+
+# ---------------- CONNECTION ----------------
+class TimedCursor(sqlite3.Cursor):
+    """Times a statement from execute through its last fetch and reports it once.
+
+    The observation (SQL, the original params, execute + fetch seconds) goes
+    to the metrics when the rows run out, the cursor is closed or it is
+    freed, so listeners such as the slow-query log see the statement's whole
+    cost. Rows read by iterating the cursor are not timed.
+    """
+
+    _pending = None   # [sql, params, seconds] until observed
+
+    def _begin(self, sql, params, seconds):
+        self._pending = [sql, params, seconds]
+        if self.description is None:   # no result rows (DML / DDL): done already
+            self._observe()
+
+    def _observe(self):
+        pending, self._pending = self._pending, None
+        metrics = TimedConnection.metrics
+        if pending is not None and metrics is not None:
+            metrics.observe_query(*pending)
+
+    def _timed_fetch(self, exhausted, fetch, *args):
+        start = time.perf_counter()
+        rows = None
+        try:
+            rows = fetch(*args)
+            return rows
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - start
+                if rows is None or exhausted(rows):
+                    self._observe()
+
+    def fetchone(self):
+        return self._timed_fetch(lambda row: False, super().fetchone)
+
+    def fetchmany(self, size=None):
+        size = size if size is not None else self.arraysize
+        return self._timed_fetch(lambda rows: len(rows) < size, super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed_fetch(lambda rows: True, super().fetchall)
+
+    def close(self):
+        self._observe()
+        super().close()
+
+    def __del__(self):
+        self._observe()
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection factory that reports every statement to `metrics`."""
+
+    metrics = None   # set by Metrics.install()
+
+    def _run(self, method, sql, params, observed_params):
+        cursor = self.cursor(TimedCursor)
+        start = time.perf_counter()
+        try:
+            method(cursor, sql, params)
+        except BaseException:
+            if self.metrics is not None:
+                self.metrics.observe_query(sql, observed_params, time.perf_counter() - start)
+            raise
+        cursor._begin(sql, observed_params, time.perf_counter() - start)
+        return cursor
+
+    def execute(self, sql, params=(), /):
+        return self._run(sqlite3.Cursor.execute, sql, params, params)
+
+    def executemany(self, sql, seq_of_params, /):
+        # the parameter rows may be a one-shot generator: not passed on
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_params, None)
+
+    def executescript(self, script, /):
+        start = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_query(script, None, time.perf_counter() - start)
+
+
+__all__ = [
+    "LATENCY_BUCKETS",
+    "normalize_sql",
+    "Histogram",
+    "Metrics",
+    "server_timing",
+    "TimedCursor",
+    "TimedConnection",
+]
@@ -0,0 +1,402 @@
+"""
+Numbered schema migrations, tracked in `schema_version`.
+
+Each migration is a function registered with a version number; the runner
+applies the ones missing from `schema_version` in order and records each
+with its duration. Migrations must be idempotent (CREATE ... IF NOT EXISTS,
+add_column_if_missing, backfills whose WHERE skips finished rows): a crash
+half-way simply runs one again.
+
+    @migration(15, "orders.item_count")
+    def _orders_item_count(conn):
+        add_column_if_missing(conn, "orders", "item_count", "INTEGER")
+        backfill(conn, "orders",
+                 "item_count = (SELECT COUNT(*) FROM order_items WHERE order_id = orders.id)",
+                 "item_count IS NULL")
+
+    migrate(conn)                     # at startup (init_db), unless MIGRATE_ON_STARTUP=0
+    migrate(conn, dry_run=True)       # pending migrations; reads only, writes nothing
+
+    flask --app app migrate [--dry-run] [--to N]
+
+Only one process migrates at a time: under BEGIN IMMEDIATE the runner reads
+the pending versions and claims `migration_lock`, and the claim holds while
+the migrations commit batch by batch (backfill.py), so the shop keeps
+writing. Other workers starting at the same moment wait for the claim to go
+and then find nothing pending. A claim whose process is gone (same host) or
+that is older than MIGRATION_LOCK_TIMEOUT (other hosts) is taken over.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from backfill import BACKFILL_BATCH, BACKFILL_PAUSE, backfill, in_batches
+from blobs import ensure_blobs
+from cart_store import ensure_cart_store
+from db_indexes import ensure_indexes
+from images import ensure_image_variants
+from inventory_io import ensure_skus, rekey_skus
+from page_cache import ensure_catalog_version
+from search import ensure_search_index
+from slow_queries import ensure_slow_queries
+from stats import ensure_stats
+from variants import ensure_variants
+
+log = logging.getLogger(__name__)
+
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "1") != "0"
+MIGRATION_LOCK_TIMEOUT = float(os.environ.get("MIGRATION_LOCK_TIMEOUT", "600"))   # seconds
+LOCK_POLL = 0.5             # seconds between looks at someone else's claim
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable
+
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register `fn(conn)` as migration `version`."""
+    def register(fn):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return register
+
+
+# ---------------- HELPERS ----------------
+def add_column_if_missing(conn, table, column, decl):
+    cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# ---------------- RUNNER ----------------
+def ensure_schema_version(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            duration_ms REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS migration_lock (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            owner TEXT NOT NULL,            -- host:pid
+            claimed_at REAL NOT NULL        -- unix time
+        )
+    """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    """Versions recorded in schema_version; read-only (none before the first migrate)."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return set()
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def pending(conn, target=None):
+    """Migrations not applied yet, up to `target`; read-only, like applied_versions()."""
+    done = applied_versions(conn)
+    return [
+        m for m in MIGRATIONS
+        if m.version not in done and (target is None or m.version <= target)
+    ]
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claim_alive(owner, claimed_at):
+    host, _, pid = owner.rpartition(":")
+    if owner == _owner():
+        return False   # ours, left by an earlier run in this process
+    if host == socket.gethostname() and os.name == "posix":
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except (OSError, ValueError):
+            pass
+        return True
+    return time.time() - claimed_at < MIGRATION_LOCK_TIMEOUT
+
+
+def _claim(conn, target, echo):
+    """Pending migrations, claimed for this process ([] once nothing is pending)."""
+    waiting = False
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            todo = pending(conn, target)
+            holder = conn.execute("SELECT owner, claimed_at FROM migration_lock WHERE id = 1").fetchone()
+            if todo and (holder is None or not _claim_alive(*holder)):
+                if holder is not None:
+                    log.warning("taking over the migration lock from %s", holder[0])
+                conn.execute(
+                    "INSERT OR REPLACE INTO migration_lock (id, owner, claimed_at) VALUES (1, ?, ?)",
+                    (_owner(), time.time()),
+                )
+                conn.commit()
+                return todo
+        finally:
+            conn.rollback()   # no-op after the commit above
+        if not todo:
+            return []
+        if not waiting:
+            echo(f"waiting for {holder[0]} to finish migrating")
+            waiting = True
+        time.sleep(LOCK_POLL)
+
+
+def migrate(conn, target=None, dry_run=False, echo=None):
+    """Apply pending migrations up to `target` (all by default).
+
+    Returns the migrations applied, or with dry_run the ones that would be.
+    `echo(text)` receives a line per migration (the CLI prints them).
+    """
+    echo = echo or log.info
+    if dry_run:
+        todo = pending(conn, target)
+        for m in todo:
+            echo(f"would apply {m.version:04d} {m.name}")
+        return todo
+
+    ensure_schema_version(conn)
+    todo = _claim(conn, target, echo)
+    try:
+        for m in todo:
+            echo(f"applying {m.version:04d} {m.name}")
+            started = time.perf_counter()
+            m.apply(conn)
+            conn.execute(
+                "INSERT OR IGNORE INTO schema_version (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)",
+                (m.version, m.name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                 round((time.perf_counter() - started) * 1000, 3)),
+            )
+            conn.execute("UPDATE migration_lock SET claimed_at = ? WHERE id = 1", (time.time(),))
+            conn.commit()
+    finally:
+        if todo:
+            conn.rollback()
+            conn.execute("DELETE FROM migration_lock WHERE id = 1 AND owner = ?", (_owner(),))
+            conn.commit()
+    return todo
+
+
+# ---------------- MIGRATIONS ----------------
+@migration(1, "base schema")
+def _base_schema(conn):
+    # Admins (with role)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT DEFAULT 'staff'
+        )
+    """)
+
+    # default super admin
+    conn.execute("""
+        INSERT OR IGNORE INTO admin (id, username, password, role)
+        VALUES (1, 'admin', 'admin123', 'superadmin')
+    """)
+
+    # Categories
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            description TEXT
+        )
+    """)
+
+    # Clothing (main table)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clothing (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            category TEXT,
+            size TEXT,
+            quantity INTEGER,
+            price REAL,
+            created_at TEXT,
+            image TEXT,
+            barcode TEXT,
+            qrcode TEXT,
+            codes_status TEXT DEFAULT 'ready',  -- pending / ready / failed
+            sku TEXT                            -- merge key for Excel imports
+        )
+    """)
+    add_column_if_missing(conn, "clothing", "codes_status", "TEXT DEFAULT 'ready'")
+    add_column_if_missing(conn, "clothing", "sku", "TEXT")
+
+    # Extra gallery images
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clothing_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clothing_id INTEGER,
+            image TEXT,
+            created_at TEXT
+        )
+    """)
+
+    # Stock movement logs
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clothing_id INTEGER,
+            change_type TEXT,      -- in / out / adjust / create / import
+            qty_change INTEGER,
+            note TEXT,
+            admin TEXT,
+            created_at TEXT
+        )
+    """)
+
+    # Activity logs
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT,
+            details TEXT,
+            created_at TEXT
+        )
+    """)
+
+    # Customers
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            phone TEXT,
+            address TEXT,
+            city TEXT,
+            state TEXT,
+            zip_code TEXT,
+            created_at TEXT
+        )
+    """)
+
+    # Orders
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number TEXT UNIQUE NOT NULL,
+            customer_id INTEGER,
+            total_amount REAL,
+            status TEXT DEFAULT 'pending',
+            payment_status TEXT DEFAULT 'unpaid',
+            shipping_address TEXT,
+            notes TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY(customer_id) REFERENCES customers(id)
+        )
+    """)
+
+    # Order Items
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            clothing_id INTEGER,
+            size TEXT,
+            quantity INTEGER,
+            price REAL,
+            FOREIGN KEY(order_id) REFERENCES orders(id),
+            FOREIGN KEY(clothing_id) REFERENCES clothing(id)
+        )
+    """)
+
+    # Notifications
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT,                 -- order_placed, order_shipped, order_delivered, payment_received
+            recipient TEXT,            -- 'admin' or customer_id
+            title TEXT,
+            message TEXT,
+            read INTEGER DEFAULT 0,
+            order_id INTEGER,
+            created_at TEXT
+        )
+    """)
+
+    # Cart (temporary storage for users)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cart (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            clothing_id INTEGER,
+            size TEXT,
+            quantity INTEGER,
+            added_at TEXT,
+            FOREIGN KEY(clothing_id) REFERENCES clothing(id)
+        )
+    """)
+    conn.commit()
+
+
+# Features that used to create their schema on every startup; each ensure_*
+# is idempotent, so databases that already have them just get recorded.
+migration(2, "cart sessions")(ensure_cart_store)
+migration(3, "full-text search")(ensure_search_index)
+migration(4, "sku key")(ensure_skus)
+migration(5, "per-size stock")(ensure_variants)
+migration(6, "category stats")(ensure_stats)
+migration(7, "image variants")(ensure_image_variants)
+migration(8, "blob refcounts")(ensure_blobs)
+migration(9, "catalog version")(ensure_catalog_version)
+migration(10, "slow query log")(ensure_slow_queries)
+migration(11, "seed variants without per-size parent updates")(ensure_variants)
+
+
+@migration(12, "secondary indexes")
+def _secondary_indexes(conn):
+    conn.execute("PRAGMA user_version = 0")   # the index set used to keep its own version here
+    ensure_indexes(conn)
+
+
+migration(13, "sku key without size")(rekey_skus)
+migration(14, "inventory quantity index")(ensure_indexes)
+
+
+__all__ = [
+    "MIGRATE_ON_STARTUP",
+    "MIGRATION_LOCK_TIMEOUT",
+    "BACKFILL_BATCH",
+    "BACKFILL_PAUSE",
+    "Migration",
+    "MIGRATIONS",
+    "migration",
+    "add_column_if_missing",
+    "backfill",
+    "in_batches",
+    "ensure_schema_version",
+    "applied_versions",
+    "pending",
+    "migrate",
+]
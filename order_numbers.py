@@ -0,0 +1,82 @@
+"""
+Collision-free order numbers.
+
+    ORD-20261017143005-0300A1B29C4E-007
+        |              | |     |   |
+        |              | |     |   +-- per-worker sequence within that second
+        |              | |     +------ startup nonce (random, hex)
+        |              | +------------ process id (hex)
+        |              +-------------- node id (ORDER_NODE_ID, hex)
+        +----------------------------- local timestamp (second resolution)
+
+Numbers are allocated in-process (no database round-trip). Process ids are
+unique among the live workers of one host, and the random nonce drawn at
+each process start covers a restarted worker that reuses a pid within the
+same second, so the numbers are unique across workers as long as every app
+node gets its own ORDER_NODE_ID (0-255).
+Within a worker the numbers are strictly increasing, even if the clock
+steps backwards or more than SEQ_LIMIT orders land in one second.
+"""
+
+from __future__ import annotations
+
+import datetime
+import os
+import secrets
+import threading
+import time
+
+SEQ_LIMIT = 0x1000  # orders per worker per second before borrowing the next second
+NONCE_BITS = 16     # random per process start; see OrderNumberAllocator
+
+
+class OrderNumberAllocator:
+    """Order numbers for one worker process (a fork gets a new pid and nonce)."""
+
+    def __init__(self, node_id=None, prefix="ORD"):
+        self.prefix = prefix
+        if node_id is None:
+            # Unique as long as no two nodes share an ORDER_NODE_ID. On a node the
+            # pid tells live workers apart; a worker restarted within the same
+            # second may reuse an exited worker's pid, and then only the startup
+            # nonce differs (the two collide if it matches too: 1 in 2**NONCE_BITS).
+            node_id = int(os.environ.get("ORDER_NODE_ID", 0))
+        self.node_id = node_id & 0xFF
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.nonce = secrets.randbits(NONCE_BITS)
+        self.worker_id = (self.node_id << 40) | ((self._pid & 0xFFFFFF) << NONCE_BITS) | self.nonce
+        self._last_second = 0
+        self._seq = 0
+
+    def next(self):
+        with self._lock:
+            if os.getpid() != self._pid:   # forked worker: new id, fresh counter
+                self._reset()
+
+            now = max(int(time.time()), self._last_second)
+            if now == self._last_second:
+                self._seq += 1
+                if self._seq >= SEQ_LIMIT:
+                    # sequence exhausted: borrow the next second (stays monotonic)
+                    now += 1
+                    self._seq = 0
+            else:
+                self._seq = 0
+            self._last_second = now
+
+            stamp = datetime.datetime.fromtimestamp(now).strftime("%Y%m%d%H%M%S")
+            return f"{self.prefix}-{stamp}-{self.worker_id:012X}-{self._seq:03X}"
+
+
+_allocator = OrderNumberAllocator()
+
+
+def next_order_number():
+    return _allocator.next()
+
+
+__all__ = ["OrderNumberAllocator", "next_order_number"]
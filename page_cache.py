@@ -0,0 +1,151 @@
+"""
+Rendered-page cache for anonymous catalog pages (/shop).
+
+`catalog_version` is a one-row table whose counter is bumped by triggers on
+every write to clothing, clothing_variants and clothing_images (and
+image_variants, so pages pick up thumbnails once they are rendered). That
+covers add/edit/delete, stock adjust, import and checkout without any route
+code.
+Cached pages are stored together with the version they were rendered at
+and are only served while it is still current. Each web worker reads the
+same counter, so all workers invalidate together.
+
+    version, changed_at = catalog_version(db)
+    body = cache.get(key, version)
+    if body is None:
+        body = render(); cache.put(key, version, body)
+
+The version also drives the validators: the ETag is derived from
+(version, key) and Last-Modified from the time of the last change, so a
+revalidation is answered with a 304 after one single-row read.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# tables whose rows show up on catalog pages
+VERSIONED_TABLES = ("clothing", "clothing_variants", "clothing_images", "image_variants")
+
+_BUMP_SQL = """
+    UPDATE catalog_version
+    SET version = version + 1,
+        changed_at = strftime('%Y-%m-%d %H:%M:%S', 'now')
+    WHERE id = 1
+"""
+
+
+# ---------------- SCHEMA ----------------
+def ensure_catalog_version(conn):
+    """Create the version row + bump triggers if missing."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            changed_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO catalog_version (id, version, changed_at)
+        VALUES (1, 1, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+    """)
+    for table in VERSIONED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    {_BUMP_SQL};
+                END
+            """)
+    conn.commit()
+
+
+def bump_catalog_version(conn):
+    """Invalidate every cached page (writes made with the bump triggers off)."""
+    conn.execute(_BUMP_SQL)
+    conn.commit()
+
+
+def catalog_version(db):
+    """(version, changed_at as an aware UTC datetime)."""
+    row = db.execute("SELECT version, changed_at FROM catalog_version WHERE id = 1").fetchone()
+    changed_at = datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S").replace(
+        tzinfo=datetime.timezone.utc
+    )
+    return row[0], changed_at
+
+
+def page_etag(key, version):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return f"v{version}-{digest}"
+
+
+# ---------------- CACHE ----------------
+class PageCache:
+    """Thread-safe LRU of rendered pages, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (version, body)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, body):
+        size = len(body)
+        if size > self.max_bytes // 8:
+            return   # one huge page must not flush the whole cache
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (version, body)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+__all__ = [
+    "CACHE_MAX_ENTRIES",
+    "CACHE_MAX_BYTES",
+    "ensure_catalog_version",
+    "bump_catalog_version",
+    "catalog_version",
+    "page_etag",
+    "PageCache",
+]
@@ -0,0 +1,167 @@
+"""
+Keyset (cursor) pagination helpers shared by the list routes.
+
+Offset pagination costs O(offset) per page, so every list route also hands
+out opaque next/prev cursors keyed on (sort column, id). Following a cursor
+turns the page query into an index range scan:
+
+    ks = Keyset("o.created_at", descending=True, token=request.args.get("cursor"),
+                tiebreak="o.id")
+    if ks.where:
+        where_clause += f" AND {ks.where}"
+        params += ks.params
+    rows = db.execute(f"... {where_clause} ORDER BY {ks.order_by} LIMIT ?",
+                      params + [per_page + 1]).fetchall()   # one extra row = "has more"
+    rows, next_cursor, prev_cursor = ks.paginate(rows, per_page)
+
+Total counts are only used for the "N results" label and the page-number
+window, so `cached_count()` keeps them for a short TTL instead of running
+COUNT(*) on every page view.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import threading
+import time
+
+COUNT_TTL = 30          # seconds a cached total stays fresh
+COUNT_CACHE_SIZE = 512  # distinct (query, params) totals kept per worker
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+# ---------------- CURSORS ----------------
+def encode_cursor(direction, column, value, row_id):
+    raw = json.dumps([direction, column, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (direction, column, value, id), or None for a missing/garbled token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, column, value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev"):
+        return None
+    return direction, column, value, row_id
+
+
+class Keyset:
+    """Range predicate + ordering for one page of a (column, id) keyset.
+
+    Sort columns are expected to be populated (every write path sets them);
+    rows with a NULL sort value fall outside the cursor ranges.
+    """
+
+    def __init__(self, column, descending=True, token=None, tiebreak="id"):
+        self.column = column
+        self.tiebreak = tiebreak
+        self.descending = descending
+        self.direction = None
+        self.values = None
+
+        cursor = decode_cursor(token)
+        if cursor and cursor[1] == column:   # ignore cursors from another sort
+            self.direction = cursor[0]
+            self.values = (cursor[2], cursor[3])
+
+    @property
+    def active(self):
+        return self.values is not None
+
+    @property
+    def _reversed(self):
+        # walking backwards from a "prev" cursor reads the index in reverse
+        return self.direction == "prev"
+
+    @property
+    def where(self):
+        if not self.active:
+            return ""
+        forward = "<" if self.descending else ">"
+        backward = ">" if self.descending else "<"
+        op = backward if self._reversed else forward
+        return f"({self.column}, {self.tiebreak}) {op} (?, ?)"
+
+    @property
+    def params(self):
+        return list(self.values) if self.active else []
+
+    @property
+    def order_by(self):
+        desc = self.descending != self._reversed
+        direction = "DESC" if desc else "ASC"
+        return f"{self.column} {direction}, {self.tiebreak} {direction}"
+
+    def _token(self, direction, row):
+        key = self.column.rsplit(".", 1)[-1]
+        tb = self.tiebreak.rsplit(".", 1)[-1]
+        return encode_cursor(direction, self.column, row[key], row[tb])
+
+    def paginate(self, rows, per_page, has_prev=None):
+        """Trim the per_page + 1 fetched rows and build the neighbouring cursors.
+
+        `has_prev` is only needed for offset-mode pages (page > 1 without a cursor).
+        """
+        rows = list(rows)
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+
+        if self._reversed:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next = more
+            has_previous = self.active if has_prev is None else has_prev
+
+        next_token = self._token("next", rows[-1]) if rows and has_next else None
+        prev_token = self._token("prev", rows[0]) if rows and has_previous else None
+        return rows, next_token, prev_token
+
+
+# ---------------- COUNTS ----------------
+def cached_count(db, sql, params=(), ttl=COUNT_TTL):
+    """Run a COUNT query at most once per `ttl` seconds for the same params.
+
+    The query must select the count as its first column.
+    """
+    key = (sql, tuple(params))
+    now = time.monotonic()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    row = db.execute(sql, params).fetchone()
+    value = row[0] if row else 0
+
+    with _count_lock:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            # drop expired entries first, then the oldest ones
+            for k in [k for k, v in _count_cache.items() if v[0] <= now] or list(_count_cache)[:64]:
+                _count_cache.pop(k, None)
+        _count_cache[key] = (now + ttl, value)
+    return value
+
+
+def page_window(page, total_pages, radius=3):
+    """Page numbers around the current page (instead of one link per page)."""
+    start = max(1, page - radius)
+    end = min(total_pages, page + radius)
+    return list(range(start, end + 1))
+
+
+__all__ = [
+    "Keyset",
+    "encode_cursor",
+    "decode_cursor",
+    "cached_count",
+    "page_window",
+]
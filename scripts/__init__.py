@@ -0,0 +1,7 @@
+"""
+Operational checks run against a deployment's configuration.
+
+    python -m scripts.storage_check                  # the backend STORAGE_BACKEND selects
+    python -m scripts.storage_check --create-bucket  # S3: create S3_BUCKET first (local MinIO)
+    python -m scripts.import_check                   # merge imports on a scratch database
+"""
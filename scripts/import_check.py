@@ -0,0 +1,103 @@
+"""
+Run merge imports against a scratch database and check the resulting stock.
+
+    python -m scripts.import_check
+
+The database is a temporary file migrated to the current schema, so the
+variant, SKU and stats triggers are the production ones; inventory.db is
+never touched. Each case imports a sheet with import_workbook(mode="merge")
+and compares every product's size list and per-size quantities. Exits
+with status 1 on the first failed case.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+import openpyxl
+
+from inventory_io import EXPORT_HEADERS, import_workbook
+from migrations import migrate
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def sheet(rows):
+    """An .xlsx upload holding `rows` (name, category, size, quantity, price[, created_at, sku])."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(EXPORT_HEADERS)
+    for row in rows:
+        ws.append(list(row))
+    out = io.BytesIO()
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+def stock(db, sku):
+    """(clothing.size, [(size, quantity), ...] in variant order) for `sku`."""
+    row = db.execute("SELECT id, size FROM clothing WHERE sku = ?", (sku,)).fetchone()
+    if row is None:
+        raise CheckFailed(f"no product with SKU {sku!r}")
+    variants = db.execute(
+        "SELECT size, quantity FROM clothing_variants WHERE clothing_id = ? ORDER BY id", (row[0],)
+    ).fetchall()
+    return row[1], [tuple(v) for v in variants]
+
+
+def expect_stock(db, sku, size_text, variants):
+    got = stock(db, sku)
+    if got != (size_text, variants):
+        raise CheckFailed(f"{sku}: expected {size_text} {variants}, got {got[0]} {got[1]}")
+
+
+# (description, sheet rows, {sku: (clothing.size, [(size, quantity), ...])})
+CASES = [
+    ("new product from one multi-size row keeps the size order",
+     [("Wrap Dress", "Dress", "S/M/L", 4, 20.0)],
+     {"wrap dress|dress": ("S/M/L", [("S", 4), ("M", 0), ("L", 0)])}),
+    ("new product from one row per size keeps order and quantities",
+     [("Polo", "Men", "M", 3, 15.0), ("Polo", "Men", "S", 1, 15.0), ("Polo", "Men", "XL", 7, 16.0)],
+     {"polo|men": ("M/S/XL", [("M", 3), ("S", 1), ("XL", 7)])}),
+    ("a row updates only its size; listed sizes are added, not zeroed",
+     [("Wrap Dress", "Dress", "M", 9, 20.0), ("Wrap Dress", "Dress", "XL/S", 2, 20.0)],
+     {"wrap dress|dress": ("S/M/L/XL", [("S", 4), ("M", 9), ("L", 0), ("XL", 2)])}),
+    ("the last row for a size wins",
+     [("Polo", "Men", "S", 5, 15.0), ("Polo", "Men", "S", 6, 15.0)],
+     {"polo|men": ("M/S/XL", [("M", 3), ("S", 6), ("XL", 7)])}),
+]
+
+
+def run_checks(db, echo=print):
+    for description, rows, expected in CASES:
+        import_workbook(db, sheet(rows), admin="import_check", mode="merge")
+        for sku, (size_text, variants) in expected.items():
+            expect_stock(db, sku, size_text, variants)
+        echo(f"ok    {description}")
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="import-check-")
+    os.close(fd)
+    db = sqlite3.connect(path)
+    try:
+        migrate(db)
+        run_checks(db)
+    except CheckFailed as e:
+        print(f"FAIL  {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+        os.remove(path)
+    print("import OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Exercise the configured storage backend: put / get / stream / exists / list / url / delete.
+
+    docker run -p 9000:9000 -e MINIO_ROOT_USER=minio -e MINIO_ROOT_PASSWORD=minio123 \\
+        minio/minio server /data
+    STORAGE_BACKEND=s3 S3_BUCKET=clothing-check S3_ENDPOINT_URL=http://127.0.0.1:9000 \\
+    AWS_ACCESS_KEY_ID=minio AWS_SECRET_ACCESS_KEY=minio123 AWS_DEFAULT_REGION=us-east-1 \\
+        python -m scripts.storage_check --create-bucket
+
+The backend comes from storage_from_env(), the same settings the app reads
+(see storage.py). Every object is written under a fresh "check-<hex>/"
+folder and deleted again. For S3 the URL from url() is fetched over HTTP
+and must return the stored bytes, so run it from a host that can reach
+S3_PUBLIC_URL / the endpoint the way a browser would. Exits with status 1
+on the first failed step.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import pickle
+import sys
+import urllib.request
+import uuid
+
+from storage import S3Storage, storage_from_env
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise CheckFailed(message)
+
+
+def create_bucket(storage):
+    from botocore.exceptions import ClientError
+    try:
+        storage.client.create_bucket(Bucket=storage.bucket)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+            raise
+
+
+def run_checks(storage, echo=print):
+    """Run every operation once under a fresh folder; raises CheckFailed."""
+    folder = f"check-{uuid.uuid4().hex[:12]}"
+    small = f"{folder}/small.txt"
+    large = f"{folder}/large.bin"
+    small_body = b"storage check\n"
+    large_body = os.urandom(300 * 1024)   # several STREAM_CHUNKs, sent as a file object
+
+    def step(name, fn):
+        fn()
+        echo(f"ok    {name}")
+
+    def put():
+        storage.put(small, small_body, "text/plain")
+        storage.put(large, io.BytesIO(large_body))
+
+    def get():
+        expect(storage.get(small) == small_body, f"get({small!r}) returned other bytes")
+        expect(storage.get(large) == large_body, f"get({large!r}) returned other bytes")
+
+    def stream():
+        expect(b"".join(storage.stream(large)) == large_body, f"stream({large!r}) returned other bytes")
+
+    def exists():
+        expect(storage.exists(small), f"exists({small!r}) is False after put")
+        expect(not storage.exists(f"{folder}/missing.txt"), "exists() is True for a missing name")
+
+    def listing():
+        names = sorted(storage.list(f"{folder}/"))
+        expect(names == sorted([small, large]), f"list({folder + '/'!r}) returned {names}")
+
+    def url():
+        link = storage.url(small)
+        if link is None:
+            echo("      url() is None: served by /uploads")
+            return
+        with urllib.request.urlopen(link, timeout=30) as resp:
+            expect(resp.read() == small_body, f"GET {link} returned other bytes")
+
+    def pickled():
+        copy = pickle.loads(pickle.dumps(storage))   # what jobs.py workers receive
+        expect(copy.get(small) == small_body, "unpickled storage returned other bytes")
+
+    def delete():
+        storage.delete(small)
+        storage.delete(large)
+        storage.delete(small)   # deleting twice is not an error
+        expect(not storage.exists(small), f"exists({small!r}) is True after delete")
+        try:
+            storage.get(small)
+        except FileNotFoundError:
+            return
+        raise CheckFailed(f"get({small!r}) after delete did not raise FileNotFoundError")
+
+    try:
+        for name, fn in [("put", put), ("get", get), ("stream", stream), ("exists", exists),
+                         ("list", listing), ("url", url), ("pickle", pickled), ("delete", delete)]:
+            step(name, fn)
+    finally:
+        for name in (small, large):
+            try:
+                storage.delete(name)
+            except Exception:
+                pass
+        if storage.root:
+            try:
+                os.rmdir(os.path.join(storage.root, folder))
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--create-bucket", action="store_true", help="S3: create S3_BUCKET if missing")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="local backend directory (default uploads/)")
+    args = parser.parse_args(argv)
+
+    storage = storage_from_env(args.root)
+    if isinstance(storage, S3Storage):
+        print(f"s3 bucket={storage.bucket} prefix={storage.prefix!r} endpoint={storage.endpoint_url} "
+              f"addressing={storage.addressing_style}")
+        if args.create_bucket:
+            create_bucket(storage)
+    else:
+        print(f"local {storage.root}")
+    try:
+        run_checks(storage)
+    except CheckFailed as e:
+        print(f"FAIL  {e}")
+        sys.exit(1)
+    print("storage OK")
+
+
+if __name__ == "__main__":
+    main()
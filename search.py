@@ -0,0 +1,207 @@
+"""
+Full-text search over the catalog and customers (SQLite FTS5).
+
+`clothing_fts` indexes clothing(name, category, size) and `customers_fts`
+indexes customers(name, email, phone). Both are external-content tables kept
+in sync by triggers, so every write path (forms, import, checkout) updates
+them without any route code.
+
+Routes join the ranked match set instead of running `LIKE '%term%'`:
+
+    fts = clothing_search(search)          # None if nothing searchable
+    if fts:
+        join_sql, join_params = fts        # "JOIN (...) AS f ON f.rowid = clothing.id"
+        ... ORDER BY f.rank                # best match first
+
+Orders are searched by customer or order number, as a WHERE fragment:
+
+    where_sql, params = order_search(search)   # alias "o" for orders
+
+Each search word is matched as a token prefix ("jea" finds "Jeans"), and all
+words must match.
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+
+from backfill import in_batches
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# table -> (indexed columns, content table)
+FTS_TABLES = {
+    "clothing_fts": (("name", "category", "size"), "clothing"),
+    "customers_fts": (("name", "email", "phone"), "customers"),
+}
+
+
+def _fts5_available():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+FTS_ENABLED = _fts5_available()
+
+
+# ---------------- SCHEMA ----------------
+def _create_triggers(conn, fts, columns, content):
+    """Sync triggers for `fts`.
+
+    Other AFTER INSERT triggers on the content table (the variant seed) can
+    update the new row before {fts}_ai has indexed it, and while the index is
+    being filled most rows are not in it yet, so the update and delete
+    triggers only delete rows that are in the index and the insert trigger
+    skips rows an update already indexed.
+    """
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+    indexed = f"EXISTS (SELECT 1 FROM {fts}_docsize WHERE id = {{}}.id)"
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {content} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) SELECT new.id, {new_cols}
+            WHERE NOT {indexed.format("new")};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {content} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) SELECT 'delete', old.id, {old_cols}
+            WHERE {indexed.format("old")};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {content} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) SELECT 'delete', old.id, {old_cols}
+            WHERE {indexed.format("old")};
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+        END
+    """)
+
+
+def _create_fts(conn, fts, columns, content):
+    cols = ", ".join(columns)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            {cols},
+            content='{content}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    _create_triggers(conn, fts, columns, content)
+    # index the rows that already exist, in batches (the triggers cover new writes)
+    fill = f"""
+        INSERT INTO {fts}(rowid, {cols})
+        SELECT id, {cols} FROM {content}
+        WHERE id > ? AND id <= ?
+          AND NOT EXISTS (SELECT 1 FROM {fts}_docsize WHERE id = {content}.id)
+    """
+    in_batches(conn, content, lambda low, high: conn.execute(fill, (low, high)).rowcount)
+
+
+def _upgrade_triggers(conn, fts, columns, content):
+    """Replace sync triggers from before the _docsize guards."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (f"{fts}_au",)).fetchone()
+    if row and "_docsize" in row[0]:
+        return
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+    _create_triggers(conn, fts, columns, content)
+
+
+def ensure_search_index(conn):
+    """Create the FTS tables + sync triggers if missing (and backfill them)."""
+    if not FTS_ENABLED:
+        return False
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    for fts, (columns, content) in FTS_TABLES.items():
+        if fts not in existing:
+            _create_fts(conn, fts, columns, content)
+        else:
+            _upgrade_triggers(conn, fts, columns, content)
+    conn.commit()
+    return True
+
+
+def rebuild_search_index(conn):
+    """Re-index every FTS table from its content table (after a bulk load with the triggers off)."""
+    if not FTS_ENABLED:
+        return
+    for fts in FTS_TABLES:
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+
+# ---------------- QUERIES ----------------
+def fts_query(term):
+    """Turn free text into an FTS5 query: every word as a quoted token prefix."""
+    words = _WORD_RE.findall(term or "")
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _search_join(fts, target, term):
+    query = fts_query(term) if FTS_ENABLED else None
+    if not query:
+        return None
+    join_sql = (
+        f"JOIN (SELECT rowid, rank FROM {fts} WHERE {fts} MATCH ?) AS f "
+        f"ON f.rowid = {target}"
+    )
+    return join_sql, [query]
+
+
+def clothing_search(term, target="clothing.id"):
+    """(join_sql, params) restricting clothing to ranked matches, or None."""
+    return _search_join("clothing_fts", target, term)
+
+
+def customer_search(term, target="c.id"):
+    """(join_sql, params) restricting customers to ranked matches, or None."""
+    return _search_join("customers_fts", target, term)
+
+
+def _prefix_end(prefix):
+    """Smallest string above every string starting with `prefix` (for a range scan)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def order_search(term, order="o"):
+    """(where_sql, params) matching orders by customer or order-number prefix, or None.
+
+    The customer side is a customers_fts match on the order's customer_id,
+    the order number a range on its unique index; SQLite runs the OR as two
+    index lookups instead of scanning orders.
+    """
+    query = fts_query(term) if FTS_ENABLED else None
+    if not query:
+        return None
+    prefix = term.strip().upper()
+    where_sql = (
+        f"({order}.customer_id IN (SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?) "
+        f"OR ({order}.order_number >= ? AND {order}.order_number < ?))"
+    )
+    return where_sql, [query, prefix, _prefix_end(prefix)]
+
+
+__all__ = [
+    "FTS_ENABLED",
+    "ensure_search_index",
+    "rebuild_search_index",
+    "fts_query",
+    "clothing_search",
+    "customer_search",
+    "order_search",
+]
@@ -0,0 +1,213 @@
+"""
+Persistent slow-query log, grouped by query fingerprint.
+
+Hooks into metrics.py: every statement on a pooled connection that takes at
+least SLOW_QUERY_MS is kept for the request, and when the request ends one
+write stores it in `slow_queries` together with its fingerprint (the
+normalized SQL, literals stripped), the number of bound parameters, the
+Flask endpoint and its EXPLAIN QUERY PLAN. Dynamic queries built with
+f-strings (filters, IN lists) land in one group per query shape.
+
+    slow_log = SlowQueryLog(db_pool.connect, threshold_ms=50)
+    slow_log.install(app, metrics)
+    summary(db)                 # per fingerprint: count, p50/p95/p99, last plan
+
+Statements outside a request (CLI, job callbacks) are not logged.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import logging
+import os
+
+from flask import g, has_request_context, request
+
+from metrics import normalize_sql
+
+log = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+SLOW_LOG_MAX_ROWS = 20_000          # oldest rows are trimmed beyond this
+SAMPLE_SQL_MAX = 4000
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def fingerprint_id(fingerprint):
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))   # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def _param_count(params):
+    if params is None:
+        return None
+    try:
+        return len(params)
+    except TypeError:
+        return None
+
+
+# ---------------- SCHEMA ----------------
+def ensure_slow_queries(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS slow_queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fingerprint_id TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            sample_sql TEXT,
+            param_count INTEGER,
+            endpoint TEXT,
+            duration_ms REAL NOT NULL,
+            plan TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_slow_queries_fp
+        ON slow_queries(fingerprint_id, duration_ms)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_slow_queries_created ON slow_queries(created_at)")
+    conn.commit()
+
+
+def explain_plan(conn, sql, params):
+    """EXPLAIN QUERY PLAN as ' | '-joined details ('' for statements without one)."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return ""
+    if params is None:
+        params = [None] * sql.count("?")    # executemany: plan shape only
+    try:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except Exception as e:   # sqlite3.Error, mismatched bindings, ...
+        return f"(no plan: {e})"
+    return " | ".join(row[3] for row in rows)
+
+
+# ---------------- LOG ----------------
+class SlowQueryLog:
+    def __init__(self, connect, threshold_ms=SLOW_QUERY_MS, max_rows=SLOW_LOG_MAX_ROWS):
+        self.connect = connect
+        self.threshold = threshold_ms / 1000.0
+        self.max_rows = max_rows
+        self._writes = 0
+
+    def install(self, app, metrics):
+        metrics.listeners.append(self.observe)
+        app.teardown_request(self.flush)
+
+    def observe(self, sql, params, seconds):
+        if seconds < self.threshold or not has_request_context():
+            return
+        pending = g.setdefault("slow_queries", [])
+        pending.append((sql, params, seconds, request.endpoint or "unmatched"))
+
+    def flush(self, exc=None):
+        pending = g.pop("slow_queries", None)
+        if not pending:
+            return
+        try:
+            self.record(pending)
+        except Exception:
+            log.exception("could not write the slow-query log")
+
+    def record(self, entries):
+        """Store (sql, params, seconds, endpoint) tuples; uses its own connection."""
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = self.connect()
+        try:
+            rows = []
+            for sql, params, seconds, endpoint in entries:
+                fingerprint = normalize_sql(sql)
+                rows.append((
+                    fingerprint_id(fingerprint),
+                    fingerprint,
+                    sql[:SAMPLE_SQL_MAX],
+                    _param_count(params),
+                    endpoint,
+                    round(seconds * 1000, 3),
+                    explain_plan(conn, sql, params),
+                    now,
+                ))
+            conn.executemany("""
+                INSERT INTO slow_queries
+                    (fingerprint_id, fingerprint, sample_sql, param_count,
+                     endpoint, duration_ms, plan, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute(
+                    "DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?",
+                    (self.max_rows,)
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# ---------------- REPORT ----------------
+def summary(db, since=None):
+    """Per fingerprint: count, p50/p95/p99/max (ms), endpoints and the latest plan.
+
+    Sorted by total time, slowest first.
+    """
+    where, params = "", ()
+    if since:
+        where, params = "WHERE created_at >= ?", (since,)
+    groups = {}
+    for row in db.execute(f"""
+        SELECT fingerprint_id, fingerprint, duration_ms, endpoint, plan, param_count, created_at
+        FROM slow_queries {where}
+        ORDER BY fingerprint_id, duration_ms
+    """, params):
+        group = groups.get(row["fingerprint_id"])
+        if group is None:
+            group = groups[row["fingerprint_id"]] = {
+                "fingerprint_id": row["fingerprint_id"],
+                "fingerprint": row["fingerprint"],
+                "durations": [],
+                "endpoints": set(),
+                "plan": row["plan"],
+                "param_count": row["param_count"],
+                "last_seen": row["created_at"],
+            }
+        group["durations"].append(row["duration_ms"])
+        group["endpoints"].add(row["endpoint"])
+        if row["created_at"] >= group["last_seen"]:
+            group["last_seen"], group["plan"] = row["created_at"], row["plan"]
+
+    result = []
+    for group in groups.values():
+        durations = group.pop("durations")
+        group.update(
+            count=len(durations),
+            total_ms=sum(durations),
+            p50=percentile(durations, 50),
+            p95=percentile(durations, 95),
+            p99=percentile(durations, 99),
+            max=durations[-1],
+            endpoints=sorted(group["endpoints"]),
+        )
+        result.append(group)
+    result.sort(key=lambda group: group["total_ms"], reverse=True)
+    return result
+
+
+__all__ = [
+    "SLOW_QUERY_MS",
+    "fingerprint_id",
+    "percentile",
+    "ensure_slow_queries",
+    "explain_plan",
+    "SlowQueryLog",
+    "summary",
+]
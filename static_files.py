@@ -0,0 +1,122 @@
+"""
+Cache policy and delivery for files served from /uploads.
+
+Files whose name carries a content hash (`barcode_4.1a2b3c4d5e6f.png`,
+`thumbs/item_5_tee.png.3f2a9c01d4e7.320.webp`, `img_<hash>.jpg`) never change
+under that name, so browsers may keep them for a year without asking again:
+
+    Cache-Control: public, max-age=31536000, immutable
+
+Every other file (original photos, codes from before hashed names) is sent
+with `no-cache` and an ETag, so a repeat visit costs a 304, not the body.
+Range requests (partial downloads, resumed transfers) are answered for both.
+With the S3 backend (storage.py) the response is a short-lived redirect to
+the object's URL instead.
+
+The body itself can be handed to the front server (UPLOADS_OFFLOAD):
+
+    "x-sendfile"        X-Sendfile: /abs/path/to/uploads/<name>     (Apache, lighttpd)
+    "x-accel-redirect"  X-Accel-Redirect: /_uploads/<name>          (nginx)
+
+nginx needs an internal location mapping the prefix onto the uploads folder:
+
+    location /_uploads/ { internal; alias /srv/clothing/uploads/; }
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from flask import Response, abort, redirect, request, send_from_directory
+from werkzeug.security import safe_join
+
+HASH_LEN = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+OFFLOAD_MODES = ("", "x-sendfile", "x-accel-redirect")
+REDIRECT_MAX_AGE = 300
+
+# names this app derives from content: codes "barcode_4.<hash>.png",
+# thumbnails "thumbs/<source>.<hash>.<width>.<fmt>" and photos "img_<sha256/128>.<ext>"
+# (blobs.py); user file names never match
+_HASHED = re.compile(
+    r"^(?:(?:barcode|qr)_\d+\.[0-9a-f]{%d}\.png|thumbs/.+\.[0-9a-f]{%d}\.\d+\.[a-z]+"
+    r"|img_[0-9a-f]{32}(?:\.[a-z0-9]+)?)$"
+    % (HASH_LEN, HASH_LEN)
+)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LEN]
+
+
+def is_content_addressed(filename):
+    return bool(_HASHED.search(filename))
+
+
+def _cache_headers(response, immutable):
+    cc = response.cache_control
+    cc.public = True
+    if immutable:
+        cc.max_age = IMMUTABLE_MAX_AGE
+        cc.immutable = True
+        cc.no_cache = None
+    else:
+        cc.max_age = None
+        cc.no_cache = True
+    return response
+
+
+def _offloaded(path, filename, offload, accel_prefix):
+    """Headers-only response; the front server sends the body (and handles Range)."""
+    stat = os.stat(path)
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+    if offload == "x-sendfile":
+        response.headers["X-Sendfile"] = path
+    else:
+        response.headers["X-Accel-Redirect"] = accel_prefix + quote(filename)
+    response.set_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    response.last_modified = stat.st_mtime
+    return response.make_conditional(request)
+
+
+def serve_upload(storage, filename, offload="", accel_prefix="/_uploads/", immutable=None):
+    """Send an upload (storage.py) with the cache policy for its name.
+
+    `immutable` overrides the name-based decision (e.g. when the original is
+    sent in place of a missing thumbnail). Files in a bucket are answered
+    with a redirect to the bucket's URL for them.
+    """
+    if immutable is None:
+        immutable = is_content_addressed(filename)
+
+    directory = storage.root
+    if directory is None:
+        response = redirect(storage.url(filename), 302)
+        # presigned URLs expire: browsers may reuse the redirect only briefly
+        response.cache_control.private = True
+        response.cache_control.max_age = REDIRECT_MAX_AGE
+        return response
+
+    if offload:
+        path = safe_join(directory, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = _offloaded(path, filename, offload, accel_prefix)
+    else:
+        # conditional=True: ETag / If-None-Match / If-Modified-Since and Range
+        response = send_from_directory(directory, filename, conditional=True, etag=True)
+    return _cache_headers(response, immutable)
+
+
+__all__ = [
+    "HASH_LEN",
+    "IMMUTABLE_MAX_AGE",
+    "OFFLOAD_MODES",
+    "content_hash",
+    "is_content_addressed",
+    "serve_upload",
+]
@@ -0,0 +1,178 @@
+"""
+Materialized dashboard aggregates.
+
+`category_stats` holds one row per category (item count, units in stock,
+low-stock items). Triggers on `clothing` keep it current, so every write path
+(forms, stock adjust, import, checkout) updates it without any route code,
+and the dashboard reads a handful of rows instead of aggregating the
+catalog:
+
+    totals = load_totals(db)      # {"total_items": ..., "total_qty": ..., "low_stock": ...}
+    top = top_categories(db, 6)   # [(category, qty), ...]
+
+Rows with a NULL category are counted under ''.
+"""
+
+from __future__ import annotations
+
+from backfill import in_batches
+
+LOW_STOCK_LEVEL = 5
+
+STATS_TRIGGERS = ("clothing_stats_ai", "clothing_stats_ad", "clothing_stats_au")
+
+
+# SQL fragments for the row a trigger adds/removes (`ref` = new / old)
+def _key(ref):
+    return f"IFNULL({ref}.category, '')"
+
+
+def _low(ref):
+    return f"COALESCE({ref}.quantity < {LOW_STOCK_LEVEL}, 0)"
+
+
+def _add_row(ref):
+    return f"""
+        INSERT INTO category_stats (category, items, qty, low_stock)
+        VALUES ({_key(ref)}, 1, IFNULL({ref}.quantity, 0), {_low(ref)})
+        ON CONFLICT(category) DO UPDATE SET
+            items = items + 1,
+            qty = qty + excluded.qty,
+            low_stock = low_stock + excluded.low_stock;
+    """
+
+
+def _remove_row(ref):
+    return f"""
+        UPDATE category_stats SET
+            items = items - 1,
+            qty = qty - IFNULL({ref}.quantity, 0),
+            low_stock = low_stock - {_low(ref)}
+        WHERE category = {_key(ref)};
+        DELETE FROM category_stats WHERE category = {_key(ref)} AND items <= 0;
+    """
+
+
+# ---------------- SCHEMA ----------------
+def _create_triggers(conn, guarded=False):
+    """The stats triggers; `guarded` ones only track rows the fill has counted."""
+    when = "WHEN {}.id <= (SELECT upto FROM category_stats_fill)" if guarded else ""
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_stats_ai AFTER INSERT ON clothing {when.format("new")} BEGIN
+            {_add_row("new")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_stats_ad AFTER DELETE ON clothing {when.format("old")} BEGIN
+            {_remove_row("old")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_stats_au AFTER UPDATE OF category, quantity ON clothing
+        {when.format("old")} BEGIN
+            {_remove_row("old")}
+            {_add_row("new")}
+        END
+    """)
+
+
+def _count_range(conn, low, high=None):
+    """Add the rows low < id <= high (not counted yet) to category_stats and move the watermark."""
+    low = max(low, conn.execute("SELECT upto FROM category_stats_fill").fetchone()[0])
+    if high is None:
+        high = conn.execute("SELECT IFNULL(MAX(id), 0) FROM clothing").fetchone()[0]
+    if high <= low:
+        return 0
+    cur = conn.execute(f"""
+        INSERT INTO category_stats (category, items, qty, low_stock)
+        SELECT IFNULL(category, ''), COUNT(*), COALESCE(SUM(quantity), 0),
+               SUM(COALESCE(quantity < {LOW_STOCK_LEVEL}, 0))
+        FROM clothing
+        WHERE id > ? AND id <= ?
+        GROUP BY IFNULL(category, '')
+        ON CONFLICT(category) DO UPDATE SET
+            items = items + excluded.items,
+            qty = qty + excluded.qty,
+            low_stock = low_stock + excluded.low_stock
+    """, (low, high))
+    conn.execute("UPDATE category_stats_fill SET upto = ?", (high,))
+    return cur.rowcount
+
+
+def ensure_stats(conn):
+    """Create the stats table + triggers if missing (and fill it). Returns True if created.
+
+    The fill runs in batches while the shop keeps writing: until it is done
+    the triggers only track rows at or below the fill's watermark, and the
+    rows above it are counted when their batch comes. An interrupted fill
+    resumes from the watermark.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS category_stats (
+            category TEXT PRIMARY KEY,
+            items INTEGER NOT NULL DEFAULT 0,
+            qty INTEGER NOT NULL DEFAULT 0,
+            low_stock INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('trigger', 'table')")
+    }
+    if all(name in existing for name in STATS_TRIGGERS) and "category_stats_fill" not in existing:
+        return False
+
+    if "category_stats_fill" not in existing:
+        conn.execute("DELETE FROM category_stats")
+        conn.execute("CREATE TABLE category_stats_fill (upto INTEGER NOT NULL)")
+        conn.execute("INSERT INTO category_stats_fill (upto) VALUES (0)")
+        _create_triggers(conn, guarded=True)
+        conn.commit()
+    in_batches(conn, "clothing", lambda low, high: _count_range(conn, low, high))
+
+    # rows added during the fill, then the unguarded triggers, in one transaction
+    conn.execute("BEGIN IMMEDIATE")
+    _count_range(conn, 0)
+    for name in STATS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    _create_triggers(conn)
+    conn.execute("DROP TABLE category_stats_fill")
+    conn.commit()
+    return True
+
+
+def rebuild_stats(conn):
+    """Recompute category_stats from scratch (one pass over clothing)."""
+    conn.execute("DELETE FROM category_stats")
+    conn.execute(f"""
+        INSERT INTO category_stats (category, items, qty, low_stock)
+        SELECT IFNULL(category, ''), COUNT(*), COALESCE(SUM(quantity), 0),
+               SUM(COALESCE(quantity < {LOW_STOCK_LEVEL}, 0))
+        FROM clothing
+        GROUP BY IFNULL(category, '')
+    """)
+    conn.commit()
+
+
+# ---------------- QUERIES ----------------
+def load_totals(db):
+    row = db.execute("""
+        SELECT COALESCE(SUM(items), 0), COALESCE(SUM(qty), 0), COALESCE(SUM(low_stock), 0)
+        FROM category_stats
+    """).fetchone()
+    return {"total_items": row[0], "total_qty": row[1], "low_stock": row[2]}
+
+
+def top_categories(db, limit=6):
+    rows = db.execute(
+        "SELECT category, qty FROM category_stats ORDER BY qty DESC LIMIT ?", (limit,)
+    ).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+__all__ = [
+    "LOW_STOCK_LEVEL",
+    "ensure_stats",
+    "rebuild_stats",
+    "load_totals",
+    "top_categories",
+]
@@ -0,0 +1,259 @@
+"""
+Where uploaded files live: the local uploads/ folder or an S3-compatible bucket.
+
+Every file touch (photos, thumbnails, barcode/QR codes, labels) goes
+through one Storage object, so several app nodes can share the files by
+pointing at the same bucket:
+
+    storage = storage_from_env(UPLOAD_FOLDER)
+    storage.put("img_ab12....jpg", fileobj_or_bytes, "image/jpeg")
+    data = storage.get("qr_4.1a2b3c4d5e6f.png")
+    for chunk in storage.stream(name): ...
+    storage.delete(name)
+    storage.url(name)      # direct URL (S3), or None -> served by /uploads
+
+Configuration (environment):
+
+    STORAGE_BACKEND=local                   default; files in uploads/
+    STORAGE_BACKEND=s3
+        S3_BUCKET=clothing-uploads          required
+        S3_PREFIX=uploads/                  key prefix inside the bucket
+        S3_ENDPOINT_URL=http://minio:9000   MinIO / other S3 APIs; unset for AWS
+        S3_ADDRESSING_STYLE=path            path / virtual / auto; default path with
+                                            an endpoint URL (MinIO), else auto
+        S3_PUBLIC_URL=https://cdn.example   public base URL; else presigned URLs
+        AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY / AWS_DEFAULT_REGION as usual
+
+Storage objects are picklable, so jobs.py workers get the same backend.
+The S3 backend needs boto3 (`pip install boto3`); `python -m scripts.storage_check`
+runs every operation against the configured backend (e.g. a local MinIO).
+"""
+
+from __future__ import annotations
+
+import io
+import mimetypes
+import os
+import uuid
+
+STREAM_CHUNK = 64 * 1024
+PRESIGN_EXPIRES = 3600
+
+
+class Storage:
+    """Interface shared by the backends. Names are relative ("thumbs/x.webp")."""
+
+    root = None   # local directory, when files can be sent from disk
+
+    def put(self, name, data, content_type=None):
+        raise NotImplementedError
+
+    def get(self, name):
+        """The file's bytes; FileNotFoundError if missing."""
+        raise NotImplementedError
+
+    def stream(self, name, chunk_size=STREAM_CHUNK):
+        """Iterate over the file's bytes in chunks."""
+        raise NotImplementedError
+
+    def delete(self, name):
+        """Remove the file; missing files are ignored."""
+        raise NotImplementedError
+
+    def exists(self, name):
+        raise NotImplementedError
+
+    def list(self, prefix):
+        """Names starting with `prefix`."""
+        raise NotImplementedError
+
+    def url(self, name):
+        """Direct URL for the file, or None when the app serves it itself."""
+        return None
+
+
+def _content_type(name, content_type):
+    return content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+# ---------------- LOCAL DISK ----------------
+class LocalStorage(Storage):
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, name):
+        path = os.path.abspath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"invalid storage name: {name!r}")
+        return path
+
+    def put(self, name, data, content_type=None):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as out:
+            if isinstance(data, (bytes, bytearray)):
+                out.write(data)
+            else:
+                while True:
+                    chunk = data.read(STREAM_CHUNK)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+        os.replace(tmp, path)   # readers never see a half-written file
+
+    def get(self, name):
+        with open(self.path(name), "rb") as fh:
+            return fh.read()
+
+    def stream(self, name, chunk_size=STREAM_CHUNK):
+        with open(self.path(name), "rb") as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, name):
+        return os.path.isfile(self.path(name))
+
+    def list(self, prefix):
+        folder, start = os.path.split(prefix)
+        try:
+            entries = os.listdir(os.path.join(self.root, folder))
+        except FileNotFoundError:
+            return []
+        return [
+            f"{folder}/{entry}" if folder else entry
+            for entry in entries
+            if entry.startswith(start) and not entry.endswith(".tmp")
+        ]
+
+
+# ---------------- S3 API ----------------
+class S3Storage(Storage):
+    """Objects in an S3 bucket (AWS, MinIO, Ceph, R2, ...)."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, public_url=None,
+                 presign_expires=PRESIGN_EXPIRES, addressing_style=None):
+        try:
+            import boto3  # noqa: F401
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3: pip install boto3") from None
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        # MinIO serves buckets as paths unless it is given a domain
+        self.addressing_style = addressing_style or ("path" if endpoint_url else "auto")
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.presign_expires = presign_expires
+        self._client = None
+
+    def __getstate__(self):
+        # boto3 clients do not pickle; each process builds its own
+        state = self.__dict__.copy()
+        state["_client"] = None
+        return state
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=self.endpoint_url,
+                config=Config(s3={"addressing_style": self.addressing_style}),
+            )
+        return self._client
+
+    def key(self, name):
+        return self.prefix + name
+
+    def put(self, name, data, content_type=None):
+        body = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        self.client.upload_fileobj(
+            body, self.bucket, self.key(name),
+            ExtraArgs={"ContentType": _content_type(name, content_type)},
+        )
+
+    def _object(self, name):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise FileNotFoundError(name) from None
+            raise
+
+    def get(self, name):
+        return self._object(name)["Body"].read()
+
+    def stream(self, name, chunk_size=STREAM_CHUNK):
+        body = self._object(name)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def exists(self, name):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound"):
+                return False
+            raise
+
+    def list(self, prefix):
+        names = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.key(prefix)):
+            names.extend(obj["Key"][len(self.prefix):] for obj in page.get("Contents", ()))
+        return names
+
+    def url(self, name):
+        if self.public_url:
+            return f"{self.public_url}/{self.key(name)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.key(name)},
+            ExpiresIn=self.presign_expires,
+        )
+
+
+def storage_from_env(default_root, environ=os.environ):
+    backend = environ.get("STORAGE_BACKEND", "local")
+    if backend == "local":
+        return LocalStorage(default_root)
+    if backend == "s3":
+        bucket = environ.get("S3_BUCKET")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        return S3Storage(
+            bucket,
+            prefix=environ.get("S3_PREFIX", ""),
+            endpoint_url=environ.get("S3_ENDPOINT_URL") or None,
+            public_url=environ.get("S3_PUBLIC_URL") or None,
+            addressing_style=environ.get("S3_ADDRESSING_STYLE") or None,
+        )
+    raise RuntimeError(f"unknown STORAGE_BACKEND {backend!r} (local or s3)")
+
+
+__all__ = [
+    "Storage",
+    "LocalStorage",
+    "S3Storage",
+    "storage_from_env",
+]
@@ -1,21 +1,49 @@
+import io
+import logging
 import os
 import qrcode
 from barcode import Code128
 from barcode.writer import ImageWriter
 
+from static_files import content_hash
+from storage import LocalStorage
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
 
-def generate_barcode(item_id, text):
-    filename = f"barcode_{item_id}"
-    full_path = os.path.join(UPLOAD_FOLDER, filename)
-    barcode_obj = Code128(text, writer=ImageWriter())
-    barcode_obj.save(full_path)
-    return filename + ".png"
-
-def generate_qr(item_id, text):
-    filename = f"qr_{item_id}.png"
-    full_path = os.path.join(UPLOAD_FOLDER, filename)
-    img = qrcode.make(text)
-    img.save(full_path)
+log = logging.getLogger(__name__)
+
+def _save_hashed(storage, stem, data):
+    """Store `data` as <stem>.<content hash>.png; the name changes whenever the image does."""
+    filename = f"{stem}.{content_hash(data)}.png"
+    if not storage.exists(filename):
+        storage.put(filename, data, "image/png")
     return filename
+
+def generate_barcode(item_id, text, storage=None):
+    buf = io.BytesIO()
+    Code128(text, writer=ImageWriter()).write(buf)
+    return _save_hashed(storage or LocalStorage(UPLOAD_FOLDER), f"barcode_{item_id}", buf.getvalue())
+
+def generate_qr(item_id, text, storage=None):
+    buf = io.BytesIO()
+    qrcode.make(text).save(buf)
+    return _save_hashed(storage or LocalStorage(UPLOAD_FOLDER), f"qr_{item_id}", buf.getvalue())
+
+def generate_codes(item_id, barcode_text, qr_text, storage=None):
+    """Render both codes; runs in a jobs.py worker process.
+
+    Returns (barcode_file, qr_file); a code that fails to render is None
+    and its traceback is logged by the worker.
+    """
+    try:
+        barcode_file = generate_barcode(item_id, barcode_text, storage)
+    except Exception:
+        log.exception("barcode for item %s failed", item_id)
+        barcode_file = None
+    try:
+        qr_file = generate_qr(item_id, qr_text, storage)
+    except Exception:
+        log.exception("QR code for item %s failed", item_id)
+        qr_file = None
+    return barcode_file, qr_file
@@ -0,0 +1,238 @@
+"""
+Per-size stock (product variants).
+
+Stock lives in `clothing_variants`, one row per (clothing_id, size), with a
+unique index serving the (product, size) lookups of the cart and checkout.
+`clothing.quantity` and `clothing.size` are derived from it by triggers:
+quantity is the sum over all sizes and size the "S/M/L" list. The catalog
+and dashboard queries keep reading `clothing`, but every stock change goes
+through the variant rows.
+
+Inserting a clothing row seeds its variants from the size text: "S/M/L" (or
+"S, M, L") becomes three sizes, and the first one gets the row's quantity.
+An empty size becomes DEFAULT_SIZE.
+
+    variant_map = load_variant_map(db, [p["id"] for p in products], in_stock=True)
+    variant_map[item_id]    # [Row(id, clothing_id, size, quantity), ...]
+"""
+
+from __future__ import annotations
+
+import re
+
+from backfill import in_batches
+
+DEFAULT_SIZE = "One Size"
+
+VARIANT_TRIGGERS = (
+    "clothing_variants_seed",
+    "clothing_variants_ai",
+    "clothing_variants_au",
+    "clothing_variants_ad",
+)
+
+_SIZE_SPLIT_RE = re.compile(r"[,/]")
+
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds.
+CHUNK_SIZE = 500
+
+
+def split_sizes(text):
+    """'S/M, L' -> ['S', 'M', 'L'] (same rule as the seed trigger)."""
+    sizes = []
+    for part in _SIZE_SPLIT_RE.split(text or ""):
+        part = part.strip()
+        if part and part not in sizes:
+            sizes.append(part)
+    return sizes or [DEFAULT_SIZE]
+
+
+# ---------------- SCHEMA ----------------
+def _size_tokens(expr):
+    """json_each() over the size list in `expr` (quotes/backslashes/control chars dropped)."""
+    cleaned = f"IFNULL({expr}, '')"
+    for bad, good in (("'\\'", "''"), ("'\"'", "''"),
+                      ("char(9)", "' '"), ("char(10)", "' '"), ("char(13)", "' '")):
+        cleaned = f"replace({cleaned}, {bad}, {good})"
+    cleaned = f"replace(replace({cleaned}, ',', '\",\"'), '/', '\",\"')"
+    return f"""json_each('["' || {cleaned} || '"]')"""
+
+
+def _seed_sql(ref, table=None):
+    """Create the variants for clothing row(s) `ref`.
+
+    In the trigger `ref` is `new`; the backfill passes table="clothing AS c"
+    with ref="c" to seed every existing product at once.
+    """
+    source = f"{table}, " if table else ""
+    return f"""
+        INSERT OR IGNORE INTO clothing_variants (clothing_id, size, quantity)
+        SELECT clothing_id, size, CASE WHEN n = 1 THEN qty ELSE 0 END
+        FROM (
+            SELECT {ref}.id AS clothing_id,
+                   TRIM(j.value) AS size,
+                   IFNULL({ref}.quantity, 0) AS qty,
+                   row_number() OVER (PARTITION BY {ref}.id ORDER BY j.key) AS n
+            FROM {source}{_size_tokens(f"{ref}.size")} AS j
+            WHERE TRIM(j.value) <> ''
+        )
+        WHERE true;
+        INSERT OR IGNORE INTO clothing_variants (clothing_id, size, quantity)
+        SELECT {ref}.id, '{DEFAULT_SIZE}', IFNULL({ref}.quantity, 0)
+        {f"FROM {table}" if table else ""}
+        WHERE NOT EXISTS (SELECT 1 FROM clothing_variants v WHERE v.clothing_id = {ref}.id);
+    """
+
+
+def _sync_sql(clothing_id, scope=""):
+    """Recompute clothing.quantity / clothing.size for product `clothing_id` (an SQL expression).
+
+    `scope` is an extra condition on the clothing rows (the bulk sync).
+    """
+    qty = f"(SELECT IFNULL(SUM(quantity), 0) FROM clothing_variants WHERE clothing_id = {clothing_id})"
+    sizes = (
+        "(SELECT group_concat(size, '/') FROM ("
+        f"SELECT size FROM clothing_variants WHERE clothing_id = {clothing_id} ORDER BY id))"
+    )
+    return f"""
+        UPDATE clothing SET quantity = {qty}, size = {sizes}
+        WHERE id = {clothing_id} {scope}
+          AND (quantity IS NOT {qty} OR size IS NOT {sizes});
+    """
+
+
+def _seeding_sql(ref):
+    """True while the seed trigger inserts variant `ref`: its size is still listed on the parent.
+
+    Outside seeding a size only appears in clothing.size once its variant
+    exists (the text is derived from the variants), so a new variant whose
+    size is already listed comes from the seed.
+    """
+    return f"""EXISTS (
+        SELECT 1 FROM clothing AS p, {_size_tokens("p.size")} AS j
+        WHERE p.id = {ref}.clothing_id AND TRIM(j.value) = {ref}.size
+    )"""
+
+
+def _triggers_current(conn):
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='trigger' AND name='clothing_variants_ai'"
+    ).fetchone()
+    return row is not None and "WHEN" in row[0].upper()
+
+
+def ensure_variants(conn):
+    """Create the variants table + triggers if missing (and seed it). Returns True if created."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clothing_variants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clothing_id INTEGER NOT NULL,
+            size TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (clothing_id, size)
+        )
+    """)
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'")
+    }
+    if all(name in existing for name in VARIANT_TRIGGERS) and _triggers_current(conn):
+        return False
+    # triggers from before the seed stopped syncing per variant are replaced
+    for name in VARIANT_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    # the seed syncs its product once at the end; the per-variant sync skips
+    # the sizes it inserts, so a new "S/M/L" row is not rewritten to "S", "S/M", ...
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_variants_seed AFTER INSERT ON clothing BEGIN
+            {_seed_sql("new")}
+            {_sync_sql("new.id")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_variants_ai AFTER INSERT ON clothing_variants
+        WHEN NOT {_seeding_sql("new")} BEGIN
+            {_sync_sql("new.clothing_id")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_variants_au
+        AFTER UPDATE OF size, quantity ON clothing_variants BEGIN
+            {_sync_sql("new.clothing_id")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS clothing_variants_ad AFTER DELETE ON clothing_variants BEGIN
+            {_sync_sql("old.clothing_id")}
+        END
+    """)
+
+    # products created before variants existed, in batches (new rows have the seed trigger)
+    in_batches(conn, "clothing", lambda low, high: _seed_range(conn, low, high))
+    return True
+
+
+def _seed_range(conn, low, high=None):
+    """Seed the variants of products low < id <= high, then derive their quantity / size once."""
+    scope = f"AND id > {int(low)}" + (f" AND id <= {int(high)}" if high is not None else "")
+    for statement in _seed_sql("c", f"(SELECT * FROM clothing WHERE true {scope}) AS c").split(";"):
+        if statement.strip():
+            conn.execute(statement)
+    conn.execute(_sync_sql("clothing.id", scope))
+
+
+def seed_variants(conn, first_id=1):
+    """Seed variants for products from `first_id` on in one set-based pass.
+
+    For rows written while the triggers were off (datagen): one statement
+    instead of a trigger per row.
+    """
+    _seed_range(conn, int(first_id) - 1)
+    conn.commit()
+
+
+# ---------------- QUERIES ----------------
+def load_variants(db, item_id, in_stock=False):
+    sql = "SELECT id, clothing_id, size, quantity FROM clothing_variants WHERE clothing_id = ?"
+    if in_stock:
+        sql += " AND quantity > 0"
+    return db.execute(sql + " ORDER BY id", (item_id,)).fetchall()
+
+
+def load_variant_map(db, item_ids, in_stock=False):
+    """{clothing_id: [variant rows]} for a page of items, in batched IN queries."""
+    ids = list(dict.fromkeys(item_ids))
+    variant_map = {item_id: [] for item_id in ids}
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = db.execute(
+            f"""
+            SELECT id, clothing_id, size, quantity
+            FROM clothing_variants
+            WHERE clothing_id IN ({placeholders}) {"AND quantity > 0" if in_stock else ""}
+            ORDER BY clothing_id, id
+            """,
+            chunk,
+        ).fetchall()
+        for row in rows:
+            variant_map[row["clothing_id"]].append(row)
+    return variant_map
+
+
+def find_variant(db, item_id, size):
+    return db.execute(
+        "SELECT id, clothing_id, size, quantity FROM clothing_variants WHERE clothing_id = ? AND size = ?",
+        (item_id, size),
+    ).fetchone()
+
+
+__all__ = [
+    "DEFAULT_SIZE",
+    "split_sizes",
+    "ensure_variants",
+    "seed_variants",
+    "load_variants",
+    "load_variant_map",
+    "find_variant",
+]